@@ -13,4 +13,23 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rf4.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from services.catch_extractor import async_http_client
+
+
+async def application(scope, receive, send):
+    """
+    Django的ASGI应用不处理lifespan事件，在外层处理：启动后远程调用共享一个httpx.AsyncClient，worker退出时关闭
+    """
+    if scope['type'] != 'lifespan':
+        return await django_application(scope, receive, send)
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            async_http_client.start_lifespan()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await async_http_client.close_client()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
@@ -148,6 +148,73 @@ STATIC_URL = 'static/'
 # 资源文件目录
 ASSETS_DIR = os.path.join(BASE_DIR, 'assets')
 
+# 鱼获标注所用的中文字体路径，为空时自动探测系统字体
+ANNOTATION_FONT_PATH = os.getenv('ANNOTATION_FONT_PATH', '')
+
+# 是否将上传的鱼获截图及处理结果保存到 ASSETS_DIR/catches（每个请求使用唯一文件名）
+CATCH_SAVE_IMAGES = os.getenv('CATCH_SAVE_IMAGES', 'false').lower() == 'true'
+
+# 是否将提取出的鱼获写入Catch表（同一张截图重复上传不会重复写入）
+CATCH_SAVE_CATCHES = os.getenv('CATCH_SAVE_CATCHES', 'false').lower() == 'true'
+
+# 鱼卡片检测方式: remote（roboflow工作流）、local（本地OpenCV）、local_fallback（本地检测不到时回退到roboflow）
+FISH_CARD_DETECTOR = os.getenv('FISH_CARD_DETECTOR', 'remote')
+
+# OCR后端: baidu（百度高精度OCR，识别整张图片）、tesseract（本地识别各鱼卡片区域，进程池并行）
+OCR_BACKEND = os.getenv('OCR_BACKEND', 'baidu')
+
+# 鱼类搜索: auto（SQLite使用FTS5、MySQL使用ngram全文索引）、like（子串匹配）
+FISH_SEARCH_BACKEND = os.getenv('FISH_SEARCH_BACKEND', 'auto')
+
+# 鱼类接口的服务端响应缓存：使用的缓存（settings.CACHES）和有效期（秒），有效期为0时关闭
+# 缓存键包含鱼类数据版本（行数、最近更新时间、写入计数），Fish写入和fish_import后立即失效
+FISH_RESPONSE_CACHE_ALIAS = os.getenv('FISH_RESPONSE_CACHE_ALIAS', 'default')
+FISH_RESPONSE_CACHE_TTL = int(os.getenv('FISH_RESPONSE_CACHE_TTL', 300))
+
+# 鱼名匹配器检查鱼类表是否变化的间隔（秒），本进程内的修改通过信号立即生效
+FISH_NAME_MATCHER_CHECK_INTERVAL = int(os.getenv('FISH_NAME_MATCHER_CHECK_INTERVAL', 60))
+
+# 上传到roboflow/百度前裁剪到鱼市列表区域并重新编码为JPEG：最长边像素上限、压缩质量、字节数上限
+CATCH_UPLOAD_PREPROCESS = os.getenv('CATCH_UPLOAD_PREPROCESS', 'true').lower() == 'true'
+CATCH_UPLOAD_MAX_SIDE = int(os.getenv('CATCH_UPLOAD_MAX_SIDE', 1600))
+CATCH_UPLOAD_JPEG_QUALITY = int(os.getenv('CATCH_UPLOAD_JPEG_QUALITY', 85))
+CATCH_UPLOAD_MAX_BYTES = int(os.getenv('CATCH_UPLOAD_MAX_BYTES', 1024 * 1024))
+
+# 鱼获处理后图片短期链接的有效期（秒）
+CATCH_IMAGE_URL_TTL = int(os.getenv('CATCH_IMAGE_URL_TTL', 600))
+
+# 异步鱼获提取任务：每个进程同时处理的任务数、排队上限，以及任务记录的保留时间（秒）
+CATCH_JOB_MAX_CONCURRENCY = int(os.getenv('CATCH_JOB_MAX_CONCURRENCY', 2))
+CATCH_JOB_MAX_QUEUE = int(os.getenv('CATCH_JOB_MAX_QUEUE', 50))
+CATCH_JOB_RETENTION = int(os.getenv('CATCH_JOB_RETENTION', 24 * 3600))
+# 提交后超过该时间（秒）仍未完成的任务视为所在进程已重启，标记为失败
+CATCH_JOB_TIMEOUT = int(os.getenv('CATCH_JOB_TIMEOUT', 15 * 60))
+
+# 鱼获提取结果缓存（以图片内容哈希为键）
+# 后端可选: memory（进程内）、file（磁盘）、django（settings.CACHES）、none（关闭）
+CATCH_RESULT_CACHE_BACKEND = os.getenv('CATCH_RESULT_CACHE_BACKEND', 'memory')
+CATCH_RESULT_CACHE_TTL = int(os.getenv('CATCH_RESULT_CACHE_TTL', 24 * 3600))
+CATCH_RESULT_CACHE_MAX_BYTES = int(os.getenv('CATCH_RESULT_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+# 鱼卡片缓存：以卡片截图哈希为键复用已识别卡片的字段，只识别新出现的卡片（启用后先检测卡片再识别文字）
+# 后端可选: none（默认，关闭）、memory、file、django
+CATCH_CARD_CACHE_BACKEND = os.getenv('CATCH_CARD_CACHE_BACKEND', 'none')
+CATCH_CARD_CACHE_TTL = int(os.getenv('CATCH_CARD_CACHE_TTL', 7 * 24 * 3600))
+CATCH_CARD_CACHE_MAX_BYTES = int(os.getenv('CATCH_CARD_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+
+# 鱼类图片缩略图（ASSETS_DIR/fish_images）：占用空间上限（字节），超出时淘汰最久未使用的缩略图
+# FISH_IMAGE_LAZY_FETCH为true时，请求尚未生成的缩略图会立即下载原图生成，否则重定向到原图
+FISH_IMAGE_CACHE_MAX_BYTES = int(os.getenv('FISH_IMAGE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+FISH_IMAGE_LAZY_FETCH = os.getenv('FISH_IMAGE_LAZY_FETCH', 'true').lower() == 'true'
+# 允许服务端下载鱼类图片的主机（逗号分隔，包含子域名），其他地址的图片直接重定向到原图
+FISH_IMAGE_ALLOWED_HOSTS = [host.strip().lower() for host in os.getenv('FISH_IMAGE_ALLOWED_HOSTS', 'gamekee.com').split(',')
+                            if host.strip()]
+
+# 百度OCR access token的共享存储，可选: file（默认，ASSETS_DIR/token_cache，权限0600，同一台机器的worker共享）、
+# django（settings.CACHES，未配置CACHES时为进程内的LocMemCache，需配置跨进程的缓存如redis才能在worker之间共享）、
+# memory（不共享）
+TOKEN_STORE_BACKEND = os.getenv('TOKEN_STORE_BACKEND', 'file')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,87 @@
+import asyncio
+import httpx
+from services.catch_extractor.http_client import (CONNECT_TIMEOUT, READ_TIMEOUT, MAX_RETRIES, RETRY_BACKOFF,
+                                                  POOL_CONNECTIONS, POOL_MAXSIZE, POOL_TIMEOUT, RETRY_STATUS_CODES,
+                                                  RETRY_METHODS)
+
+# 请求尚未发出的错误，对所有方法都可以重试；其他传输错误（如读取超时）和5xx/429只对RETRY_METHODS重试
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+# 执行ASGI lifespan的事件循环及该循环共享的AsyncClient（AsyncClient绑定在创建它的事件循环上）
+# 没有lifespan时（runserver/WSGI下每次调用新建事件循环）共享客户端无法关闭，每次请求使用临时客户端
+_lifespan_loop = None
+_client = None
+
+def create_client() -> httpx.AsyncClient:
+    """
+    创建AsyncClient，连接池、keep-alive和超时配置与http_client一致
+    """
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=POOL_CONNECTIONS * POOL_MAXSIZE,
+                            max_keepalive_connections=POOL_MAXSIZE),
+        timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT, pool=POOL_TIMEOUT),
+    )
+
+def start_lifespan():
+    """
+    在ASGI的lifespan.startup中调用，之后在当前事件循环中发起的请求共享同一个AsyncClient
+    """
+    global _lifespan_loop
+    _lifespan_loop = asyncio.get_running_loop()
+
+async def close_client():
+    """
+    在ASGI的lifespan.shutdown中调用，关闭共享的AsyncClient，释放连接池中的连接
+    """
+    global _lifespan_loop, _client
+    client, _client, _lifespan_loop = _client, None, None
+    if client is not None:
+        await client.aclose()
+
+def get_client() -> httpx.AsyncClient | None:
+    """
+    获取lifespan事件循环共享的AsyncClient
+    :return: AsyncClient，lifespan未启动或当前不在lifespan的事件循环中时返回None
+    """
+    global _client
+    if _lifespan_loop is None or asyncio.get_running_loop() is not _lifespan_loop:
+        return None
+    if _client is None:
+        _client = create_client()
+    return _client
+
+async def request(method: str, url: str, timeout: float = None, **kwargs) -> httpx.Response:
+    """
+    发起异步HTTP请求，连接失败、超时或5xx/429时按退避策略重试，重试策略与http_client一致（POST只在连接失败时重试）
+    :param method: 请求方法
+    :param url: 请求地址
+    :param timeout: 读取超时时间（秒），为None时使用默认配置
+    :return: httpx.Response
+    """
+    if timeout is not None:
+        kwargs["timeout"] = httpx.Timeout(timeout, connect=min(CONNECT_TIMEOUT, timeout), pool=POOL_TIMEOUT)
+    client = get_client()
+    if client is not None:
+        return await _request_with_retry(client, method, url, **kwargs)
+    # 非流式请求返回前已读取响应体，客户端关闭后仍可使用response
+    async with create_client() as client:
+        return await _request_with_retry(client, method, url, **kwargs)
+
+async def _request_with_retry(client: httpx.AsyncClient, method: str, url: str, **kwargs) -> httpx.Response:
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.TransportError as e:
+            if attempt == MAX_RETRIES or (method.upper() not in RETRY_METHODS and not isinstance(e, UNSENT_ERRORS)):
+                raise
+        else:
+            if (response.status_code not in RETRY_STATUS_CODES or attempt == MAX_RETRIES
+                    or method.upper() not in RETRY_METHODS):
+                return response
+        await asyncio.sleep(RETRY_BACKOFF * (2 ** attempt))
+
+async def get(url: str, **kwargs) -> httpx.Response:
+    return await request("GET", url, **kwargs)
+
+async def post(url: str, **kwargs) -> httpx.Response:
+    return await request("POST", url, **kwargs)
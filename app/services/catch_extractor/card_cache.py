@@ -0,0 +1,178 @@
+import os
+import math
+import pickle
+import hashlib
+import threading
+from PIL import Image
+from services.catch_extractor.config import get_setting
+from services.catch_extractor.result_cache import CacheBackend, MemoryCacheBackend, FileCacheBackend, DjangoCacheBackend
+from services.catch_extractor.utils import BoundingBox
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# 计算卡片哈希前统一缩放到的宽度，保留足够分辨率区分只差一位数字的卡片
+HASH_WIDTH = 160
+# 灰度量化位数，去掉JPEG压缩等引入的细微噪声
+HASH_LEVEL_BITS = 5
+# 拼接图中卡片之间的间隔（像素）和每行卡片数
+MONTAGE_GAP = 20
+MONTAGE_COLUMNS = 4
+
+
+class CardCache:
+    """
+    以鱼卡片截图哈希为键的卡片解析结果缓存
+    缓存内容为卡片解析出的字段和卡片内文字块的相对位置（用于绘制标注）
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(crop: Image.Image) -> str:
+        """
+        根据卡片截图生成缓存键：转灰度、缩放到固定宽度并量化后取sha256
+        :param crop: 卡片截图
+        :return: sha256十六进制字符串
+        """
+        height = max(1, round(crop.height * HASH_WIDTH / crop.width))
+        small = crop.convert("L").resize((HASH_WIDTH, height), Image.BILINEAR)
+        shift = 8 - HASH_LEVEL_BITS
+        data = small.point(lambda value: value >> shift).tobytes()
+        return hashlib.sha256(f"{HASH_WIDTH}x{height}:".encode() + data).hexdigest()
+
+    def lookup(self, image: Image.Image, fish_cards: list[BoundingBox]) -> tuple[list[str], list[dict | None]]:
+        """
+        查询图片中每张卡片的缓存
+        :param image: 原图
+        :param fish_cards: 鱼卡片列表
+        :return: 每张卡片的缓存键和缓存内容（未命中为None）
+        """
+        keys, entries = [], []
+        for card in fish_cards:
+            key = self.make_key(image.crop(card_crop_box(card, image.size)))
+            value = self.backend.get(key)
+            keys.append(key)
+            entries.append(pickle.loads(value) if value is not None else None)
+        hits = sum(entry is not None for entry in entries)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(entries) - hits
+        return keys, entries
+
+    def set(self, key: str, fields: dict, words: list[tuple]):
+        """
+        写入缓存
+        :param key: 缓存键
+        :param fields: 卡片解析出的字段
+        :param words: 卡片内文字块 [(相对卡片的left, top, width, height, 文字), ...]
+        """
+        value = pickle.dumps({"fields": fields, "words": words}, protocol=pickle.HIGHEST_PROTOCOL)
+        self.backend.set(key, value, self.ttl)
+
+    def stats(self) -> dict:
+        """
+        缓存命中统计（当前进程），每次命中少识别一张卡片
+        """
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "backend": self.backend.name,
+            "ttl": self.ttl,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            **self.backend.info(),
+        }
+
+
+def card_crop_box(card: BoundingBox, image_size: tuple[int, int]) -> tuple[int, int, int, int]:
+    """
+    卡片在原图中的裁剪区域（限制在图片范围内）
+    """
+    width, height = image_size
+    left, top = max(0, int(card.left)), max(0, int(card.top))
+    right, bottom = min(width, int(card.left + card.width)), min(height, int(card.top + card.height))
+    return left, top, right, bottom
+
+
+def build_montage(image: Image.Image, fish_cards: list[BoundingBox]) -> tuple[Image.Image, list[BoundingBox]]:
+    """
+    将需要识别的卡片拼接成一张图片，只把这些卡片发送给OCR
+    :param image: 原图
+    :param fish_cards: 需要识别的鱼卡片
+    :return: 拼接图，以及每张卡片在拼接图中的位置
+    """
+    crops = [image.crop(card_crop_box(card, image.size)) for card in fish_cards]
+    cell_width = max(crop.width for crop in crops) + MONTAGE_GAP
+    cell_height = max(crop.height for crop in crops) + MONTAGE_GAP
+    columns = min(MONTAGE_COLUMNS, len(crops))
+    rows = math.ceil(len(crops) / columns)
+
+    montage = Image.new("RGB", (columns * cell_width + MONTAGE_GAP, rows * cell_height + MONTAGE_GAP))
+    slots = []
+    for i, crop in enumerate(crops):
+        left = MONTAGE_GAP + (i % columns) * cell_width
+        top = MONTAGE_GAP + (i // columns) * cell_height
+        montage.paste(crop, (left, top))
+        slots.append(BoundingBox(left, top, crop.width, crop.height, False))
+    return montage, slots
+
+
+def map_montage_result(ocr_result: dict, slots: list[BoundingBox], fish_cards: list[BoundingBox]) -> dict:
+    """
+    将拼接图的OCR结果换算回原图坐标（原地修改），不在任何卡片内的文字块被丢弃
+    :param ocr_result: 百度OCR格式的识别结果
+    :param slots: 每张卡片在拼接图中的位置
+    :param fish_cards: 对应的鱼卡片
+    :return: ocr_result
+    """
+    words_result = []
+    for item in ocr_result.get("words_result", []):
+        location = item["location"]
+        x_center = location["left"] + location["width"] / 2
+        y_center = location["top"] + location["height"] / 2
+        for slot, card in zip(slots, fish_cards):
+            if slot.left <= x_center <= slot.right and slot.top <= y_center <= slot.bottom:
+                location["left"] += int(max(0, card.left) - slot.left)
+                location["top"] += int(max(0, card.top) - slot.top)
+                words_result.append(item)
+                break
+    ocr_result["words_result"] = words_result
+    ocr_result["words_result_num"] = len(words_result)
+    return ocr_result
+
+
+_card_cache = None
+_card_cache_lock = threading.Lock()
+
+def get_card_cache():
+    """
+    获取进程内共享的卡片缓存，CATCH_CARD_CACHE_BACKEND为none（默认）时返回None
+    支持的后端: memory、file、django
+    """
+    global _card_cache
+    backend_name = get_setting("CATCH_CARD_CACHE_BACKEND", "none")
+    if backend_name == "none":
+        return None
+    if _card_cache is None:
+        with _card_cache_lock:
+            if _card_cache is None:
+                max_bytes = get_setting("CATCH_CARD_CACHE_MAX_BYTES", 16 * 1024 * 1024, int)
+                if backend_name == "memory":
+                    backend = MemoryCacheBackend(max_bytes)
+                elif backend_name == "file":
+                    directory = get_setting("CATCH_CARD_CACHE_DIR",
+                                            os.path.join(get_setting("ASSETS_DIR", current_dir), "card_cache"))
+                    backend = FileCacheBackend(directory, max_bytes)
+                elif backend_name == "django":
+                    backend = DjangoCacheBackend(get_setting("CATCH_RESULT_CACHE_ALIAS", "default"), prefix="catch_card")
+                else:
+                    raise ValueError(f"不支持的缓存后端: {backend_name}")
+                _card_cache = CardCache(backend, get_setting("CATCH_CARD_CACHE_TTL", 7 * 24 * 3600, float))
+    return _card_cache
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import cv2
+import numpy as np
+from services.catch_extractor.config import get_setting
+from services.catch_extractor.fish_cards import get_fish_cards_result, get_fish_cards_result_async
+from services.catch_extractor.roboflow_format import convert_yolo_to_standard
+from services.catch_extractor.preprocess import sell_list_box, UploadTransform
+from services.catch_extractor.utils import BoxArray, load_bytes_from_url
+
+logger = logging.getLogger(__name__)
+
+# 鱼卡片检测方式: remote（roboflow工作流）、local（本地OpenCV）、local_fallback（本地检测失败时回退到roboflow）
+DETECTOR = get_setting("FISH_CARD_DETECTOR", "remote")
+
+
+def _dedupe(boxes: BoxArray, iou_threshold: float = 0.7) -> BoxArray:
+    """
+    去除重复的方框（同一张卡片边框的内外轮廓），保留面积较大的方框
+    """
+    if len(boxes) == 0:
+        return boxes
+    order = np.argsort(-boxes.area)
+    boxes = boxes[order]
+    iou = boxes.iou()
+    keep = []
+    for i in range(len(boxes)):
+        if all(iou[i, j] < iou_threshold for j in keep):
+            keep.append(i)
+    return boxes[keep]
+
+
+def detect_fish_cards_local(image_bytes: bytes) -> dict:
+    """
+    使用OpenCV在本地检测鱼卡片
+    鱼市出售页面的卡片为大小一致的矩形网格：在列表区域内做边缘检测，取近似矩形的轮廓，
+    再按尺寸中位数过滤掉大小不一致的误检
+    :param image_bytes: 图片原始字节
+    :return: 与convert_yolo_to_standard相同结构的结果
+    """
+    gray = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        raise ValueError("无法解码图片")
+    image_height, image_width = gray.shape
+
+    # 1. 只在列表区域内检测
+    x0, y0, x1, y1 = sell_list_box((image_width, image_height))
+    region = gray[y0:y1, x0:x1]
+    region_height, region_width = region.shape
+
+    # 2. 边缘检测，膨胀以连接断开的边框
+    edges = cv2.Canny(region, 50, 150)
+    edges = cv2.dilate(edges, np.ones((3, 3), np.uint8), iterations=1)
+    contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+
+    # 3. 保留尺寸合理且接近矩形的轮廓
+    candidates = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if not (region_width * 0.08 <= w <= region_width * 0.5 and region_height * 0.1 <= h <= region_height * 0.6):
+            continue
+        if cv2.contourArea(contour) < 0.8 * w * h:
+            continue
+        candidates.append((x + x0, y + y0, w, h))
+    if not candidates:
+        return {"result": [], "result_num": 0}
+    boxes = _dedupe(BoxArray(*zip(*candidates)))
+
+    # 4. 卡片大小一致，过滤掉与尺寸中位数相差较大的方框
+    median_width, median_height = np.median(boxes.width), np.median(boxes.height)
+    mask = ((np.abs(boxes.width - median_width) <= 0.25 * median_width) &
+            (np.abs(boxes.height - median_height) <= 0.25 * median_height))
+    boxes = boxes[mask]
+
+    # 5. 按行优先排序
+    rows = np.round(boxes.top / (median_height / 2))
+    boxes = boxes[np.lexsort((boxes.left, rows))]
+
+    result = [{
+        "info": "fish_card-local",
+        "location": {"top": int(top), "left": int(left), "width": int(width), "height": int(height)}
+    } for left, top, width, height in zip(boxes.left, boxes.top, boxes.width, boxes.height)]
+    return {"result": result, "result_num": len(result)}
+
+
+def detect_fish_cards_remote(image_url: str = None, image_base64: str = None, timeout: float = None,
+                             transform: UploadTransform = None) -> dict:
+    """
+    调用roboflow目标检测工作流检测鱼卡片
+    :param transform: 上传图片相对原图的变换，不为None时将检测结果换算回原图坐标
+    :return: 与convert_yolo_to_standard相同结构的结果
+    """
+    result = convert_yolo_to_standard(get_fish_cards_result(image_url=image_url, image_base64=image_base64, timeout=timeout))
+    return transform.map_result(result, "result") if transform is not None else result
+
+
+def detect_fish_cards(image_bytes: bytes = None, image_url: str = None, image_base64: str = None,
+                      timeout: float = None, detector: str = None, transform: UploadTransform = None) -> dict:
+    """
+    检测鱼卡片，按FISH_CARD_DETECTOR选择本地或远程检测
+    :param image_bytes: 图片原始字节（本地检测使用）
+    :param image_url: 图片url
+    :param image_base64: 图片base64编码（远程检测使用）
+    :param timeout: 远程调用的超时时间（秒）
+    :param detector: 检测方式，为None时使用FISH_CARD_DETECTOR
+    :param transform: image_base64相对原图的变换（见preprocess.prepare_upload）
+    :return: 与convert_yolo_to_standard相同结构的结果
+    """
+    detector = detector or DETECTOR
+    if detector == "remote":
+        return detect_fish_cards_remote(image_url=image_url, image_base64=image_base64, timeout=timeout,
+                                        transform=transform)
+    if detector not in ("local", "local_fallback"):
+        raise ValueError(f"不支持的鱼卡片检测方式: {detector}")
+
+    if image_bytes is None:
+        image_bytes = load_bytes_from_url(image_url, timeout=timeout)
+    result = detect_fish_cards_local(image_bytes)
+    if detector == "local_fallback" and result["result_num"] == 0:
+        logger.info("本地未检测到鱼卡片，回退到roboflow工作流")
+        return detect_fish_cards_remote(image_url=image_url, image_base64=image_base64, timeout=timeout,
+                                        transform=transform)
+    return result
+
+
+async def detect_fish_cards_remote_async(image_base64: str, timeout: float = None,
+                                         transform: UploadTransform = None) -> dict:
+    """
+    detect_fish_cards_remote的异步版本
+    """
+    result = convert_yolo_to_standard(await get_fish_cards_result_async(image_base64=image_base64, timeout=timeout))
+    return transform.map_result(result, "result") if transform is not None else result
+
+
+async def detect_fish_cards_async(image_bytes: bytes = None, image_base64: str = None,
+                                  timeout: float = None, detector: str = None, transform: UploadTransform = None) -> dict:
+    """
+    detect_fish_cards的异步版本：远程检测使用httpx.AsyncClient，本地OpenCV检测放到线程中执行
+    :return: 与convert_yolo_to_standard相同结构的结果
+    """
+    detector = detector or DETECTOR
+    if detector == "remote":
+        return await detect_fish_cards_remote_async(image_base64, timeout=timeout, transform=transform)
+    if detector not in ("local", "local_fallback"):
+        raise ValueError(f"不支持的鱼卡片检测方式: {detector}")
+
+    result = await asyncio.to_thread(detect_fish_cards_local, image_bytes)
+    if detector == "local_fallback" and result["result_num"] == 0:
+        logger.info("本地未检测到鱼卡片，回退到roboflow工作流")
+        return await detect_fish_cards_remote_async(image_base64, timeout=timeout, transform=transform)
+    return result
@@ -0,0 +1,30 @@
+import os
+import dotenv
+
+dotenv.load_dotenv()
+
+
+def get_setting(name: str, default=None, cast=None):
+    """
+    读取鱼获提取相关配置
+    优先读取Django settings中的同名配置，其次读取环境变量，最后使用默认值
+    :param name: 配置名
+    :param default: 默认值
+    :param cast: 类型转换函数（仅作用于环境变量中读取到的字符串）
+    :return: 配置值
+    """
+    try:
+        from django.conf import settings
+        if settings.configured and hasattr(settings, name):
+            return getattr(settings, name)
+    except ImportError:
+        pass
+
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    if cast is bool:
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    if cast is not None:
+        return cast(value)
+    return value
@@ -1,6 +1,6 @@
 import os
 import json
-import requests
+from services.catch_extractor import http_client, async_http_client
 import base64
 from services.catch_extractor.utils import load_image_from_file
 import dotenv
@@ -8,22 +8,23 @@ from services.catch_extractor.utils import get_file_content_as_base64
 
 dotenv.load_dotenv()
 
-def get_fish_cards_result(image_url: str = None, image_path: str = None):
+ROBOFLOW_WORKFLOW_URL = "https://serverless.roboflow.com/infer/workflows/polarsnowleopard-jwqgz/detect-count-and-visualize"
+
+def build_fish_cards_payload(image_url: str = None, image_path: str = None, image_base64: str = None) -> dict:
+    """
+    构造roboflow工作流的请求体
+    """
     if image_url:
         image_type = "url"
-    elif image_path:
+    elif image_path or image_base64:
         image_type = "local"
     else:
-        raise ValueError("image_url or image_path is required")
+        raise ValueError("image_url, image_path or image_base64 is required")
 
     if image_type == "local":
-        base64_image = get_file_content_as_base64(image_path)
+        base64_image = image_base64 if image_base64 else get_file_content_as_base64(image_path)
 
-    url = "https://serverless.roboflow.com/infer/workflows/polarsnowleopard-jwqgz/detect-count-and-visualize"
-    headers = {
-        "Content-Type": "application/json"
-    }
-    payload = {
+    return {
         "api_key": os.getenv("ROBOFLOW_API_KEY"),
         "inputs": {
             "image": {
@@ -33,10 +34,27 @@ def get_fish_cards_result(image_url: str = None, image_path: str = None):
         }
     }
 
-    response = requests.post(url, headers=headers, json=payload)
+def get_fish_cards_result(image_url: str = None, image_path: str = None, image_base64: str = None,
+                          timeout: float = None):
+    payload = build_fish_cards_payload(image_url=image_url, image_path=image_path, image_base64=image_base64)
+    headers = {
+        "Content-Type": "application/json"
+    }
+    response = http_client.post(ROBOFLOW_WORKFLOW_URL, headers=headers, json=payload, timeout=timeout)
     result = response.json()
     return result
 
+async def get_fish_cards_result_async(image_url: str = None, image_base64: str = None, timeout: float = None):
+    """
+    get_fish_cards_result的异步版本，使用共享的httpx.AsyncClient发起请求
+    """
+    payload = build_fish_cards_payload(image_url=image_url, image_base64=image_base64)
+    headers = {
+        "Content-Type": "application/json"
+    }
+    response = await async_http_client.post(ROBOFLOW_WORKFLOW_URL, headers=headers, json=payload, timeout=timeout)
+    return response.json()
+
 if __name__ == "__main__":
     current_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -0,0 +1,203 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+from services.catch_extractor.config import get_setting
+
+logger = logging.getLogger(__name__)
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# 数据库不可用时使用的鱼类数据文件
+FISH_DATA_PATH = get_setting("FISH_DATA_PATH",
+                             os.path.join(os.path.dirname(os.path.dirname(current_dir)), "data", "fish_data.json"))
+# 检查鱼类表是否变化的间隔（秒），本进程内的修改通过信号立即生效，其他进程的修改最迟在此间隔后生效
+CHECK_INTERVAL = get_setting("FISH_NAME_MATCHER_CHECK_INTERVAL", 60, float)
+# 游戏内显示名与图鉴名称不一致的鱼
+EXTRA_FISH_NAMES = ["镜鲤", "鲤鲫鱼"]
+# 单个匹配器缓存的查询结果数上限
+MEMO_SIZE = 4096
+
+_NORMALIZE_PATTERN = re.compile(r"\s+")
+_NORMALIZE_TABLE = str.maketrans({"（": "(", "）": ")"})
+
+
+def normalize_name(name: str) -> str:
+    """
+    统一鱼名写法：去掉空白，全角括号转为半角
+    """
+    return _NORMALIZE_PATTERN.sub("", name).translate(_NORMALIZE_TABLE)
+
+
+def edit_distance(a: str, b: str) -> int:
+    """
+    计算两个字符串的编辑距离（Levenshtein距离）
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+class FishNameMatcher:
+    """
+    鱼名匹配器：先按规范化后的名称精确查找（哈希表），找不到时通过字符倒排索引筛选候选，
+    再按编辑距离模糊匹配
+    """
+
+    def __init__(self, names, version=None):
+        """
+        :param names: 鱼名列表
+        :param version: 名称对应的鱼类数据版本，用于判断依赖鱼名的缓存是否过期
+        """
+        self.version = version
+        self.names = {}  # 规范化名称 -> 原始名称
+        for name in names:
+            if name:
+                self.names.setdefault(normalize_name(name), name)
+        self._keys = list(self.names)
+        # 字符 -> 包含该字符的名称序号
+        self._index = {}
+        for i, key in enumerate(self._keys):
+            for char in set(key):
+                self._index.setdefault(char, []).append(i)
+        self._memo = {}
+
+    @staticmethod
+    def max_distance(word: str) -> int:
+        """
+        允许的最大编辑距离：两个字及以下的词只做精确匹配，避免把其他短词误认为鱼名
+        """
+        if len(word) <= 2:
+            return 0
+        if len(word) <= 5:
+            return 1
+        return 2
+
+    def _fuzzy_match(self, key: str, max_distance: int) -> str | None:
+        # 编辑距离不超过max_distance时，key中至少有 不同字符数 - max_distance 个字符出现在候选名称中
+        chars = set(key)
+        shared = {}
+        for char in chars:
+            for i in self._index.get(char, ()):
+                shared[i] = shared.get(i, 0) + 1
+
+        best, best_distance, ambiguous = None, max_distance + 1, False
+        for i, count in shared.items():
+            candidate = self._keys[i]
+            if count < len(chars) - max_distance or abs(len(candidate) - len(key)) > max_distance:
+                continue
+            distance = edit_distance(key, candidate)
+            if distance < best_distance:
+                best, best_distance, ambiguous = candidate, distance, False
+            elif distance == best_distance:
+                ambiguous = True
+        # 有多个同样接近的候选时无法确定，视为未匹配
+        if best is None or ambiguous:
+            return None
+        return self.names[best]
+
+    def match(self, word: str) -> str | None:
+        """
+        查找与OCR文字对应的鱼名
+        :param word: OCR识别出的文字
+        :return: 图鉴中的鱼名，找不到时返回None
+        """
+        if word in self._memo:
+            return self._memo[word]
+        key = normalize_name(word)
+        name = self.names.get(key)
+        if name is None:
+            max_distance = self.max_distance(key)
+            if max_distance > 0:
+                name = self._fuzzy_match(key, max_distance)
+        if len(self._memo) >= MEMO_SIZE:
+            self._memo.clear()
+        self._memo[word] = name
+        return name
+
+    def __len__(self):
+        return len(self.names)
+
+
+def _django_ready() -> bool:
+    try:
+        from django.apps import apps
+        return apps.ready
+    except ImportError:
+        return False
+
+
+def _catalog_version():
+    """
+    鱼类数据的版本标识：数据库中鱼的数量和最近更新时间，数据库不可用时为数据文件的修改时间
+    """
+    if _django_ready():
+        from django.db import DatabaseError
+        from django.db.models import Count, Max
+        from wiki.models import Fish
+        try:
+            version = Fish.objects.aggregate(count=Count("id"), updated_at=Max("updated_at"))
+            if version["count"]:
+                return ("db", version["count"], version["updated_at"])
+        except DatabaseError:
+            logger.warning("读取鱼类表失败，使用数据文件", exc_info=True)
+    try:
+        return ("file", os.path.getmtime(FISH_DATA_PATH))
+    except OSError:
+        return ("none",)
+
+
+def _load_names(version) -> list[str]:
+    if version[0] == "db":
+        from wiki.models import Fish
+        names = list(Fish.objects.exclude(name__isnull=True).values_list("name", flat=True))
+    elif version[0] == "file":
+        with open(FISH_DATA_PATH, "r", encoding="utf-8") as f:
+            names = [item.get("name") for item in json.load(f)]
+    else:
+        names = []
+    return names + EXTRA_FISH_NAMES
+
+
+_matcher = None
+_matcher_version = None
+_checked_at = 0.0
+_matcher_lock = threading.Lock()
+
+def get_fish_name_matcher() -> FishNameMatcher:
+    """
+    获取进程内共享的鱼名匹配器
+    每隔CHECK_INTERVAL秒检查一次鱼类数据是否变化，变化时重建
+    """
+    global _matcher, _matcher_version, _checked_at
+    if _matcher is None or time.monotonic() - _checked_at > CHECK_INTERVAL:
+        with _matcher_lock:
+            if _matcher is None or time.monotonic() - _checked_at > CHECK_INTERVAL:
+                version = _catalog_version()
+                if _matcher is None or version != _matcher_version:
+                    _matcher = FishNameMatcher(_load_names(version), version)
+                    _matcher_version = version
+                _checked_at = time.monotonic()
+    return _matcher
+
+def get_catalog_version() -> str:
+    """
+    当前鱼名匹配器对应的鱼类数据版本，鱼类数据变化时随之变化（检查间隔见CHECK_INTERVAL）
+    """
+    return repr(get_fish_name_matcher().version)
+
+def invalidate_fish_name_matcher():
+    """
+    丢弃当前的鱼名匹配器，下次使用时重新加载（鱼类表变化时调用）
+    """
+    global _matcher
+    with _matcher_lock:
+        _matcher = None
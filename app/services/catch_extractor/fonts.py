@@ -0,0 +1,71 @@
+import os
+import threading
+from PIL import ImageFont
+from services.catch_extractor.config import get_setting
+
+# 按优先级排列的候选中文字体，字体名由PIL在系统字体目录中查找
+FONT_CANDIDATES = [
+    "SimHei" if os.name == 'nt' else "NotoSansCJK-Regular.ttc",  # 黑体 / 思源黑体
+    "/usr/share/fonts/truetype/droid/DroidSansFallbackFull.ttf",  # Linux
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",  # 文泉驿微米黑
+    "/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc",    # 文泉驿正黑
+    "/System/Library/Fonts/PingFang.ttc",  # macOS
+    "C:/Windows/Fonts/simsun.ttc",  # Windows宋体
+    "C:/Windows/Fonts/simhei.ttf",  # Windows黑体
+    "C:/Windows/Fonts/msyh.ttc"     # Windows微软雅黑
+]
+
+_font_source = None
+_font_source_resolved = False
+_fonts = {}
+_lock = threading.Lock()
+
+def _resolve_font_source():
+    """
+    确定可用的中文字体，只在进程内探测一次
+    优先使用ANNOTATION_FONT_PATH配置的字体（例如容器内打包的字体文件）
+    :return: 字体路径或字体名，均不可用时返回None
+    """
+    configured = get_setting("ANNOTATION_FONT_PATH")
+    candidates = [configured] if configured else []
+    candidates += FONT_CANDIDATES
+    for source in candidates:
+        try:
+            ImageFont.truetype(source, 14)
+            return source
+        except IOError:
+            continue
+    print("警告：未找到支持中文的字体，文字可能无法正确显示")
+    return None
+
+def get_font(size: int = 14) -> ImageFont.ImageFont:
+    """
+    获取标注用的字体，按字号缓存，每个进程每个字号只加载一次
+    :param size: 字号
+    :return: ImageFont对象
+    """
+    font = _fonts.get(size)
+    if font is not None:
+        return font
+
+    global _font_source, _font_source_resolved
+    with _lock:
+        if size in _fonts:
+            return _fonts[size]
+        if not _font_source_resolved:
+            _font_source = _resolve_font_source()
+            _font_source_resolved = True
+        if _font_source is not None:
+            font = ImageFont.truetype(_font_source, size)
+        else:
+            font = ImageFont.load_default()
+        _fonts[size] = font
+        return font
+
+def warm_up(sizes=(14,)):
+    """
+    预加载字体，在应用启动时调用，避免首个请求承担字体探测的开销
+    :param sizes: 需要预加载的字号
+    """
+    for size in sizes:
+        get_font(size)
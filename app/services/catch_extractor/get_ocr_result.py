@@ -1,37 +1,84 @@
 import base64
-import urllib
-import requests
+from asgiref.sync import sync_to_async
+import threading
+import urllib.parse
+from services.catch_extractor import http_client, async_http_client
 import os
 import json
 import dotenv
+from services.catch_extractor.token_manager import AccessTokenManager, get_token_store
 
 dotenv.load_dotenv()
 
 API_KEY = os.getenv("BAIDU_API_KEY")
 SECRET_KEY = os.getenv("BAIDU_SECRET_KEY")
 
-def get_ocr_result(image_url: str = None, image_path: str = None):
+# 百度OCR返回的token无效/过期错误码
+INVALID_TOKEN_ERROR_CODES = (110, 111)
+
+OCR_URL = "https://aip.baidubce.com/rest/2.0/ocr/v1/accurate?access_token="
+
+OCR_HEADERS = {
+    'Content-Type': 'application/x-www-form-urlencoded',
+    'Accept': 'application/json'
+}
+
+def build_ocr_payload(image_url: str = None, image_path: str = None, image_base64: str = None) -> bytes:
+    """
+    构造百度OCR的请求体
+    """
     if image_url:
         image_type = "url"
-    elif image_path:
+    elif image_path or image_base64:
         image_type = "local"
     else:
-        raise ValueError("image_url or image_path is required")
+        raise ValueError("image_url, image_path or image_base64 is required")
 
-    url = "https://aip.baidubce.com/rest/2.0/ocr/v1/accurate?access_token=" + get_access_token()
     if image_type == "url":
         payload='url=' + image_url + '&detect_direction=false&vertexes_location=false&paragraph=false&probability=false&char_probability=false&multidirectional_recognize=false'
+    elif image_base64:
+        payload = 'image=' + urllib.parse.quote_plus(image_base64)
     elif image_type == "local":
         payload = 'image=' + get_file_content_as_base64(image_path, True)
-    
-    headers = {
-        'Content-Type': 'application/x-www-form-urlencoded',
-        'Accept': 'application/json'
-    }
+    return payload.encode("utf-8")
+
+def get_ocr_result(image_url: str = None, image_path: str = None, image_base64: str = None,
+                   timeout: float = None):
+    payload = build_ocr_payload(image_url=image_url, image_path=image_path, image_base64=image_base64)
 
-    response = requests.request("POST", url, headers=headers, data=payload.encode("utf-8"))
-    
-    return response.json()
+    access_token = get_access_token(timeout=timeout)
+    response = http_client.post(OCR_URL + access_token, headers=OCR_HEADERS, data=payload, timeout=timeout)
+    result = response.json()
+
+    # token被提前吊销或过期时，刷新token后重试一次
+    if result.get("error_code") in INVALID_TOKEN_ERROR_CODES:
+        get_token_manager().invalidate(access_token)
+        response = http_client.post(OCR_URL + get_access_token(timeout=timeout), headers=OCR_HEADERS, data=payload,
+                                    timeout=timeout)
+        result = response.json()
+
+    return result
+
+async def get_ocr_result_async(image_url: str = None, image_base64: str = None, timeout: float = None):
+    """
+    get_ocr_result的异步版本，使用共享的httpx.AsyncClient发起请求
+    token缓存的读取和刷新可能访问数据库（django缓存后端），通过sync_to_async在Django的同步线程中执行
+    """
+    payload = build_ocr_payload(image_url=image_url, image_base64=image_base64)
+
+    access_token = await sync_to_async(get_access_token)(timeout)
+    response = await async_http_client.post(OCR_URL + access_token, headers=OCR_HEADERS, content=payload,
+                                            timeout=timeout)
+    result = response.json()
+
+    if result.get("error_code") in INVALID_TOKEN_ERROR_CODES:
+        await sync_to_async(get_token_manager().invalidate)(access_token)
+        access_token = await sync_to_async(get_access_token)(timeout)
+        response = await async_http_client.post(OCR_URL + access_token, headers=OCR_HEADERS, content=payload,
+                                                timeout=timeout)
+        result = response.json()
+
+    return result
 
 def get_file_content_as_base64(path, urlencoded=False):
     """
@@ -46,14 +93,42 @@ def get_file_content_as_base64(path, urlencoded=False):
             content = urllib.parse.quote_plus(content)
     return content
 
-def get_access_token():
+def fetch_access_token(timeout: float = None):
     """
-    使用 AK，SK 生成鉴权签名（Access Token）
-    :return: access_token，或是None(如果错误)
+    使用 AK，SK 请求新的鉴权签名（Access Token）
+    :param timeout: 请求超时时间（秒）
+    :return: (access_token, 有效期秒数)
     """
     url = "https://aip.baidubce.com/oauth/2.0/token"
     params = {"grant_type": "client_credentials", "client_id": API_KEY, "client_secret": SECRET_KEY}
-    return str(requests.post(url, params=params).json().get("access_token"))
+    result = http_client.post(url, params=params, timeout=timeout).json()
+    if "access_token" not in result:
+        raise RuntimeError(f"获取百度access_token失败: {result.get('error_description', result)}")
+    return str(result["access_token"]), float(result.get("expires_in", 30 * 24 * 3600))
+
+_token_manager = None
+_token_manager_lock = threading.Lock()
+
+def get_token_manager() -> AccessTokenManager:
+    """
+    获取百度token管理器，首次使用时才创建token存储（导入模块时不创建目录、不读取配置）
+    百度token有效期约30天，缓存并在过期前一天刷新
+    """
+    global _token_manager
+    if _token_manager is None:
+        with _token_manager_lock:
+            if _token_manager is None:
+                _token_manager = AccessTokenManager(fetch_access_token, store=get_token_store(),
+                                                    key="baidu_ocr_access_token")
+    return _token_manager
+
+def get_access_token(timeout: float = None):
+    """
+    获取鉴权签名（Access Token），优先使用缓存的token
+    :param timeout: 刷新token时的请求超时时间（秒）
+    :return: access_token
+    """
+    return get_token_manager().get_token(timeout=timeout)
 
 if __name__ == '__main__':
     result = get_ocr_result(image_path='/home/ubuntu/github/rf4/app/services/catch_extractor/main_result.png')
@@ -0,0 +1,116 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+from services.catch_extractor.config import get_setting
+
+# 建立连接的超时时间（秒）
+CONNECT_TIMEOUT = get_setting("HTTP_CONNECT_TIMEOUT", 5, float)
+# 等待响应的超时时间（秒），调用方未指定timeout时使用
+READ_TIMEOUT = get_setting("HTTP_READ_TIMEOUT", 30, float)
+# 连接失败、超时或5xx/429时的最大重试次数
+MAX_RETRIES = get_setting("HTTP_MAX_RETRIES", 2, int)
+# 重试退避系数，第n次重试前等待 backoff * 2^(n-1) 秒
+RETRY_BACKOFF = get_setting("HTTP_RETRY_BACKOFF", 0.5, float)
+# 缓存连接池的主机数
+POOL_CONNECTIONS = get_setting("HTTP_POOL_CONNECTIONS", 10, int)
+# 每个主机的最大连接数，连接用尽时阻塞等待空闲连接
+POOL_MAXSIZE = get_setting("HTTP_POOL_MAXSIZE", 10, int)
+# 等待空闲连接的超时时间（秒），超时抛出urllib3.exceptions.EmptyPoolError
+POOL_TIMEOUT = get_setting("HTTP_POOL_TIMEOUT", 10, float)
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# 读取阶段出错（如读取超时）和5xx/429时重试的方法；连接失败时请求尚未发出，对所有方法重试
+# roboflow推理和百度OCR（POST）按请求计费，服务端可能已经处理了请求，重试会重复计费，还会让单次调用超出提取的总时限
+RETRY_METHODS = frozenset(["GET", "HEAD"])
+
+
+class PoolTimeoutMixin:
+    """
+    连接池用尽时最多等待POOL_TIMEOUT秒（requests调用urlopen时不传pool_timeout，默认会一直等待）
+    """
+
+    def urlopen(self, *args, pool_timeout=None, **kwargs):
+        return super().urlopen(*args, pool_timeout=POOL_TIMEOUT if pool_timeout is None else pool_timeout, **kwargs)
+
+
+class TimeoutHTTPConnectionPool(PoolTimeoutMixin, HTTPConnectionPool):
+    pass
+
+
+class TimeoutHTTPSConnectionPool(PoolTimeoutMixin, HTTPSConnectionPool):
+    pass
+
+
+class PoolTimeoutAdapter(HTTPAdapter):
+    """
+    连接池用尽时阻塞等待空闲连接，等待时间不超过POOL_TIMEOUT
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": TimeoutHTTPConnectionPool,
+                                                   "https": TimeoutHTTPSConnectionPool}
+
+
+_session = None
+_session_lock = threading.Lock()
+
+def create_session() -> requests.Session:
+    """
+    创建带连接池、keep-alive和重试策略的Session
+    :return: requests.Session
+    """
+    retry = Retry(
+        total=MAX_RETRIES,
+        connect=MAX_RETRIES,
+        read=MAX_RETRIES,
+        status=MAX_RETRIES,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUS_CODES,
+        # 读取阶段的错误和5xx/429只对RETRY_METHODS重试，连接失败对所有方法重试
+        allowed_methods=RETRY_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = PoolTimeoutAdapter(pool_connections=POOL_CONNECTIONS,
+                                 pool_maxsize=POOL_MAXSIZE,
+                                 max_retries=retry,
+                                 pool_block=True)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def get_session() -> requests.Session:
+    """
+    获取进程内共享的Session，所有外部调用复用同一组连接池
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+def request(method: str, url: str, timeout=None, **kwargs) -> requests.Response:
+    """
+    发起HTTP请求
+    :param method: 请求方法
+    :param url: 请求地址
+    :param timeout: 超时时间（秒），可为(连接超时, 读取超时)元组；为数字时作为读取超时；为None时使用默认配置
+    :return: requests.Response
+    """
+    if timeout is None:
+        timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+    elif not isinstance(timeout, tuple):
+        timeout = (min(CONNECT_TIMEOUT, timeout), timeout)
+    return get_session().request(method, url, timeout=timeout, **kwargs)
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
@@ -1,116 +1,469 @@
 import os
+import asyncio
+import logging
 import json
+import base64
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from io import BytesIO
+from asgiref.sync import sync_to_async
 from PIL import Image
-from services.catch_extractor.fish_cards import get_fish_cards_result
-from services.catch_extractor.roboflow_format import convert_yolo_to_standard
-from services.catch_extractor.get_ocr_result import get_ocr_result
+from services.catch_extractor.config import get_setting
+from services.catch_extractor.result_cache import get_result_cache
+from services.catch_extractor.matching import group_words_by_card
+from services.catch_extractor import card_detector
+from services.catch_extractor.card_detector import detect_fish_cards, detect_fish_cards_async
+from services.catch_extractor.fish_names import get_catalog_version
+from services.catch_extractor.ocr_backends import get_ocr_backend
+from services.catch_extractor.preprocess import prepare_upload, sell_list_box, JPEG_QUALITY
+from services.catch_extractor.card_cache import CardCache, get_card_cache, build_montage, map_montage_result
 from services.catch_extractor.utils import (BoundingBox, 
-                   load_image_from_url, 
-                   load_image_from_file, 
+                   BoxArray, 
+                   load_bytes_from_url, 
                    save_image_to_file, 
                    draw_bounding_boxes_on_image,
+                   encode_image,
+                   ENCODED_PNG_KEY,
                    get_field_from_word)
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
+logger = logging.getLogger(__name__)
 
-def extract_fishes(image_url: str = None, image_path: str = None) -> tuple[Image.Image, list[list[str]]]:
+# 单次远程调用的超时时间（秒）
+REQUEST_TIMEOUT = get_setting("CATCH_EXTRACTOR_REQUEST_TIMEOUT", 15, float)
+# 并发远程调用的总截止时间（秒）
+DEADLINE = get_setting("CATCH_EXTRACTOR_DEADLINE", 30, float)
+
+# 进程内共享的线程池，用于并发发起目标检测和OCR请求
+_executor = ThreadPoolExecutor(max_workers=get_setting("CATCH_EXTRACTOR_MAX_WORKERS", 8, int),
+                               thread_name_prefix="catch_extractor")
+
+# 每张图片同时发起的远程调用数（目标检测、OCR），批量提取时按此计算调用线程池的大小
+CALLS_PER_IMAGE = 2
+
+def result_cache_scope() -> tuple:
     """
-    提取图片中的鱼
-    :param image_url: 图片url
-    :param image_path: 图片路径，绝对路径
-    :return: 图片和fishes
+    影响提取结果的配置和数据：OCR后端、鱼卡片检测方式、鱼类数据版本，作为结果缓存键的一部分
     """
-    if image_url:
-        image_type = "url"
-    elif image_path:
-        image_type = "local"
-    else:
-        raise ValueError("image_url or image_path is required")
-    
-    # 0. 加载图片
-    if image_type == "url":
-        image = load_image_from_url(image_url)
-    elif image_type == "local":
-        image = load_image_from_file(image_path)
-    
-    # 1. 调用roboflow目标检测工作流，识别fish_cards
-    if image_type == "url":
-        fish_cards_result = get_fish_cards_result(image_url=image_url)
-    elif image_type == "local":
-        fish_cards_result = get_fish_cards_result(image_path=image_path)
+    return get_ocr_backend().name, card_detector.DETECTOR, get_catalog_version()
 
-    # 2. 调用baidu_ocr_api，识别文字
-    if image_type == "url":
-        ocr_result = get_ocr_result(image_url=image_url)
-    elif image_type == "local":
-        ocr_result = get_ocr_result(image_path=image_path)
+def run_concurrently(calls: dict, deadline: float = None, executor: ThreadPoolExecutor = None) -> dict:
+    """
+    并发执行多个互不依赖的调用，并等待全部完成
+    :param calls: {名称: (函数, 关键字参数)}
+    :param deadline: 总截止时间（秒），为None时使用DEADLINE
+    :param executor: 执行调用的线程池，为None时使用进程内共享的线程池
+    :return: {名称: 调用结果}
+    """
+    deadline = DEADLINE if deadline is None else deadline
+    executor = executor or _executor
+    futures = {name: executor.submit(func, **kwargs) for name, (func, kwargs) in calls.items()}
 
-    # 3. 将roboflow结果转换为标准格式
-    stardard_fish_cards_results = convert_yolo_to_standard(fish_cards_result)
+    done, not_done = wait(futures.values(), timeout=deadline, return_when=FIRST_EXCEPTION)
+    for future in done:
+        # 任一调用出错时，取消尚未开始的调用并抛出异常
+        if future.exception() is not None:
+            for pending in not_done:
+                pending.cancel()
+            raise future.exception()
+    if not_done:
+        for pending in not_done:
+            pending.cancel()
+        names = [name for name, future in futures.items() if future in not_done]
+        raise TimeoutError(f"远程调用超过截止时间 {deadline} 秒仍未完成: {', '.join(names)}")
 
-    # 4. 转化为BoundingBox列表
+    return {name: future.result() for name, future in futures.items()}
+
+def to_fish_card_boxes(stardard_fish_cards_results: dict) -> list[BoundingBox]:
+    """
+    将标准格式的鱼卡片检测结果转化为BoundingBox列表
+    :param stardard_fish_cards_results: 与convert_yolo_to_standard相同结构的结果
+    :return: BoundingBox列表
+    """
     fish_cards = []
     for item in stardard_fish_cards_results['result']:
         location = item['location']
         left, top, width, height = location['left'], location['top'], location['width'], location['height']
         fish_cards.append(BoundingBox(left, top, width, height, False))
+    return fish_cards
 
-    # 5. 解析ocr结果，获取文字信息
+def parse_words(ocr_result: dict, image_size: tuple[int, int] = None) -> list[dict]:
+    """
+    解析ocr结果，获取鱼市出售列表中的文字块，相互重叠的文字块合并为一个
+    :param ocr_result: 百度OCR格式的识别结果
+    :param image_size: 原图的(宽, 高)，用于确定列表区域，为None时按1920x1080计算
+    :return: 文字块列表，每项包含words和BoundingBox
+    """
     words_cards = []
-    # 只从鱼市出售页面的列表中提取文字
-    unmarked_bounding = BoundingBox(410, 126, 1920 - 410, 1080 - 126, False)
-    for item in ocr_result['words_result']:
+    # 只从鱼市出售页面的列表中提取文字（与上传时裁剪的区域一致）
+    left, top, right, bottom = sell_list_box(image_size)
+    unmarked_bounding = BoundingBox(left, top, right - left, bottom - top, False)
+    words_result = ocr_result['words_result']
+    in_unmarked = BoxArray.from_baidu_words_result(words_result).is_overlapping(unmarked_bounding)
+    for item, is_inside in zip(words_result, in_unmarked):
         location = item['location']
         left, top, width, height = location['left'], location['top'], location['width'], location['height']
         item['BoundingBox'] = BoundingBox(left, top, width, height, False, item['words'])
-        if unmarked_bounding.is_overlapping(item['BoundingBox']):
+        if is_inside:
             # 如果和上一个item的BoundingBox重叠，则合并
             if words_cards and words_cards[-1]['BoundingBox'].is_overlapping(item['BoundingBox']):
                 words_cards[-1]['BoundingBox'] += item['BoundingBox']
                 words_cards[-1]['words'] += item['words']
             else:
                 words_cards.append(item)
+    return words_cards
 
-    # 6. 对于每个word_card，匹配与其重合的fish_card
-    for i, word_card in enumerate(words_cards):
-        for j, fish_card in enumerate(fish_cards):
-            if word_card['BoundingBox'].is_overlapping(fish_card):
-                words_cards[i]['fish_card_index'] = j
-                break
+def collect_card_fields(fish_cards: list[BoundingBox], words_cards: list[dict]) -> tuple[dict, list[dict]]:
+    """
+    将文字块匹配到鱼卡片，整理出每张卡片的字段
+    :param fish_cards: 鱼卡片列表
+    :param words_cards: 文字块列表
+    :return: 按卡片序号分组的文字块，以及每张卡片的字段 {time_percentage, fish_name, weight, price}
+    """
+    # 用网格索引为每个word_card匹配与其重合的fish_card，并按fish_card分组
+    words_by_card = group_words_by_card(words_cards, fish_cards)
 
-    # 7 按每个fish整理word_cards
-    fishes = []
+    card_fields = []
     for i in range(len(fish_cards)):
         fish = dict()
-        for word_card in words_cards:
+        for word_card in words_by_card.get(i, []):
             # 排除误识别的字块，如"√"和"×"
             if len(word_card['words']) < 2:
                 continue
-            fish_card_index = word_card.get('fish_card_index', None)
-            if fish_card_index is not None and fish_card_index == i:
-                item = get_field_from_word(word_card['words'])
-                field_name, field_value = item['key'], item['value']
-                fish[field_name] = field_value
+            item = get_field_from_word(word_card['words'])
+            field_name, field_value = item['key'], item['value']
+            fish[field_name] = field_value
+        card_fields.append(fish)
+    return words_by_card, card_fields
+
+def to_fish_rows(card_fields: list[dict]) -> list[list[str]]:
+    """
+    将每张卡片的字段整理为fishes，跳过没有识别出字段的卡片
+    """
+    fishes = []
+    for fish in card_fields:
         if len(fish) > 0:
             fishes.append([fish.get('time_percentage', ''), 
                            fish.get('fish_name', ''), 
                            fish.get('weight', ''), 
                            fish.get('price', '')])
+    return fishes
+
+def get_image_size(image: Image.Image = None, image_bytes: bytes = None):
+    """
+    图片的(宽, 高)，只有字节时读取文件头获取，都没有时（如只提供image_url）返回None
+    """
+    if image is not None:
+        return image.size
+    if image_bytes is not None:
+        return Image.open(BytesIO(image_bytes)).size
+    return None
+
+def parse_fishes(fish_cards: list[BoundingBox], ocr_result: dict,
+                 image_size: tuple[int, int] = None) -> tuple[list[dict], list[list[str]]]:
+    """
+    解析ocr结果，将文字块匹配到鱼卡片并整理出每条鱼的字段
+    :param fish_cards: 鱼卡片列表
+    :param ocr_result: 百度OCR格式的识别结果
+    :param image_size: 原图的(宽, 高)，见parse_words
+    :return: 文字块列表和fishes
+    """
+    # 5. 解析ocr结果，获取文字信息
+    words_cards = parse_words(ocr_result, image_size)
+
+    # 6~7. 按fish_card分组并整理每个fish的字段
+    _, card_fields = collect_card_fields(fish_cards, words_cards)
+    fishes = to_fish_rows(card_fields)
 
     # 8 保存fishes
     # with open(os.path.join(current_dir, 'fishes.json'), 'w') as f:
     #     json.dump(fishes, f, indent=4, ensure_ascii=False)
     print(json.dumps(fishes, indent=4, ensure_ascii=False))
 
-    # 9 绘制结果
+    return words_cards, fishes
+
+def prepare_card_ocr(card_cache: CardCache, ocr_backend, image: Image.Image, fish_cards: list[BoundingBox]) -> dict:
+    """
+    查询卡片缓存，并把未命中的卡片拼接成一张图片，准备发送给OCR后端
+    :return: 卡片识别上下文，包含缓存键、缓存内容、未命中的卡片序号，以及OCR后端的调用参数（全部命中时为None）
+    """
+    keys, entries = card_cache.lookup(image, fish_cards)
+    missing = [i for i, entry in enumerate(entries) if entry is None]
+    context = {"keys": keys, "entries": entries, "missing": missing, "slots": None, "ocr_kwargs": None,
+               "image_size": image.size}
+    if missing:
+        montage, slots = build_montage(image, [fish_cards[i] for i in missing])
+        context["slots"] = slots
+        if ocr_backend.needs_fish_cards:
+            context["ocr_kwargs"] = {"image_bytes": encode_image(montage, "png"), "fish_cards": slots,
+                                     "timeout": DEADLINE}
+        else:
+            montage_bytes = encode_image(montage, "jpeg", JPEG_QUALITY)
+            context["ocr_kwargs"] = {"image_base64": base64.b64encode(montage_bytes).decode("utf8"),
+                                     "timeout": REQUEST_TIMEOUT}
+    return context
+
+def merge_card_results(card_cache: CardCache, fish_cards: list[BoundingBox], context: dict,
+                       ocr_result: dict = None, stats: dict = None) -> tuple[list[dict], list[list[str]]]:
+    """
+    解析未命中卡片的OCR结果并写入卡片缓存，与命中的卡片合并为完整结果
+    :param context: prepare_card_ocr返回的卡片识别上下文
+    :param ocr_result: 拼接图的OCR结果，全部命中时为None
+    :param stats: 不为None时写入本次请求的卡片缓存命中统计
+    :return: 文字块列表和fishes
+    """
+    entries, missing = context["entries"], context["missing"]
+    card_fields = [entry["fields"] if entry is not None else None for entry in entries]
+    words_cards = []
+
+    # 1. 未命中的卡片：解析OCR结果，写入缓存
+    if missing:
+        missing_cards = [fish_cards[i] for i in missing]
+        map_montage_result(ocr_result, context["slots"], missing_cards)
+        new_words_cards = parse_words(ocr_result, context["image_size"])
+        words_by_card, new_fields = collect_card_fields(missing_cards, new_words_cards)
+        words_cards.extend(new_words_cards)
+        for j, i in enumerate(missing):
+            card = fish_cards[i]
+            words = [(wc['BoundingBox'].left - card.left, wc['BoundingBox'].top - card.top,
+                      wc['BoundingBox'].width, wc['BoundingBox'].height, wc['words'])
+                     for wc in words_by_card.get(j, [])]
+            card_cache.set(context["keys"][i], new_fields[j], words)
+            card_fields[i] = new_fields[j]
+
+    # 2. 命中的卡片：按缓存的相对位置还原文字块，用于绘制标注
+    for card, entry in zip(fish_cards, entries):
+        if entry is None:
+            continue
+        for left, top, width, height, words in entry["words"]:
+            words_cards.append({'words': words,
+                                'BoundingBox': BoundingBox(card.left + left, card.top + top, width, height, False, words)})
+
+    fishes = to_fish_rows(card_fields)
+    hits = len(fish_cards) - len(missing)
+    hit_rate = hits / len(fish_cards) if fish_cards else 0.0
+    if stats is not None:
+        stats["card_cache"] = {"cards": len(fish_cards), "hits": hits, "misses": len(missing),
+                               "hit_rate": round(hit_rate, 3)}
+    return words_cards, fishes
+
+def annotate_image(image: Image.Image, fish_cards: list[BoundingBox], words_cards: list[dict]) -> Image.Image:
+    """
+    在图片上绘制鱼卡片和文字块
+    """
     draw_bounding_boxes_on_image(image, fish_cards)
     draw_bounding_boxes_on_image(image, [wc['BoundingBox'] for wc in words_cards], 
                                  box_color=(255, 255, 255), text_color=(255, 153, 51))
+    return image
+
+def cache_result(result_cache, cache_key: str, fishes: list[list[str]], image: Image.Image = None, elapsed: float = None):
+    """
+    将提取结果写入结果缓存，图片以PNG编码保存
+    编码结果记在图片上，响应同样输出PNG时不再重复编码
+    """
+    image_png = encode_result_image(image) if image is not None else None
+    result_cache.set(cache_key, fishes, image_png, elapsed=elapsed)
+
+def encode_result_image(image: Image.Image) -> bytes:
+    """
+    以PNG编码结果图片，已编码过时直接返回
+    """
+    image_png = image.info.get(ENCODED_PNG_KEY)
+    if image_png is None:
+        image_png = encode_image(image, "png")
+        image.info[ENCODED_PNG_KEY] = image_png
+    return image_png
+
+def load_cached_image(image_png: bytes) -> Image.Image:
+    """
+    打开缓存中的图片（只读取文件头，需要时才解码），响应输出PNG时直接使用缓存的字节
+    """
+    image = Image.open(BytesIO(image_png))
+    image.info[ENCODED_PNG_KEY] = image_png
+    return image
+
+def extract_fishes(image: bytes | Image.Image = None, image_url: str = None, image_path: str = None,
+                   use_cache: bool = True, annotate: bool = True,
+                   stats: dict = None, executor: ThreadPoolExecutor = None) -> tuple[Image.Image | None, list[list[str]]]:
+    """
+    提取图片中的鱼
+    :param image: 图片原始字节或PIL图片对象，全程在内存中处理
+    :param image_url: 图片url
+    :param image_path: 图片路径，绝对路径
+    :param use_cache: 是否使用以图片内容哈希为键的结果缓存和卡片缓存
+    :param annotate: 是否绘制标注图片，为False时跳过解码和绘制，返回的图片为None
+    :param stats: 不为None时写入本次请求的卡片缓存命中统计（stats["card_cache"]）
+    :param executor: 发起远程调用的线程池，为None时使用进程内共享的线程池（批量提取时由调用方按并发数创建）
+    :return: 图片和fishes
+    """
+    if image is not None:
+        image_type = "memory"
+    elif image_url:
+        image_type = "url"
+    elif image_path:
+        image_type = "local"
+    else:
+        raise ValueError("image, image_url or image_path is required")
+
+    start = time.perf_counter()
+
+    # 0. 将输入统一为图片原始字节，本地文件只读取一次
+    image_bytes = None
+    if image_type == "memory":
+        if isinstance(image, Image.Image):
+            buffer = BytesIO()
+            image.save(buffer, format='PNG')
+            image_bytes = buffer.getvalue()
+        else:
+            image_bytes = image
+            image = None
+    elif image_type == "local":
+        with open(image_path, "rb") as f:
+            image_bytes = f.read()
+
+    # 命中结果缓存时直接返回，不再调用远程接口
+    result_cache = get_result_cache() if use_cache else None
+    if result_cache is not None:
+        if image_type == "url":
+            image_bytes = load_bytes_from_url(image_url, timeout=REQUEST_TIMEOUT)
+        cache_key = result_cache.make_key(image_bytes, result_cache_scope())
+        cached = result_cache.get(cache_key, require_image=annotate)
+        if cached is not None:
+            image = load_cached_image(cached["image"]) if annotate else None
+            return image, cached["fishes"]
+
+    # 1~2. 并发检测fish_cards（roboflow工作流或本地OpenCV）、识别文字（url模式下同时下载图片）
+    # 互不依赖，并发执行时总耗时约为其中最慢的一次调用
+    # 只识别卡片区域的OCR后端（如tesseract）需要等fish_cards检测完成后再识别
+    # 启用卡片缓存时，需要先检测出fish_cards，再只识别未命中缓存的卡片
+    ocr_backend = get_ocr_backend()
+    card_cache = get_card_cache() if use_cache else None
+    deferred_ocr = ocr_backend.needs_fish_cards or card_cache is not None
+    need_image_bytes = annotate or deferred_ocr
+    calls = {}
+    if image_bytes is not None:
+        # 上传前裁剪到列表区域并压缩，只做一次base64编码，两个接口共用；返回的坐标按transform换算回原图
+        image_base64, transform = prepare_upload(image_bytes)
+        source = {"image_base64": image_base64, "transform": transform}
+    else:
+        source = {"image_url": image_url}
+        if need_image_bytes:
+            calls["image"] = (load_bytes_from_url, {"url": image_url, "timeout": REQUEST_TIMEOUT})
+    calls["fish_cards"] = (detect_fish_cards, {**source, "image_bytes": image_bytes, "timeout": REQUEST_TIMEOUT})
+    if not deferred_ocr:
+        calls["ocr"] = (ocr_backend.recognize, {**source, "timeout": REQUEST_TIMEOUT})
+    results = run_concurrently(calls, executor=executor)
+    logger.debug("远程调用耗时: %.2fs", time.perf_counter() - start)
+
+    if image_bytes is None and need_image_bytes:
+        image_bytes = results["image"]
+    if image is None and annotate:
+        image = Image.open(BytesIO(image_bytes))
+    stardard_fish_cards_results = results["fish_cards"]
+
+    # 4. 转化为BoundingBox列表
+    fish_cards = to_fish_card_boxes(stardard_fish_cards_results)
+
+    if card_cache is not None:
+        # 5~8. 命中卡片缓存的卡片直接复用字段，只识别和解析未命中的卡片
+        source_image = image if image is not None else Image.open(BytesIO(image_bytes))
+        context = prepare_card_ocr(card_cache, ocr_backend, source_image, fish_cards)
+        ocr_result = ocr_backend.recognize(**context["ocr_kwargs"]) if context["missing"] else None
+        words_cards, fishes = merge_card_results(card_cache, fish_cards, context, ocr_result, stats)
+    else:
+        if ocr_backend.needs_fish_cards:
+            ocr_result = ocr_backend.recognize(image_bytes=image_bytes, fish_cards=fish_cards, timeout=DEADLINE)
+        else:
+            ocr_result = results["ocr"]
+
+        # 5~8. 解析ocr结果，按fish_card整理出fishes
+        words_cards, fishes = parse_fishes(fish_cards, ocr_result, get_image_size(image, image_bytes))
+
+    # 9 绘制结果
+    if annotate:
+        annotate_image(image, fish_cards, words_cards)
+
+    # 10 写入结果缓存
+    if result_cache is not None:
+        cache_result(result_cache, cache_key, fishes, image, elapsed=time.perf_counter() - start)
 
     # 返回图片和fishes
     return image, fishes
     
 
+async def extract_fishes_async(image: bytes, use_cache: bool = True, annotate: bool = True,
+                               stats: dict = None) -> tuple[Image.Image | None, list[list[str]]]:
+    """
+    extract_fishes的异步版本，供ASGI下的异步视图使用
+    远程调用通过httpx.AsyncClient在事件循环中并发执行，不占用线程；
+    可能访问数据库的步骤（缓存读写、鱼名匹配读取鱼类表）通过sync_to_async在Django的同步线程中执行，
+    本地检测、图片预处理和绘制等CPU操作放到asyncio.to_thread中执行，都不阻塞事件循环
+    :param image: 图片原始字节
+    :param use_cache: 是否使用以图片内容哈希为键的结果缓存和卡片缓存
+    :param annotate: 是否绘制标注图片，为False时返回的图片为None
+    :param stats: 不为None时写入本次请求的卡片缓存命中统计（stats["card_cache"]）
+    :return: 图片和fishes
+    """
+    start = time.perf_counter()
+
+    # 命中结果缓存时直接返回，不再调用远程接口
+    result_cache = get_result_cache() if use_cache else None
+    if result_cache is not None:
+        cache_key = result_cache.make_key(image, await sync_to_async(result_cache_scope)())
+        cached = await sync_to_async(result_cache.get)(cache_key, annotate)
+        if cached is not None:
+            result_image = load_cached_image(cached["image"]) if annotate else None
+            return result_image, cached["fishes"]
+
+    # 1~2. 并发检测fish_cards、识别文字
+    ocr_backend = get_ocr_backend()
+    card_cache = get_card_cache() if use_cache else None
+    deferred_ocr = ocr_backend.needs_fish_cards or card_cache is not None
+    image_base64, transform = await asyncio.to_thread(prepare_upload, image)
+    calls = [detect_fish_cards_async(image_bytes=image, image_base64=image_base64, timeout=REQUEST_TIMEOUT,
+                                     transform=transform)]
+    if not deferred_ocr:
+        calls.append(ocr_backend.recognize_async(image_base64=image_base64, timeout=REQUEST_TIMEOUT,
+                                                 transform=transform))
+    try:
+        results = await asyncio.wait_for(asyncio.gather(*calls), timeout=DEADLINE)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"远程调用超过截止时间 {DEADLINE} 秒仍未完成")
+    logger.debug("远程调用耗时: %.2fs", time.perf_counter() - start)
+
+    # 4. 转化为BoundingBox列表
+    fish_cards = to_fish_card_boxes(results[0])
+
+    context = None
+    if card_cache is not None:
+        context = await sync_to_async(prepare_card_ocr)(card_cache, ocr_backend, Image.open(BytesIO(image)),
+                                                        fish_cards)
+        ocr_result = await ocr_backend.recognize_async(**context["ocr_kwargs"]) if context["missing"] else None
+    elif ocr_backend.needs_fish_cards:
+        ocr_result = await ocr_backend.recognize_async(image_bytes=image, fish_cards=fish_cards, timeout=DEADLINE)
+    else:
+        ocr_result = results[1]
+
+    # 5~10. 解析、绘制和写入缓存
+    def parse():
+        if context is not None:
+            return merge_card_results(card_cache, fish_cards, context, ocr_result, stats)
+        return parse_fishes(fish_cards, ocr_result, get_image_size(None, image))
+
+    def render(words_cards):
+        result_image = annotate_image(Image.open(BytesIO(image)), fish_cards, words_cards)
+        if result_cache is not None:
+            encode_result_image(result_image)
+        return result_image
+
+    words_cards, fishes = await sync_to_async(parse)()
+    result_image = await asyncio.to_thread(render, words_cards) if annotate else None
+    if result_cache is not None:
+        await sync_to_async(cache_result)(result_cache, cache_key, fishes, result_image,
+                                          elapsed=time.perf_counter() - start)
+    return result_image, fishes
+
+
 def main():
     INPUT_PATH = 'fish_grid.jpg'
     OUTPUT_IMAGE_PATH = 'main_result.png'
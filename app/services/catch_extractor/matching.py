@@ -0,0 +1,86 @@
+import math
+from collections import defaultdict
+from services.catch_extractor.utils import BoundingBox
+
+
+class GridIndex:
+    """
+    方框的均匀网格索引
+    每个方框登记到其覆盖的所有网格中，查询时只需检查与查询方框覆盖相同网格的候选方框，
+    方框大小相近时（如鱼市出售列表中的卡片），建索引和查询的总耗时接近线性
+    """
+
+    def __init__(self, boxes: list[BoundingBox], error_margin: int = 10, cell_size: tuple = None):
+        """
+        参数:
+            boxes: 被索引的BoundingBox列表
+            error_margin: 横向误差范围，与BoundingBox.is_overlapping一致
+            cell_size: 网格大小(宽, 高)，为None时取方框宽高的中位数
+        """
+        self.boxes = boxes
+        self.error_margin = error_margin
+        if cell_size is None:
+            cell_size = (self._median([box.width for box in boxes]),
+                         self._median([box.height for box in boxes]))
+        self.cell_width, self.cell_height = cell_size
+        self.cells = defaultdict(list)
+        for index, box in enumerate(boxes):
+            # 横向按误差范围扩展后登记，保证与is_overlapping的判定一致
+            for cell in self._cells(box.left - error_margin, box.top, box.right + error_margin, box.bottom):
+                self.cells[cell].append(index)
+
+    @staticmethod
+    def _median(values):
+        values = sorted(v for v in values if v > 0)
+        return values[len(values) // 2] if values else 1
+
+    def _cells(self, left, top, right, bottom):
+        for ix in range(math.floor(left / self.cell_width), math.floor(right / self.cell_width) + 1):
+            for iy in range(math.floor(top / self.cell_height), math.floor(bottom / self.cell_height) + 1):
+                yield ix, iy
+
+    def candidates(self, box: BoundingBox) -> set:
+        """
+        获取可能与box重叠的方框下标
+        """
+        result = set()
+        for cell in self._cells(box.left, box.top, box.right, box.bottom):
+            result.update(self.cells.get(cell, ()))
+        return result
+
+    def first_overlapping(self, box: BoundingBox):
+        """
+        获取与box重叠的方框中下标最小的一个，与按顺序逐个比较再break的结果一致
+        返回:
+            int: 方框下标，没有重叠的方框时返回None
+        """
+        for index in sorted(self.candidates(box)):
+            if box.is_overlapping(self.boxes[index], self.error_margin):
+                return index
+        return None
+
+
+def group_words_by_card(words_cards: list[dict], fish_cards: list[BoundingBox],
+                        error_margin: int = 10) -> dict[int, list[dict]]:
+    """
+    为每个文字块匹配与其重合的鱼卡片，并按鱼卡片分组
+    匹配到的卡片下标同时写入word_card['fish_card_index']
+
+    参数:
+        words_cards: 文字块列表，每项包含'BoundingBox'
+        fish_cards: 鱼卡片BoundingBox列表
+        error_margin: 横向误差范围
+
+    返回:
+        dict: {鱼卡片下标: 按原顺序排列的文字块列表}
+    """
+    groups = defaultdict(list)
+    if not fish_cards:
+        return groups
+    index = GridIndex(fish_cards, error_margin)
+    for word_card in words_cards:
+        fish_card_index = index.first_overlapping(word_card['BoundingBox'])
+        if fish_card_index is not None:
+            word_card['fish_card_index'] = fish_card_index
+            groups[fish_card_index].append(word_card)
+    return groups
@@ -0,0 +1,171 @@
+import os
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_EXCEPTION
+from PIL import Image
+from services.catch_extractor.config import get_setting
+from services.catch_extractor.get_ocr_result import get_ocr_result, get_ocr_result_async
+from services.catch_extractor.preprocess import UploadTransform
+from services.catch_extractor.utils import BoundingBox
+
+
+class OCRBackend(ABC):
+    """
+    OCR后端基类
+    recognize返回与百度OCR一致的结构: {"words_result": [{"words": 文字, "location": {left, top, width, height}}], "words_result_num": n}
+    """
+    name = "base"
+    # 是否需要先检测出鱼卡片，只识别卡片区域
+    needs_fish_cards = False
+
+    @abstractmethod
+    def recognize(self, image_bytes: bytes = None, image_url: str = None, image_base64: str = None,
+                  fish_cards: list[BoundingBox] = None, timeout: float = None, transform: UploadTransform = None) -> dict:
+        """
+        识别图片中的文字
+        :param image_bytes: 图片原始字节
+        :param image_url: 图片url
+        :param image_base64: 图片base64编码
+        :param fish_cards: 鱼卡片列表，needs_fish_cards为True时必须提供
+        :param timeout: 远程调用的超时时间（秒）
+        :param transform: image_base64相对原图的变换（见preprocess.prepare_upload），识别结果需换算回原图坐标
+        :return: 百度OCR格式的识别结果
+        """
+
+    async def recognize_async(self, image_bytes: bytes = None, image_base64: str = None,
+                              fish_cards: list[BoundingBox] = None, timeout: float = None,
+                              transform: UploadTransform = None) -> dict:
+        """
+        recognize的异步版本，默认放到线程中执行；支持异步调用的后端可以覆盖此方法
+        """
+        return await asyncio.to_thread(self.recognize, image_bytes=image_bytes, image_base64=image_base64,
+                                       fish_cards=fish_cards, timeout=timeout, transform=transform)
+
+
+class BaiduOCRBackend(OCRBackend):
+    """
+    百度高精度OCR，识别整张图片
+    """
+    name = "baidu"
+
+    def recognize(self, image_bytes=None, image_url=None, image_base64=None, fish_cards=None, timeout=None,
+                  transform=None):
+        result = get_ocr_result(image_url=image_url, image_base64=image_base64, timeout=timeout)
+        return transform.map_result(result, "words_result") if transform is not None else result
+
+    async def recognize_async(self, image_bytes=None, image_base64=None, fish_cards=None, timeout=None,
+                              transform=None):
+        result = await get_ocr_result_async(image_base64=image_base64, timeout=timeout)
+        return transform.map_result(result, "words_result") if transform is not None else result
+
+
+def _tesseract_crop(crop_bytes: bytes, left: int, top: int, lang: str) -> list[dict]:
+    """
+    识别单张卡片截图中的文字（在子进程中执行）
+    按tesseract的行号将字符合并为行，坐标换算回原图
+    :param crop_bytes: 卡片截图（PNG编码）
+    :param left: 卡片在原图中的左上角x坐标
+    :param top: 卡片在原图中的左上角y坐标
+    :param lang: tesseract语言
+    :return: 百度OCR格式的words_result列表
+    """
+    import pytesseract
+
+    data = pytesseract.image_to_data(Image.open(BytesIO(crop_bytes)), lang=lang, config="--psm 6",
+                                     output_type=pytesseract.Output.DICT)
+    lines = {}
+    for i, text in enumerate(data["text"]):
+        text = text.strip()
+        if not text:
+            continue
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        box = BoundingBox(data["left"][i], data["top"][i], data["width"][i], data["height"][i], False, text)
+        # 中文按字符切分，同一行内直接拼接
+        lines[key] = lines[key] + box if key in lines else box
+
+    words_result = []
+    for box in lines.values():
+        location = box.get_baidu_format()
+        location["left"] += left
+        location["top"] += top
+        words_result.append({"words": box.word, "location": location})
+    return words_result
+
+
+class TesseractOCRBackend(OCRBackend):
+    """
+    本地tesseract OCR，只识别检测出的鱼卡片区域，各卡片在进程池中并行识别
+    """
+    name = "tesseract"
+    needs_fish_cards = True
+
+    def __init__(self, lang: str = "chi_sim", processes: int = None):
+        self.lang = lang
+        self.processes = processes or os.cpu_count()
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(max_workers=self.processes)
+        return self._pool
+
+    def recognize(self, image_bytes=None, image_url=None, image_base64=None, fish_cards=None, timeout=None,
+                  transform=None):
+        if image_bytes is None or fish_cards is None:
+            raise ValueError("image_bytes and fish_cards are required")
+        image = Image.open(BytesIO(image_bytes))
+
+        futures = []
+        for card in fish_cards:
+            location = card.get_baidu_format()
+            left, top = max(0, location["left"]), max(0, location["top"])
+            crop = image.crop((left, top, left + location["width"], top + location["height"]))
+            buffer = BytesIO()
+            crop.save(buffer, format="PNG")
+            futures.append(self._get_pool().submit(_tesseract_crop, buffer.getvalue(), left, top, self.lang))
+
+        # timeout为所有卡片共用的截止时间，而不是每张卡片各自的等待时间
+        done, not_done = wait(futures, timeout=timeout, return_when=FIRST_EXCEPTION)
+        if not_done:
+            for future in not_done:
+                future.cancel()
+            failed = next((future for future in done if future.exception() is not None), None)
+            if failed is not None:
+                raise failed.exception()
+            raise TimeoutError(f"tesseract识别超过 {timeout} 秒仍未完成（{len(not_done)}/{len(futures)} 张卡片）")
+
+        words_result = []
+        for future in futures:
+            words_result.extend(future.result())
+        return {"words_result": words_result, "words_result_num": len(words_result)}
+
+
+_ocr_backends = {}
+_ocr_backends_lock = threading.Lock()
+
+def get_ocr_backend(name: str = None) -> OCRBackend:
+    """
+    获取OCR后端（进程内单例）
+    :param name: 后端名称，baidu或tesseract，为None时使用OCR_BACKEND配置
+    :return: OCRBackend
+    """
+    name = name or get_setting("OCR_BACKEND", "baidu")
+    backend = _ocr_backends.get(name)
+    if backend is None:
+        with _ocr_backends_lock:
+            backend = _ocr_backends.get(name)
+            if backend is None:
+                if name == "baidu":
+                    backend = BaiduOCRBackend()
+                elif name == "tesseract":
+                    backend = TesseractOCRBackend(lang=get_setting("TESSERACT_LANG", "chi_sim"),
+                                                  processes=get_setting("OCR_PROCESSES", None, int))
+                else:
+                    raise ValueError(f"不支持的OCR后端: {name}")
+                _ocr_backends[name] = backend
+    return backend
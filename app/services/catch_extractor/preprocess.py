@@ -0,0 +1,107 @@
+import base64
+from io import BytesIO
+from PIL import Image
+from services.catch_extractor.config import get_setting
+from services.catch_extractor.utils import encode_image
+
+# 上传前是否裁剪、压缩图片（只影响发送给roboflow和百度的图片，返回的坐标会换算回原图）
+ENABLED = get_setting("CATCH_UPLOAD_PREPROCESS", True, bool)
+# 上传图片最长边的像素上限，超过时等比缩小
+MAX_SIDE = get_setting("CATCH_UPLOAD_MAX_SIDE", 1600, int)
+# 上传图片的JPEG压缩质量
+JPEG_QUALITY = get_setting("CATCH_UPLOAD_JPEG_QUALITY", 85, int)
+# 上传图片的字节数上限，超过时逐步降低质量，仍超过时继续缩小
+MAX_BYTES = get_setting("CATCH_UPLOAD_MAX_BYTES", 1024 * 1024, int)
+# 降低质量的下限，避免文字模糊影响识别
+MIN_JPEG_QUALITY = 50
+# 继续缩小时短边的像素下限，达到后不再缩小（即使仍超过MAX_BYTES）
+MIN_SIDE = 320
+
+# 鱼市出售页面列表区域（以1920x1080为基准，按实际分辨率等比缩放），上传裁剪、本地卡片检测和解析OCR结果共用
+SELL_LIST_REGION = (410 / 1920, 126 / 1080, 1.0, 1.0)
+# 无法获得图片尺寸时使用的基准分辨率
+BASE_IMAGE_SIZE = (1920, 1080)
+
+
+def sell_list_box(image_size: tuple[int, int] = None) -> tuple[int, int, int, int]:
+    """
+    列表区域在图片中的像素范围
+    :param image_size: 图片的(宽, 高)，为None时按基准分辨率计算
+    :return: (left, top, right, bottom)
+    """
+    width, height = image_size or BASE_IMAGE_SIZE
+    return (int(SELL_LIST_REGION[0] * width), int(SELL_LIST_REGION[1] * height),
+            int(SELL_LIST_REGION[2] * width), int(SELL_LIST_REGION[3] * height))
+
+
+class UploadTransform:
+    """
+    上传图片相对原图的变换：先裁剪掉左上角(offset_x, offset_y)之外的区域，再按scale缩放
+    """
+    __slots__ = ("offset_x", "offset_y", "scale")
+
+    def __init__(self, offset_x: int = 0, offset_y: int = 0, scale: float = 1.0):
+        self.offset_x = offset_x
+        self.offset_y = offset_y
+        self.scale = scale
+
+    def map_location(self, location: dict) -> dict:
+        """
+        将上传图片中的{left, top, width, height}换算回原图坐标（原地修改）
+        """
+        location["left"] = int(round(location["left"] / self.scale)) + self.offset_x
+        location["top"] = int(round(location["top"] / self.scale)) + self.offset_y
+        location["width"] = int(round(location["width"] / self.scale))
+        location["height"] = int(round(location["height"] / self.scale))
+        return location
+
+    def map_result(self, result: dict, key: str) -> dict:
+        """
+        换算检测/识别结果中所有location的坐标（原地修改）
+        :param result: convert_yolo_to_standard格式（key为result）或百度OCR格式（key为words_result）的结果
+        :param key: 结果列表的字段名
+        :return: result
+        """
+        for item in result.get(key, []):
+            self.map_location(item["location"])
+        return result
+
+    def __repr__(self):
+        return f"UploadTransform(offset_x={self.offset_x}, offset_y={self.offset_y}, scale={self.scale:.3f})"
+
+
+def prepare_upload(image_bytes: bytes) -> tuple[str, UploadTransform | None]:
+    """
+    准备发送给远程接口的图片：裁剪到列表区域，按需缩小，重新编码为不超过MAX_BYTES的JPEG
+    未启用预处理或处理后反而更大时，直接上传原图
+    :param image_bytes: 图片原始字节
+    :return: 上传图片的base64编码和坐标变换（上传原图时为None）
+    """
+    if not ENABLED:
+        return base64.b64encode(image_bytes).decode("utf8"), None
+
+    image = Image.open(BytesIO(image_bytes))
+    left, top, right, bottom = sell_list_box(image.size)
+    image = image.crop((left, top, right, bottom))
+
+    if MAX_SIDE and max(image.size) > MAX_SIDE:
+        scale = MAX_SIDE / max(image.size)
+        image = image.resize((round(image.width * scale), round(image.height * scale)), Image.LANCZOS)
+
+    quality = JPEG_QUALITY
+    upload_bytes = encode_image(image, "jpeg", quality)
+    while MAX_BYTES and len(upload_bytes) > MAX_BYTES:
+        if quality > MIN_JPEG_QUALITY:
+            quality = max(MIN_JPEG_QUALITY, quality - 10)
+        elif min(image.size) * 0.8 < MIN_SIDE:
+            # 再缩小会影响识别，MAX_BYTES过小时不再强求，下面按大小决定上传压缩后的图片还是原图
+            break
+        else:
+            image = image.resize((round(image.width * 0.8), round(image.height * 0.8)), Image.LANCZOS)
+        upload_bytes = encode_image(image, "jpeg", quality)
+
+    if len(upload_bytes) >= len(image_bytes):
+        return base64.b64encode(image_bytes).decode("utf8"), None
+    # 缩小后的实际比例以取整后的宽度为准
+    scale = image.width / (right - left)
+    return base64.b64encode(upload_bytes).decode("utf8"), UploadTransform(left, top, scale)
@@ -0,0 +1,330 @@
+import os
+import time
+import pickle
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from services.catch_extractor.config import get_setting
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def write_file_atomic(path: str, data: bytes, mode: int = 0o666):
+    """
+    先写临时文件（{path}.{进程号}.{线程号}.tmp）再原子替换，避免其他进程读到写了一半的文件
+    :param path: 文件路径
+    :param data: 文件内容
+    :param mode: 文件权限（受umask影响），创建临时文件时即指定，避免写入期间被其他用户读取
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with os.fdopen(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode), "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class CacheBackend(ABC):
+    """
+    缓存后端基类，键为字符串，值为bytes
+    """
+    name = "base"
+
+    @abstractmethod
+    def get(self, key: str):
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float):
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+    def info(self) -> dict:
+        """后端自身的统计信息（条目数、占用字节数等）"""
+        return {}
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    进程内缓存，按最近最少使用（LRU）淘汰，总大小不超过max_bytes
+    """
+    name = "memory"
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # key -> (过期时间, value)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                self._pop(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (time.time() + ttl, value)
+            self._size += len(value)
+            # 超出大小预算时，从最久未使用的条目开始淘汰
+            while self._size > self.max_bytes:
+                self._pop(next(iter(self._data)))
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+
+    def info(self):
+        return {"entries": len(self._data), "bytes": self._size, "max_bytes": self.max_bytes}
+
+    def _pop(self, key):
+        _, value = self._data.pop(key)
+        self._size -= len(value)
+
+
+class FileCacheBackend(CacheBackend):
+    """
+    磁盘缓存，每个键一个文件，以文件修改时间作为最近使用时间进行LRU淘汰
+    可在同一台机器的多个gunicorn worker之间共享
+    """
+    name = "file"
+
+    def __init__(self, directory: str, max_bytes: int):
+        """
+        :param directory: 缓存目录，不存在时创建
+        :param max_bytes: 占用空间上限（字节）
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # 缓存文件会被反序列化（pickle），目录和文件只允许当前用户读写，避免其他用户写入恶意内容
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        os.chmod(directory, 0o700)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                expires_at, value = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires_at < time.time():
+            self.delete(key)
+            return None
+        # 更新修改时间，标记为最近使用
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return value
+
+    def set(self, key, value, ttl):
+        if len(value) > self.max_bytes:
+            return
+        data = pickle.dumps((time.time() + ttl, value), protocol=pickle.HIGHEST_PROTOCOL)
+        write_file_atomic(self._path(key), data, 0o600)
+        self._evict()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        for entry in self._entries():
+            self.delete(entry.name)
+
+    def info(self):
+        entries = self._entries()
+        return {"entries": len(entries),
+                "bytes": sum(entry.stat().st_size for entry in entries),
+                "max_bytes": self.max_bytes}
+
+    def _entries(self):
+        return [entry for entry in os.scandir(self.directory)
+                if entry.is_file() and not entry.name.endswith(".tmp")]
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.name))
+            total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            self.delete(name)
+            total -= size
+
+
+class DjangoCacheBackend(CacheBackend):
+    """
+    使用Django缓存框架（settings.CACHES）作为后端
+    过期由Django缓存负责，容量与淘汰策略由具体的缓存后端配置决定
+    """
+    name = "django"
+
+    def __init__(self, alias: str = "default", prefix: str = "catch_result"):
+        from django.core.cache import caches
+        self.cache = caches[alias]
+        self.prefix = prefix
+
+    def _key(self, key):
+        return f"{self.prefix}:{key}"
+
+    def get(self, key):
+        return self.cache.get(self._key(key))
+
+    def set(self, key, value, ttl):
+        self.cache.set(self._key(key), value, timeout=ttl)
+
+    def delete(self, key):
+        self.cache.delete(self._key(key))
+
+    def clear(self):
+        # Django缓存不支持按前缀删除，这里不清空整个缓存
+        pass
+
+
+class ResultCache:
+    """
+    以图片内容哈希为键的鱼获提取结果缓存
+    缓存内容为解析出的fishes和标注后的图片（PNG编码）
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # 未命中时完整提取的耗时累计，用于估算命中节省的时间
+        self.miss_seconds = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(image_bytes: bytes, scope: tuple = ()) -> str:
+        """
+        根据图片内容和影响提取结果的配置生成缓存键
+        :param image_bytes: 图片原始字节
+        :param scope: 影响提取结果的配置和数据版本（如OCR后端、鱼卡片检测方式、鱼类数据版本），变化时不再命中旧的缓存
+        :return: sha256十六进制字符串
+        """
+        digest = hashlib.sha256(image_bytes)
+        for part in scope:
+            digest.update(b"\0" + str(part).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str, require_image: bool = False):
+        """
+        读取缓存
+        :param key: 缓存键
+        :param require_image: 是否需要标注图片，缓存条目中没有图片时视为未命中
+        :return: {"fishes": [...], "image": PNG字节或None}，未命中时返回None
+        """
+        value = self.backend.get(key)
+        result = pickle.loads(value) if value is not None else None
+        if result is not None and require_image and result["image"] is None:
+            result = None
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def set(self, key: str, fishes: list, image: bytes, elapsed: float = None):
+        """
+        写入缓存
+        :param key: 缓存键
+        :param fishes: 解析出的鱼获列表
+        :param image: 标注后的图片（PNG编码），未绘制标注时为None
+        :param elapsed: 本次完整提取的耗时（秒）
+        """
+        value = pickle.dumps({"fishes": fishes, "image": image}, protocol=pickle.HIGHEST_PROTOCOL)
+        self.backend.set(key, value, self.ttl)
+        if elapsed is not None:
+            with self._lock:
+                self.miss_seconds += elapsed
+
+    def stats(self) -> dict:
+        """
+        缓存命中统计（当前进程）
+        每次命中节省一次roboflow调用和一次百度OCR调用
+        """
+        with self._lock:
+            hits, misses, miss_seconds = self.hits, self.misses, self.miss_seconds
+        total = hits + misses
+        avg_miss_seconds = miss_seconds / misses if misses else 0.0
+        return {
+            "backend": self.backend.name,
+            "ttl": self.ttl,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "saved_api_calls": hits * 2,
+            "avg_miss_seconds": round(avg_miss_seconds, 3),
+            "estimated_saved_seconds": round(hits * avg_miss_seconds, 3),
+            **self.backend.info(),
+        }
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+def get_result_cache():
+    """
+    获取进程内共享的结果缓存，CATCH_RESULT_CACHE_BACKEND为none时返回None
+    支持的后端: memory（默认）、file、django
+    """
+    global _result_cache
+    backend_name = get_setting("CATCH_RESULT_CACHE_BACKEND", "memory")
+    if backend_name == "none":
+        return None
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                max_bytes = get_setting("CATCH_RESULT_CACHE_MAX_BYTES", 256 * 1024 * 1024, int)
+                if backend_name == "memory":
+                    backend = MemoryCacheBackend(max_bytes)
+                elif backend_name == "file":
+                    directory = get_setting("CATCH_RESULT_CACHE_DIR",
+                                            os.path.join(get_setting("ASSETS_DIR", current_dir), "result_cache"))
+                    backend = FileCacheBackend(directory, max_bytes)
+                elif backend_name == "django":
+                    backend = DjangoCacheBackend(get_setting("CATCH_RESULT_CACHE_ALIAS", "default"))
+                else:
+                    raise ValueError(f"不支持的缓存后端: {backend_name}")
+                _result_cache = ResultCache(backend, get_setting("CATCH_RESULT_CACHE_TTL", 24 * 3600, float))
+    return _result_cache
@@ -0,0 +1,107 @@
+import os
+import json
+import time
+import threading
+from services.catch_extractor.config import get_setting
+from services.catch_extractor.result_cache import CacheBackend, FileCacheBackend, DjangoCacheBackend
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+class AccessTokenManager:
+    """
+    access token管理器
+    首次使用时获取token并按expires_in缓存，在过期前refresh_margin秒内自动刷新
+    刷新在锁内进行，同一进程同一时刻只有一个刷新请求；
+    配置共享存储后，多个gunicorn worker之间共享同一个token
+    """
+
+    def __init__(self, fetch_token, store: CacheBackend = None, key: str = "access_token",
+                 refresh_margin: float = 24 * 3600):
+        """
+        :param fetch_token: 获取token的函数，参数为timeout，返回(token, expires_in)
+        :param store: 跨进程共享的存储，为None时仅在进程内缓存
+        :param key: 在共享存储中的键
+        :param refresh_margin: 提前刷新的时间（秒）
+        """
+        self.fetch_token = fetch_token
+        self.store = store
+        self.key = key
+        self.refresh_margin = refresh_margin
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def _is_fresh(self, expires_at: float) -> bool:
+        return time.time() < expires_at - self.refresh_margin
+
+    def get_token(self, timeout: float = None) -> str:
+        """
+        获取有效的token，必要时刷新
+        :param timeout: 刷新请求的超时时间（秒）
+        :return: token
+        """
+        token, expires_at = self._token, self._expires_at
+        if token and self._is_fresh(expires_at):
+            return token
+
+        with self._lock:
+            # 等锁期间可能已被其他线程刷新
+            if self._token and self._is_fresh(self._expires_at):
+                return self._token
+
+            # 其他worker可能已经刷新并写入了共享存储
+            shared = self._load_shared()
+            if shared is not None and self._is_fresh(shared[1]):
+                self._token, self._expires_at = shared
+                return self._token
+
+            token, expires_in = self.fetch_token(timeout)
+            self._token, self._expires_at = token, time.time() + expires_in
+            self._save_shared(self._token, self._expires_at, expires_in)
+            return self._token
+
+    def invalidate(self, token: str = None):
+        """
+        使当前token失效（例如接口返回token无效时），下次get_token会重新获取
+        :param token: 失效的token，为None或与当前token相同时才会失效，避免覆盖其他线程刚刷新的token
+        """
+        with self._lock:
+            if token is None or token == self._token:
+                self._token, self._expires_at = None, 0.0
+                if self.store is not None:
+                    self.store.delete(self.key)
+
+    def _load_shared(self):
+        if self.store is None:
+            return None
+        value = self.store.get(self.key)
+        if value is None:
+            return None
+        data = json.loads(value)
+        return data["token"], data["expires_at"]
+
+    def _save_shared(self, token, expires_at, ttl):
+        if self.store is None:
+            return
+        value = json.dumps({"token": token, "expires_at": expires_at}).encode("utf-8")
+        self.store.set(self.key, value, ttl)
+
+
+def get_token_store():
+    """
+    根据TOKEN_STORE_BACKEND配置创建token的共享存储
+    支持: file（默认，同一台机器的worker之间共享，文件权限为0600）、
+    django（settings.CACHES，需为跨进程的缓存后端才能共享）、memory（不共享）
+    """
+    backend_name = get_setting("TOKEN_STORE_BACKEND", "file")
+    if backend_name == "file":
+        directory = get_setting("TOKEN_STORE_DIR",
+                                os.path.join(get_setting("ASSETS_DIR", current_dir), "token_cache"))
+        # token为明文，FileCacheBackend的目录和文件只允许当前用户读写
+        return FileCacheBackend(directory, 1024 * 1024)
+    if backend_name == "django":
+        return DjangoCacheBackend(get_setting("TOKEN_STORE_ALIAS", "default"), prefix="access_token")
+    if backend_name == "memory":
+        return None
+    raise ValueError(f"不支持的token存储后端: {backend_name}")
@@ -1,10 +1,12 @@
-import requests
-from PIL import Image, ImageDraw, ImageFont
+from services.catch_extractor import http_client
+from services.catch_extractor.fonts import get_font
+from services.catch_extractor.fish_names import get_fish_name_matcher
+from PIL import Image, ImageDraw
 from io import BytesIO
-import os
 import base64
 import urllib.parse
 import re
+import numpy as np
 
 class BoundingBox:
     """
@@ -13,6 +15,9 @@ class BoundingBox:
     1. 中心点坐标 + 宽高 (YOLO格式): x_center, y_center, width, height
     2. 左上角坐标 + 宽高 (百度OCR格式): left, top, width, height
     """
+
+    # 使用__slots__代替__dict__，减少大量单个方框对象的内存和属性访问开销
+    __slots__ = ("width", "height", "_word", "x_center", "y_center", "left", "top", "right", "bottom")
     
     def __init__(self, x=0, y=0, width=0, height=0, is_center_format=True, word=""):
         """
@@ -224,18 +229,245 @@ class BoundingBox:
         )
     
 
-def load_image_from_url(url: str) -> Image.Image:
+class BoxArray:
+    """
+    基于NumPy的方框数组，按列存储left、top、width、height及对应文字
+    用于一次性处理大量方框：批量重叠判断、两两IoU矩阵、合并等
+    """
+
+    __slots__ = ("left", "top", "width", "height", "words")
+
+    def __init__(self, left=(), top=(), width=(), height=(), words=None):
+        """
+        参数:
+            left: 左上角x坐标序列
+            top: 左上角y坐标序列
+            width: 宽度序列
+            height: 高度序列
+            words: 每个方框内的文字列表，为None时均为空字符串
+        """
+        self.left = np.asarray(left, dtype=np.float64)
+        self.top = np.asarray(top, dtype=np.float64)
+        self.width = np.asarray(width, dtype=np.float64)
+        self.height = np.asarray(height, dtype=np.float64)
+        self.words = list(words) if words is not None else [""] * len(self.left)
+        if not (len(self.left) == len(self.top) == len(self.width) == len(self.height) == len(self.words)):
+            raise ValueError("left、top、width、height、words的长度必须一致")
+
+    @classmethod
+    def from_boxes(cls, boxes: list[BoundingBox]) -> 'BoxArray':
+        """
+        从BoundingBox列表创建
+        """
+        return cls([box.left for box in boxes], [box.top for box in boxes],
+                   [box.width for box in boxes], [box.height for box in boxes],
+                   [box.word for box in boxes])
+
+    @classmethod
+    def from_roboflow_predictions(cls, result) -> 'BoxArray':
+        """
+        从roboflow返回结果创建，坐标处理与convert_yolo_to_standard一致
+
+        参数:
+            result: roboflow返回的完整结果字典，或predictions列表（此时不裁剪到图像范围）
+
+        返回:
+            BoxArray: 文字为"类别-置信度"
+        """
+        if isinstance(result, dict):
+            predictions = result['outputs'][0]['predictions']['predictions']
+            image_info = result['outputs'][0]['predictions']['image']
+            image_width, image_height = image_info['width'], image_info['height']
+        else:
+            predictions = result
+            image_width = image_height = np.inf
+
+        x = np.array([pred['x'] for pred in predictions], dtype=np.float64)
+        y = np.array([pred['y'] for pred in predictions], dtype=np.float64)
+        w = np.array([pred['width'] for pred in predictions], dtype=np.float64)
+        h = np.array([pred['height'] for pred in predictions], dtype=np.float64)
+
+        left = np.maximum(0, np.trunc(x - w / 2))
+        top = np.maximum(0, np.trunc(y - h / 2))
+        right = np.minimum(image_width, np.trunc(x + w / 2))
+        bottom = np.minimum(image_height, np.trunc(y + h / 2))
+        words = [f"{pred['class']}-{pred['confidence'] * 100:.0f}%" for pred in predictions]
+        return cls(left, top, right - left, bottom - top, words)
+
+    @classmethod
+    def from_baidu_words_result(cls, words_result: list[dict]) -> 'BoxArray':
+        """
+        从百度OCR返回的words_result创建
+        """
+        locations = [item['location'] for item in words_result]
+        return cls([loc['left'] for loc in locations], [loc['top'] for loc in locations],
+                   [loc['width'] for loc in locations], [loc['height'] for loc in locations],
+                   [item['words'] for item in words_result])
+
+    def to_boxes(self) -> list[BoundingBox]:
+        """
+        转换为BoundingBox列表
+        """
+        return [BoundingBox(float(l), float(t), float(w), float(h), False, word)
+                for l, t, w, h, word in zip(self.left, self.top, self.width, self.height, self.words)]
+
+    @property
+    def right(self):
+        return self.left + self.width
+
+    @property
+    def bottom(self):
+        return self.top + self.height
+
+    @property
+    def x_center(self):
+        return self.left + self.width / 2
+
+    @property
+    def y_center(self):
+        return self.top + self.height / 2
+
+    @property
+    def area(self):
+        return self.width * self.height
+
+    def __len__(self):
+        return len(self.left)
+
+    def __getitem__(self, index):
+        """
+        整数下标返回BoundingBox，切片、下标数组或布尔掩码返回BoxArray
+        """
+        if isinstance(index, (int, np.integer)):
+            return BoundingBox(float(self.left[index]), float(self.top[index]),
+                               float(self.width[index]), float(self.height[index]),
+                               False, self.words[index])
+        indices = np.arange(len(self))[index]
+        return BoxArray(self.left[indices], self.top[indices], self.width[indices], self.height[indices],
+                        [self.words[i] for i in indices])
+
+    def __str__(self):
+        return f"BoxArray(size={len(self)})"
+
+    @staticmethod
+    def _as_array(other) -> 'BoxArray':
+        if isinstance(other, BoundingBox):
+            return BoxArray([other.left], [other.top], [other.width], [other.height], [other.word])
+        if isinstance(other, BoxArray):
+            return other
+        return BoxArray.from_boxes(other)
+
+    def is_overlapping(self, other, error_margin: int = 10) -> np.ndarray:
+        """
+        批量判断重叠，规则与BoundingBox.is_overlapping一致（仅横向允许误差）
+
+        参数:
+            other: BoundingBox、BoxArray或BoundingBox列表
+            error_margin: 误差范围（仅横向）
+
+        返回:
+            np.ndarray: other为BoundingBox时形状为(n,)，否则为(n, m)的布尔矩阵
+        """
+        single = isinstance(other, BoundingBox)
+        other = self._as_array(other)
+        horizontal = ((self.right[:, None] >= other.left[None, :] - error_margin) &
+                      (self.left[:, None] <= other.right[None, :] + error_margin))
+        vertical = ((self.bottom[:, None] >= other.top[None, :]) &
+                    (self.top[:, None] <= other.bottom[None, :]))
+        result = horizontal & vertical
+        return result[:, 0] if single else result
+
+    def overlap_area(self, other) -> np.ndarray:
+        """
+        两两计算重叠面积，没有重叠时为0
+
+        返回:
+            np.ndarray: (n, m)的重叠面积矩阵
+        """
+        other = self._as_array(other)
+        overlap_width = np.minimum(self.right[:, None], other.right[None, :]) - np.maximum(self.left[:, None], other.left[None, :])
+        overlap_height = np.minimum(self.bottom[:, None], other.bottom[None, :]) - np.maximum(self.top[:, None], other.top[None, :])
+        return np.clip(overlap_width, 0, None) * np.clip(overlap_height, 0, None)
+
+    def iou(self, other=None) -> np.ndarray:
+        """
+        两两计算交并比(IoU)
+
+        参数:
+            other: 另一组方框，为None时计算本数组内部的IoU矩阵
+
+        返回:
+            np.ndarray: (n, m)的IoU矩阵，范围[0, 1]
+        """
+        other = self if other is None else self._as_array(other)
+        overlap = self.overlap_area(other)
+        union = self.area[:, None] + other.area[None, :] - overlap
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(union > 0, overlap / union, 0.0)
+
+    def union(self, other: 'BoxArray') -> 'BoxArray':
+        """
+        与等长的另一组方框逐个合并，等价于逐个执行BoundingBox的加法
+        """
+        other = self._as_array(other)
+        if len(other) != len(self):
+            raise ValueError("合并的两组方框数量必须一致")
+        left = np.minimum(self.left, other.left)
+        top = np.minimum(self.top, other.top)
+        right = np.maximum(self.right, other.right)
+        bottom = np.maximum(self.bottom, other.bottom)
+        words = [a + b for a, b in zip(self.words, other.words)]
+        return BoxArray(left, top, right - left, bottom - top, words)
+
+    def merge(self) -> BoundingBox:
+        """
+        将所有方框合并为一个外接方框，文字按顺序拼接
+        """
+        if len(self) == 0:
+            return BoundingBox(0, 0, 0, 0, False)
+        left, top = self.left.min(), self.top.min()
+        return BoundingBox(float(left), float(top),
+                           float(self.right.max() - left), float(self.bottom.max() - top),
+                           False, "".join(self.words))
+
+    @staticmethod
+    def concat(arrays: list['BoxArray']) -> 'BoxArray':
+        """
+        拼接多组方框
+        """
+        return BoxArray(np.concatenate([a.left for a in arrays]) if arrays else (),
+                        np.concatenate([a.top for a in arrays]) if arrays else (),
+                        np.concatenate([a.width for a in arrays]) if arrays else (),
+                        np.concatenate([a.height for a in arrays]) if arrays else (),
+                        [word for a in arrays for word in a.words])
+    
+
+def load_image_from_url(url: str, timeout: float = None) -> Image.Image:
     """
     从URL加载图片
     
     参数:
         url: 图片的URL
+        timeout: 请求超时时间（秒）
     
     返回:
         PIL.Image.Image: 加载的图片对象
     """
-    response = requests.get(url)
-    return Image.open(BytesIO(response.content))
+    return Image.open(BytesIO(load_bytes_from_url(url, timeout)))
+
+def load_bytes_from_url(url: str, timeout: float = None) -> bytes:
+    """
+    从URL下载文件的原始字节
+    
+    参数:
+        url: 文件的URL
+        timeout: 请求超时时间（秒）
+    
+    返回:
+        bytes: 文件内容
+    """
+    response = http_client.get(url, timeout=timeout)
+    return response.content
 
 def save_image_to_file(image: Image.Image, file_path: str):
     """
@@ -264,7 +496,8 @@ def draw_bounding_boxes_on_image(image: Image.Image,
                                  box_color=(255, 0, 0), 
                                  text_color=(255, 255, 255), 
                                  line_width=2, 
-                                 save_path=None) -> Image.Image:
+                                 save_path=None,
+                                 font_size=14) -> Image.Image:
     """
     在图片上绘制多个方框及对应的文字
     
@@ -275,6 +508,7 @@ def draw_bounding_boxes_on_image(image: Image.Image,
         text_color: 文字颜色，RGB元组，默认白色
         line_width: 线条宽度，默认2
         save_path: 保存标注后图片的路径，为None时不保存
+        font_size: 文字字号，默认14
     
     返回:
         PIL.Image.Image: 标注后的图片对象
@@ -283,39 +517,8 @@ def draw_bounding_boxes_on_image(image: Image.Image,
     # 创建绘图对象
     draw = ImageDraw.Draw(image)
     
-    # 设置字体
-    try:
-        # 尝试使用系统中支持中文的字体
-        # Windows系统
-        if os.name == 'nt':
-            font = ImageFont.truetype("SimHei", 14)  # 黑体
-        # macOS或Linux系统
-        else:
-            font = ImageFont.truetype("NotoSansCJK-Regular.ttc", 14)  # 思源黑体
-    except IOError:
-        try:
-            # 备选字体
-            font_paths = [
-                "/usr/share/fonts/truetype/droid/DroidSansFallbackFull.ttf",  # Linux
-                "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",  # 文泉驿微米黑
-                "/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc",    # 文泉驿正黑
-                "/System/Library/Fonts/PingFang.ttc",  # macOS
-                "C:/Windows/Fonts/simsun.ttc",  # Windows宋体
-                "C:/Windows/Fonts/simhei.ttf",  # Windows黑体
-                "C:/Windows/Fonts/msyh.ttc"     # Windows微软雅黑
-            ]
-            
-            for path in font_paths:
-                if os.path.exists(path):
-                    font = ImageFont.truetype(path, 14)
-                    break
-            else:
-                # 如果上述字体都不可用，尝试使用PIL内置的默认字体
-                font = ImageFont.load_default()
-                print("警告：未找到支持中文的字体，文字可能无法正确显示")
-        except Exception as e:
-            font = ImageFont.load_default()
-            print(f"警告：加载字体时出错 ({e})，文字可能无法正确显示")
+    # 获取字体（进程内缓存，不再每次调用都探测字体文件）
+    font = get_font(font_size)
     
     # 在图片上标注每个框和文字
     for box in boxes:
@@ -342,6 +545,45 @@ def draw_bounding_boxes_on_image(image: Image.Image,
     
     return image
 
+# 支持的输出图片格式: 格式名 -> (PIL格式, MIME类型, 扩展名)
+IMAGE_FORMATS = {
+    "png": ("PNG", "image/png", "png"),
+    "jpeg": ("JPEG", "image/jpeg", "jpg"),
+    "webp": ("WEBP", "image/webp", "webp"),
+}
+
+# 图片已有的PNG编码结果（image.info中的键），再次编码为PNG时直接复用
+ENCODED_PNG_KEY = "encoded_png"
+
+def encode_image(image: Image.Image, image_format: str = "png", quality: int = 85, max_size: int = None) -> bytes:
+    """
+    将图片编码为指定格式，可按最长边等比缩小
+    图片带有PNG编码结果（结果缓存写入或读出的图片）且不需要缩小时，编码为PNG直接返回该结果
+    
+    参数:
+        image: 图片对象（缩小时会直接修改该对象）
+        image_format: 输出格式，png、jpeg或webp
+        quality: jpeg/webp的压缩质量，1~100
+        max_size: 最长边的像素上限，为None时不缩放
+    
+    返回:
+        bytes: 编码后的图片
+    """
+    pil_format = IMAGE_FORMATS[image_format][0]
+    if max_size and max(image.size) > max_size:
+        image.thumbnail((max_size, max_size))
+        image.info.pop(ENCODED_PNG_KEY, None)
+    if pil_format == "PNG" and ENCODED_PNG_KEY in image.info:
+        return image.info[ENCODED_PNG_KEY]
+    if pil_format == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+    buffer = BytesIO()
+    if pil_format == "PNG":
+        image.save(buffer, format=pil_format)
+    else:
+        image.save(buffer, format=pil_format, quality=quality)
+    return buffer.getvalue()
+
 def get_file_content_as_base64(path, urlencoded=False):
     """
     获取文件base64编码
@@ -355,35 +597,43 @@ def get_file_content_as_base64(path, urlencoded=False):
             content = urllib.parse.quote_plus(content)
     return content
 
+# 时间百分比，如"42分-97%"，取到第一个"分"为止
+TIME_PATTERN = re.compile(r'[^分]*分')
+# 重量，如"3.705公斤"、"250克"
+WEIGHT_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(公斤|克)')
+# 售价，如"2.59"
+PRICE_PATTERN = re.compile(r'^\d+(\.\d+)?$')
+
 def get_field_from_word(word: str) -> dict:
     """
     根据文字，识别字段
+    鱼名通过图鉴构建的匹配器识别，OCR识别错个别字时会纠正为图鉴中的鱼名
     :param word: 文字(ocr提取的)
     :return: 字段名，字段值
     """
-    legal_fish_name = ["镜鲤", "鲤鲫鱼"]
-
     # 判断是否为时间百分比
-    if "分" in word:
-        word = word[:word.index("分")+1]
-        return {"key": "time_percentage", "value": word}
+    match = TIME_PATTERN.match(word)
+    if match:
+        return {"key": "time_percentage", "value": match.group(0)}
     
     # 判断是否为重量
     if "克" in word or "公斤" in word:
-        if "公斤" in word:
-            word = word.replace("公斤", "")
-        else:
-            word = str(float(word.replace("克", "")) / 1000)
-        return {"key": "weight", "value": word}
+        match = WEIGHT_PATTERN.search(word)
+        if match is None:
+            return {"key": "weight", "value": word.replace("公斤", "")}
+        value, unit = match.groups()
+        return {"key": "weight", "value": value if unit == "公斤" else str(float(value) / 1000)}
     
     # 判断是否为鱼类名称
-    if word in legal_fish_name:
-        return {"key": "fish_name", "value": word}
+    fish_name = get_fish_name_matcher().match(word)
+    if fish_name is not None:
+        return {"key": "fish_name", "value": fish_name}
     
     # 判断是否为售价
-    if re.match(r'^\d+(\.\d+)?$', word):
+    if PRICE_PATTERN.match(word):
         return {"key": "price", "value": word}
     
+    # 图鉴中没有的鱼（或识别错误过多）保留原文
     return {"key": "fish_name", "value": word}
 
 # 示例用法
@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class WikiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'wiki'
+
+    def ready(self):
+        # 鱼类表变化时刷新鱼名匹配器
+        from wiki import signals  # noqa: F401
+
+        # migrate后建立鱼类全文索引
+        from django.db.models.signals import post_migrate
+        from wiki.fish_search import ensure_fish_search_index
+        post_migrate.connect(ensure_fish_search_index, sender=self)
+
+        # 预加载鱼获标注所用的中文字体
+        from services.catch_extractor.fonts import warm_up
+        warm_up()
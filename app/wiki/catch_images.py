@@ -0,0 +1,166 @@
+import os
+import time
+import uuid
+import base64
+import asyncio
+from io import BytesIO
+from asgiref.sync import sync_to_async
+from PIL import Image, UnidentifiedImageError
+from django.conf import settings
+
+from services.catch_extractor.main import extract_fishes, extract_fishes_async
+from services.catch_extractor.utils import IMAGE_FORMATS, encode_image
+from wiki.catch_store import save_catches
+
+RESULT_IMAGE_URL = '/api/wiki/catch_image/{token}'
+
+
+def sniff_image_extension(image_bytes: bytes) -> str:
+    """
+    根据图片内容判断扩展名（只读取文件头）
+    :return: png、jpg、webp等，无法识别时返回bin
+    """
+    try:
+        pil_format = Image.open(BytesIO(image_bytes)).format
+    except (UnidentifiedImageError, OSError):
+        return 'bin'
+    return next((ext for name, _, ext in IMAGE_FORMATS.values() if name == pil_format), pil_format.lower())
+
+
+def save_catch_images(original_bytes: bytes, result_bytes: bytes = None, result_ext: str = 'png') -> str:
+    """
+    保存上传的原图和处理后的图片
+    :return: 本次请求的唯一标识，文件保存为 {标识}_original.{原图扩展名} 和 {标识}_result.{扩展名}
+    """
+    save_dir = os.path.join(settings.ASSETS_DIR, 'catches')
+    os.makedirs(save_dir, exist_ok=True)
+    request_id = uuid.uuid4().hex
+    with open(os.path.join(save_dir, f'{request_id}_original.{sniff_image_extension(original_bytes)}'), 'wb') as f:
+        f.write(original_bytes)
+    if result_bytes is not None:
+        with open(os.path.join(save_dir, f'{request_id}_result.{result_ext}'), 'wb') as f:
+            f.write(result_bytes)
+    return request_id
+
+
+def _artifact_dir() -> str:
+    return os.path.join(settings.ASSETS_DIR, 'catch_images')
+
+
+def store_result_image(image_bytes: bytes, image_format: str) -> str:
+    """
+    保存处理后的图片，供短期链接下载
+    :param image_bytes: 编码后的图片
+    :param image_format: 图片格式，png、jpeg或webp
+    :return: 访问令牌，即随机生成的文件名
+    """
+    artifact_dir = _artifact_dir()
+    os.makedirs(artifact_dir, exist_ok=True)
+    cleanup_result_images()
+    filename = f'{uuid.uuid4().hex}.{IMAGE_FORMATS[image_format][2]}'
+    with open(os.path.join(artifact_dir, filename), 'wb') as f:
+        f.write(image_bytes)
+    return filename
+
+
+def load_result_image(token: str):
+    """
+    根据访问令牌获取图片文件
+    :param token: store_result_image返回的令牌
+    :return: (文件路径, MIME类型)，令牌无效、过期或文件不存在时返回None
+    """
+    filename = os.path.basename(token)
+    path = os.path.join(_artifact_dir(), filename)
+    try:
+        if os.stat(path).st_mtime < time.time() - settings.CATCH_IMAGE_URL_TTL:
+            return None
+    except FileNotFoundError:
+        return None
+    ext = filename.rsplit('.', 1)[-1]
+    content_type = next((mime for _, mime, e in IMAGE_FORMATS.values() if e == ext), 'application/octet-stream')
+    return path, content_type
+
+
+def cleanup_result_images():
+    """
+    删除超过有效期的图片
+    """
+    artifact_dir = _artifact_dir()
+    if not os.path.isdir(artifact_dir):
+        return
+    expire_before = time.time() - settings.CATCH_IMAGE_URL_TTL
+    for entry in os.scandir(artifact_dir):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < expire_before:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            continue
+
+
+def build_image_output(image, options: dict) -> tuple[dict, bytes]:
+    """
+    按请求选项输出处理后的图片
+    :param image: 处理后的图片对象，image_mode为none时可为None
+    :param options: ImageUploadSerializer校验后的选项（image_mode、image_format、image_quality、image_max_size）
+    :return: (响应中的图片字段, 编码后的图片)，image为None时返回({}, None)
+    """
+    if image is None:
+        return {}, None
+
+    image_format = options.get('image_format', 'png')
+    image_bytes = encode_image(image, image_format, options.get('image_quality', 85), options.get('image_max_size'))
+
+    image_mode = options.get('image_mode', 'base64')
+    if image_mode == 'base64':
+        return {'image': base64.b64encode(image_bytes).decode('utf-8'), 'image_format': image_format}, image_bytes
+    if image_mode == 'url':
+        token = store_result_image(image_bytes, image_format)
+        return {'image_url': RESULT_IMAGE_URL.format(token=token), 'image_format': image_format}, image_bytes
+    return {}, image_bytes
+
+
+def _use_annotation(options: dict) -> bool:
+    # 不需要返回图片且不落盘时，跳过标注绘制
+    return options.get('image_mode', 'base64') != 'none' or settings.CATCH_SAVE_IMAGES
+
+
+def _build_image_response(original_bytes: bytes, image, options: dict) -> dict:
+    # 按请求选项编码图片（只编码一次），base64内嵌或保存为短期链接
+    response_data, result_bytes = build_image_output(image, options)
+
+    # 按需保存原图和处理后的图片，文件名按请求唯一，并发请求互不覆盖
+    if settings.CATCH_SAVE_IMAGES:
+        save_catch_images(original_bytes, result_bytes, IMAGE_FORMATS[options.get('image_format', 'png')][2])
+    return response_data
+
+
+def process_catch_image(original_bytes: bytes, options: dict) -> dict:
+    """
+    从上传的图片中提取鱼获，并按请求选项输出处理后的图片
+    :param original_bytes: 上传的图片原始字节
+    :param options: ImageUploadSerializer校验后的选项
+    :return: 响应数据，包含fishes及image/image_url/image_format（image_url为站内路径），启用卡片缓存时包含card_cache
+    """
+    # 调用extract_fishes，全程在内存中处理，不写临时文件
+    stats = {}
+    image, fishes = extract_fishes(image=original_bytes, annotate=_use_annotation(options), stats=stats)
+    response_data = _build_image_response(original_bytes, image, options)
+
+    # 按需将鱼获写入Catch表（每个请求一次批量写入）
+    if settings.CATCH_SAVE_CATCHES:
+        save_catches(original_bytes, fishes)
+    return {**response_data, 'fishes': fishes, **stats}
+
+
+async def process_catch_image_async(original_bytes: bytes, options: dict) -> dict:
+    """
+    process_catch_image的异步版本，远程调用在事件循环中执行，图片编码和保存放到线程中执行，
+    写入Catch表通过sync_to_async在Django的同步线程中执行
+    """
+    stats = {}
+    image, fishes = await extract_fishes_async(original_bytes, annotate=_use_annotation(options), stats=stats)
+    response_data = await asyncio.to_thread(_build_image_response, original_bytes, image, options)
+
+    if settings.CATCH_SAVE_CATCHES:
+        await sync_to_async(save_catches)(original_bytes, fishes)
+    return {**response_data, 'fishes': fishes, **stats}
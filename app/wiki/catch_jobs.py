@@ -0,0 +1,161 @@
+import time
+import logging
+import threading
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count
+from django.utils import timezone
+
+from wiki.models import CatchJob
+from wiki.catch_images import process_catch_image
+
+logger = logging.getLogger(__name__)
+
+
+class CatchJobQueueFull(Exception):
+    """任务队列已满"""
+
+
+class CatchJobRunner:
+    """
+    进程内的鱼获提取任务执行器
+    任务状态和结果保存在数据库中，任意worker都可以查询；任务在提交它的进程的线程池中执行，
+    同时执行的任务数不超过max_concurrency，排队任务数不超过max_queue
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='catch_job')
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.succeeded = 0
+        self.failed = 0
+        # 已完成任务的累计排队耗时和处理耗时（秒）
+        self.total_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    def submit(self, original_bytes: bytes, options: dict) -> CatchJob:
+        """
+        提交任务
+        :param original_bytes: 上传的图片原始字节
+        :param options: ImageUploadSerializer校验后的选项
+        :return: 新建的CatchJob
+        """
+        with self._lock:
+            if self.queued >= self.max_queue:
+                raise CatchJobQueueFull(f'任务队列已满（{self.max_queue}），请稍后重试')
+            self.queued += 1
+
+        try:
+            job = CatchJob.objects.create()
+            # 上传文件对象不传入后台线程，只保留处理选项
+            options = {key: value for key, value in options.items() if key != 'image'}
+            # 结果保存在数据库中，图片不以base64内嵌，保存为短期链接
+            if options.get('image_mode', 'base64') == 'base64':
+                options['image_mode'] = 'url'
+            self._executor.submit(self._run, job.id, original_bytes, options, time.perf_counter())
+        except Exception:
+            with self._lock:
+                self.queued -= 1
+            raise
+        return job
+
+    def _run(self, job_id, original_bytes: bytes, options: dict, submitted_at: float):
+        started_at = time.perf_counter()
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        succeeded = False
+        try:
+            # 排队超时已被标记为失败的任务不再处理
+            if not CatchJob.objects.filter(id=job_id, status=CatchJob.STATUS_PENDING).update(
+                    status=CatchJob.STATUS_RUNNING, started_at=timezone.now()):
+                return
+            result = process_catch_image(original_bytes, options)
+            CatchJob.objects.filter(id=job_id).update(status=CatchJob.STATUS_SUCCEEDED, result=result,
+                                                      finished_at=timezone.now())
+            succeeded = True
+        except Exception as e:
+            logger.exception('鱼获提取任务 %s 失败', job_id)
+            CatchJob.objects.filter(id=job_id).update(status=CatchJob.STATUS_FAILED, error=str(e),
+                                                      finished_at=timezone.now())
+        finally:
+            finished_at = time.perf_counter()
+            with self._lock:
+                self.running -= 1
+                self.total_wait_seconds += started_at - submitted_at
+                self.total_run_seconds += finished_at - started_at
+                if succeeded:
+                    self.succeeded += 1
+                else:
+                    self.failed += 1
+            # 后台线程使用独立的数据库连接，处理完后关闭
+            close_old_connections()
+
+    def stats(self) -> dict:
+        with self._lock:
+            finished = self.succeeded + self.failed
+            return {
+                'max_concurrency': self.max_concurrency,
+                'max_queue': self.max_queue,
+                'queue_depth': self.queued,
+                'running': self.running,
+                'succeeded': self.succeeded,
+                'failed': self.failed,
+                'avg_wait_seconds': round(self.total_wait_seconds / finished, 3) if finished else 0.0,
+                'avg_run_seconds': round(self.total_run_seconds / finished, 3) if finished else 0.0,
+            }
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+def get_catch_job_runner() -> CatchJobRunner:
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                # 进程启动后首次使用时，清理之前重启的进程遗留的未完成任务
+                fail_stale_catch_jobs()
+                _runner = CatchJobRunner(settings.CATCH_JOB_MAX_CONCURRENCY, settings.CATCH_JOB_MAX_QUEUE)
+    return _runner
+
+
+def fail_stale_catch_jobs() -> int:
+    """
+    将提交后超过CATCH_JOB_TIMEOUT仍未完成的任务标记为失败
+    任务在提交它的进程中执行，进程重启后任务不会继续，记录会一直停留在pending或running；
+    按提交时间判断而不是按进程判断，避免误伤其他worker正在执行的任务
+    :return: 标记为失败的任务数
+    """
+    stale_before = timezone.now() - timedelta(seconds=settings.CATCH_JOB_TIMEOUT)
+    return CatchJob.objects.filter(
+        status__in=(CatchJob.STATUS_PENDING, CatchJob.STATUS_RUNNING), created_at__lt=stale_before,
+    ).update(status=CatchJob.STATUS_FAILED, error='任务超时未完成（所在进程可能已重启），请重新提交',
+             finished_at=timezone.now())
+
+
+def submit_catch_job(original_bytes: bytes, options: dict) -> CatchJob:
+    """
+    提交异步鱼获提取任务，并清理超过保留期的旧任务和超时未完成的任务
+    """
+    expire_before = timezone.now() - timedelta(seconds=settings.CATCH_JOB_RETENTION)
+    CatchJob.objects.filter(created_at__lt=expire_before).delete()
+    fail_stale_catch_jobs()
+    return get_catch_job_runner().submit(original_bytes, options)
+
+
+def get_catch_job_stats() -> dict:
+    """
+    任务统计：当前进程的队列深度、执行中任务数、平均排队/处理耗时，以及数据库中各状态的任务数
+    """
+    stats = get_catch_job_runner().stats()
+    stats['jobs_by_status'] = {
+        item['status']: item['count']
+        for item in CatchJob.objects.values('status').annotate(count=Count('id')).order_by()
+    }
+    return stats
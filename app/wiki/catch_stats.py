@@ -0,0 +1,91 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Max, Q, Sum, Value
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+
+from wiki.models import Catch, CatchDailyStat
+
+
+def _empty_delta():
+    return {'count': 0, 'priced_count': 0, 'sum_weight_kg': Decimal(0), 'sum_price': Decimal(0),
+            'max_weight_kg': Decimal(0)}
+
+
+def update_catch_stats(catches: list[Catch]):
+    """
+    将新写入的鱼获增量累加到按种类和日期的汇总中
+    同一批鱼获先在内存中按(种类, 日期)合并，每个分组只更新一行
+    :param catches: 新写入的Catch列表（created_at已赋值）
+    """
+    deltas = defaultdict(_empty_delta)
+    for catch in catches:
+        if not catch.species:
+            continue
+        created_at = catch.created_at or timezone.now()
+        delta = deltas[(catch.species, timezone.localdate(created_at))]
+        delta['count'] += 1
+        if catch.weight_kg is not None and catch.price is not None:
+            delta['priced_count'] += 1
+            delta['sum_weight_kg'] += catch.weight_kg
+            delta['sum_price'] += catch.price
+        if catch.weight_kg is not None:
+            delta['max_weight_kg'] = max(delta['max_weight_kg'], catch.weight_kg)
+
+    for (species, day), delta in deltas.items():
+        _apply_delta(species, day, delta)
+
+
+def _apply_delta(species, day, delta: dict):
+    updates = {
+        'count': F('count') + delta['count'],
+        'priced_count': F('priced_count') + delta['priced_count'],
+        'sum_weight_kg': F('sum_weight_kg') + delta['sum_weight_kg'],
+        'sum_price': F('sum_price') + delta['sum_price'],
+        'max_weight_kg': Greatest(F('max_weight_kg'), Value(delta['max_weight_kg'], output_field=DecimalField())),
+        'updated_at': timezone.now(),
+    }
+    with transaction.atomic():
+        if CatchDailyStat.objects.filter(species=species, day=day).update(**updates):
+            return
+        try:
+            # 该分组的第一条鱼获：新建汇总行，并发新建时由唯一约束兜底，改为累加
+            with transaction.atomic():
+                CatchDailyStat.objects.create(species=species, day=day, **delta)
+        except IntegrityError:
+            CatchDailyStat.objects.filter(species=species, day=day).update(**updates)
+
+
+def rebuild_catch_stats(since=None) -> int:
+    """
+    从Catch表重新计算汇总（用于回填历史数据或修正删除鱼获后的汇总）
+    :param since: 只重建该日期（含）之后的汇总，为None时重建全部
+    :return: 汇总行数
+    """
+    catches = Catch.objects.exclude(species__isnull=True).exclude(species='')
+    stats = CatchDailyStat.objects.all()
+    if since is not None:
+        catches = catches.filter(created_at__date__gte=since)
+        stats = stats.filter(day__gte=since)
+
+    priced = Q(weight_kg__isnull=False, price__isnull=False)
+    rows = (catches.annotate(day=TruncDate('created_at'))
+            .values('species', 'day')
+            .annotate(count=Count('id'),
+                      priced_count=Count('id', filter=priced),
+                      sum_weight_kg=Sum('weight_kg', filter=priced),
+                      sum_price=Sum('price', filter=priced),
+                      max_weight_kg=Max('weight_kg'))
+            .order_by())
+    objects = [CatchDailyStat(species=row['species'], day=row['day'], count=row['count'],
+                              priced_count=row['priced_count'],
+                              sum_weight_kg=row['sum_weight_kg'] or 0,
+                              sum_price=row['sum_price'] or 0,
+                              max_weight_kg=row['max_weight_kg'] or 0)
+               for row in rows]
+    with transaction.atomic():
+        stats.delete()
+        CatchDailyStat.objects.bulk_create(objects, batch_size=1000)
+    return len(objects)
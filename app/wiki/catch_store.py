@@ -0,0 +1,80 @@
+import re
+import hashlib
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+
+from wiki.models import Catch
+from wiki.catch_stats import update_catch_stats
+
+NUMBER_PATTERN = re.compile(r'\d+(?:\.\d+)?')
+
+
+def parse_decimal(value: str):
+    """
+    从提取结果的字段中解析数值（重量已由get_field_from_word统一为公斤）
+    :return: Decimal，无法解析时返回None
+    """
+    match = NUMBER_PATTERN.search(value or '')
+    if match is None:
+        return None
+    try:
+        return Decimal(match.group(0))
+    except InvalidOperation:
+        return None
+
+
+def make_fingerprint(original_bytes: bytes) -> str:
+    """上传图片的指纹"""
+    return hashlib.sha256(original_bytes).hexdigest()
+
+
+def save_catches(original_bytes: bytes, fishes: list) -> list[Catch]:
+    """
+    将一张截图中提取出的鱼获批量写入Catch表
+    同一张截图（指纹相同）再次上传时，已写入的鱼获不会重复写入
+    :param original_bytes: 上传的图片原始字节
+    :param fishes: extract_fishes返回的fishes [[时间百分比, 鱼名, 重量, 分数], ...]
+    :return: 本次新写入的Catch列表
+    """
+    fingerprint = make_fingerprint(original_bytes)
+    existing = set(Catch.objects.filter(fingerprint=fingerprint).values_list('position', flat=True))
+    catches = [
+        Catch(species=fish_name or None,
+              weight=weight or None,
+              weight_kg=parse_decimal(weight),
+              price=parse_decimal(price),
+              time_percentage=time_percentage or None,
+              fingerprint=fingerprint,
+              position=position)
+        for position, (time_percentage, fish_name, weight, price) in enumerate(fishes)
+        if position not in existing
+    ]
+    if catches:
+        with transaction.atomic():
+            catches = _insert_catches(catches)
+            # bulk_create不触发post_save信号，这里直接更新汇总（只累加实际写入的鱼获）
+            update_catch_stats(catches)
+    return catches
+
+
+def _insert_catches(catches: list[Catch]) -> list[Catch]:
+    """
+    写入鱼获，返回实际写入的部分
+    通常一次批量写入；并发上传同一张截图导致唯一约束冲突时，改为逐条写入并跳过已存在的鱼获
+    """
+    try:
+        with transaction.atomic():
+            return Catch.objects.bulk_create(catches)
+    except IntegrityError:
+        pass
+    inserted = []
+    for catch in catches:
+        catch.pk = None
+        try:
+            with transaction.atomic():
+                Catch.objects.bulk_create([catch])
+        except IntegrityError:
+            continue
+        inserted.append(catch)
+    return inserted
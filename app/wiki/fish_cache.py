@@ -0,0 +1,71 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Max
+
+from wiki.models import Fish
+
+GENERATION_KEY = 'fish_catalog_generation'
+
+
+def _cache():
+    return caches[settings.FISH_RESPONSE_CACHE_ALIAS]
+
+
+def bump_catalog_generation():
+    """
+    鱼类数据变化时调用（Fish信号、导入命令），使条件请求的ETag和服务端响应缓存全部失效
+    """
+    cache = _cache()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, timeout=None)
+
+
+def get_catalog_version(request) -> dict:
+    """
+    鱼类数据的版本：行数、最近更新时间和写入计数
+    行数和最近更新时间覆盖其他进程的写入，写入计数覆盖不更新updated_at的修改
+    同一个请求内只查询一次
+    :return: {"count", "last_modified", "generation"}
+    """
+    version = getattr(request, '_fish_catalog_version', None)
+    if version is None:
+        version = Fish.objects.aggregate(count=Count('id'), last_modified=Max('updated_at'))
+        version['generation'] = _cache().get(GENERATION_KEY, 0)
+        request._fish_catalog_version = version
+    return version
+
+
+def catalog_etag(request, *args, **kwargs):
+    """
+    条件请求的ETag，同时作为服务端响应缓存的键
+    不提供Last-Modified：删除鱼不会推进最近更新时间，只有包含行数的ETag能发现这类变化
+    由鱼类数据版本、主机名和路径（分页链接是绝对地址）、排序后的查询参数、Accept（JSON和可浏览API的响应不同）组成
+    """
+    version = get_catalog_version(request)
+    last_modified = version['last_modified'].timestamp() if version['last_modified'] else 0
+    params = sorted((key, value) for key in request.GET for value in request.GET.getlist(key))
+    raw = (f"{version['count']}:{last_modified}:{version['generation']}:{request.scheme}://{request.get_host()}{request.path}:"
+           f"{params}:{request.META.get('HTTP_ACCEPT', '')}")
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def get_cached_response(request):
+    """
+    读取服务端响应缓存，键包含鱼类数据版本，数据变化后旧条目不再被读取，过期后由缓存淘汰
+    :return: 缓存的响应数据，未命中或未启用时返回None
+    """
+    if settings.FISH_RESPONSE_CACHE_TTL <= 0:
+        return None
+    return _cache().get(_response_key(request))
+
+
+def set_cached_response(request, data):
+    if settings.FISH_RESPONSE_CACHE_TTL > 0:
+        _cache().set(_response_key(request), data, timeout=settings.FISH_RESPONSE_CACHE_TTL)
+
+
+def _response_key(request) -> str:
+    return f"fish_response:{catalog_etag(request)}"
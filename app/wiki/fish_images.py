@@ -0,0 +1,236 @@
+import os
+import hashlib
+import threading
+from io import BytesIO
+from urllib.parse import quote, urlparse
+from PIL import Image
+from django.conf import settings
+
+from services.catch_extractor import http_client
+from services.catch_extractor.result_cache import write_file_atomic
+from services.catch_extractor.utils import IMAGE_FORMATS, encode_image
+
+FISH_IMAGE_URL = '/api/wiki/fish_image/{name}/{variant}.{ext}'
+
+# 缩略图规格：名称 -> 最长边像素
+VARIANTS = {'small': 128, 'medium': 320}
+# 缩略图格式，webp体积更小，jpeg用于不支持webp的客户端
+FORMATS = ('webp', 'jpeg')
+QUALITY = 80
+# 原图大小上限，超过时不处理
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+
+
+def _store_dir(*parts) -> str:
+    return os.path.join(settings.ASSETS_DIR, 'fish_images', *parts)
+
+
+def _source_path(url: str) -> str:
+    """图片地址 -> 图片内容哈希 的索引文件"""
+    return _store_dir('sources', hashlib.sha256(url.encode('utf-8')).hexdigest())
+
+
+def _variant_path(content_hash: str, variant: str, image_format: str) -> str:
+    """缩略图按原图内容哈希存放，不同地址的相同图片共用同一组缩略图"""
+    return _store_dir('variants', f'{content_hash}_{variant}.{IMAGE_FORMATS[image_format][2]}')
+
+
+def _read_content_hash(url: str):
+    try:
+        with open(_source_path(url), 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def variant_urls(fish) -> dict | None:
+    """
+    鱼类图片各规格缩略图的访问地址
+    :return: {规格: {格式: 地址}}，没有图片时返回None
+    """
+    if not fish.img or not fish.name:
+        return None
+    name = quote(fish.name, safe='')
+    return {variant: {image_format: FISH_IMAGE_URL.format(name=name, variant=variant,
+                                                          ext=IMAGE_FORMATS[image_format][2])
+                      for image_format in FORMATS}
+            for variant in VARIANTS}
+
+
+def parse_variant(filename: str):
+    """
+    解析缩略图文件名，如 small.webp
+    :return: (规格, 格式)，无效时返回None
+    """
+    variant, _, ext = filename.partition('.')
+    image_format = next((key for key in FORMATS if IMAGE_FORMATS[key][2] == ext), None)
+    if variant not in VARIANTS or image_format is None:
+        return None
+    return variant, image_format
+
+
+def has_variants(url: str) -> bool:
+    """图片是否已下载且所有缩略图都存在"""
+    content_hash = _read_content_hash(url)
+    return content_hash is not None and all(
+        os.path.exists(_variant_path(content_hash, variant, image_format))
+        for variant in VARIANTS for image_format in FORMATS)
+
+
+def get_variant_path(url: str, variant: str, image_format: str):
+    """
+    查找已生成的缩略图，找到时更新修改时间（标记为最近使用）
+    :return: (文件路径, MIME类型)，未生成或已被淘汰时返回None
+    """
+    content_hash = _read_content_hash(url)
+    if content_hash is None:
+        return None
+    path = _variant_path(content_hash, variant, image_format)
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return path, IMAGE_FORMATS[image_format][1]
+
+
+def render_variants(content: bytes) -> dict:
+    """
+    生成所有规格和格式的缩略图
+    :param content: 原图字节
+    :return: {(规格, 格式): 编码后的图片}
+    """
+    image = Image.open(BytesIO(content))
+    image.load()
+    image = image.convert('RGBA') if image.mode not in ('RGB', 'RGBA') else image
+    results = {}
+    for variant, size in VARIANTS.items():
+        thumbnail = image.copy()
+        thumbnail.thumbnail((size, size), Image.LANCZOS)
+        for image_format in FORMATS:
+            output = thumbnail
+            if image_format == 'jpeg' and thumbnail.mode == 'RGBA':
+                # JPEG不支持透明，透明部分填充白色
+                output = Image.new('RGB', thumbnail.size, (255, 255, 255))
+                output.paste(thumbnail, mask=thumbnail.getchannel('A'))
+            results[(variant, image_format)] = encode_image(output, image_format, QUALITY)
+    return results
+
+
+def is_allowed_url(url: str) -> bool:
+    """
+    图片地址是否允许由服务端下载：只允许http(s)和FISH_IMAGE_ALLOWED_HOSTS中的主机（含子域名）
+    图片地址可由用户修改，限制主机避免服务端被用来访问内网等任意地址
+    """
+    parsed = urlparse(url)
+    host = (parsed.hostname or '').lower()
+    if parsed.scheme not in ('http', 'https') or not host:
+        return False
+    return any(host == allowed or host.endswith('.' + allowed) for allowed in settings.FISH_IMAGE_ALLOWED_HOSTS)
+
+
+def download_image(url: str) -> bytes:
+    """
+    流式下载图片，超过MAX_SOURCE_BYTES时立即中止
+    不跟随重定向，避免从允许的主机跳转到其他地址
+    :return: 图片字节
+    """
+    if not is_allowed_url(url):
+        raise ValueError(f'不允许下载的图片地址: {url}')
+    with http_client.get(url, stream=True, allow_redirects=False) as response:
+        response.raise_for_status()
+        if response.status_code != 200:
+            raise ValueError(f'图片地址返回 {response.status_code}: {url}')
+        if int(response.headers.get('Content-Length') or 0) > MAX_SOURCE_BYTES:
+            raise ValueError(f'图片过大（{response.headers["Content-Length"]} 字节）: {url}')
+        buffer = bytearray()
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            buffer += chunk
+            if len(buffer) > MAX_SOURCE_BYTES:
+                raise ValueError(f'图片超过 {MAX_SOURCE_BYTES} 字节: {url}')
+    return bytes(buffer)
+
+
+_url_locks = {}
+_url_locks_lock = threading.Lock()
+
+def fetch_fish_image(url: str, force: bool = False) -> str:
+    """
+    下载图片并生成缩略图，已生成过的图片不重复下载
+    同一进程内同一地址同时只下载一次，多个进程重复下载时结果相同
+    :param url: 图片地址
+    :param force: 为True时忽略已有结果重新下载
+    :return: 图片内容哈希
+    """
+    with _url_locks_lock:
+        lock = _url_locks.setdefault(url, threading.Lock())
+    with lock:
+        if not force and has_variants(url):
+            return _read_content_hash(url)
+
+        content = download_image(url)
+        content_hash = hashlib.sha256(content).hexdigest()
+
+        os.makedirs(_store_dir('variants'), exist_ok=True)
+        os.makedirs(_store_dir('sources'), exist_ok=True)
+        for (variant, image_format), data in render_variants(content).items():
+            write_file_atomic(_variant_path(content_hash, variant, image_format), data)
+        # 缩略图全部写入后再记录索引，中断时下次会重新处理
+        write_file_atomic(_source_path(url), content_hash.encode('utf-8'))
+    evict_fish_images()
+    return content_hash
+
+
+def ensure_variant(url: str, variant: str, image_format: str):
+    """
+    获取缩略图，未生成时立即下载生成
+    :return: (文件路径, MIME类型)，存储空间不足以保留时返回None
+    """
+    result = get_variant_path(url, variant, image_format)
+    if result is None:
+        fetch_fish_image(url)
+        result = get_variant_path(url, variant, image_format)
+    return result
+
+
+def _variant_entries():
+    entries = []
+    variant_dir = _store_dir('variants')
+    if not os.path.isdir(variant_dir):
+        return entries
+    for entry in os.scandir(variant_dir):
+        if not entry.is_file() or entry.name.endswith('.tmp'):
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+    return entries
+
+
+def evict_fish_images():
+    """
+    缩略图总大小超过FISH_IMAGE_CACHE_MAX_BYTES时，从最久未使用的开始删除
+    被删除的缩略图在下次请求时重新下载生成
+    """
+    entries = _variant_entries()
+    total = sum(size for _, size, _ in entries)
+    if total <= settings.FISH_IMAGE_CACHE_MAX_BYTES:
+        return
+    entries.sort()
+    for _, size, path in entries:
+        if total <= settings.FISH_IMAGE_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def fish_image_stats() -> dict:
+    """缩略图存储的文件数和占用字节数"""
+    entries = _variant_entries()
+    return {'files': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'max_bytes': settings.FISH_IMAGE_CACHE_MAX_BYTES}
@@ -0,0 +1,193 @@
+import time
+import logging
+from abc import ABC, abstractmethod
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Case, IntegerField, Q, QuerySet, When
+from django.db.models.expressions import RawSQL
+
+from wiki.models import Fish
+
+logger = logging.getLogger(__name__)
+
+
+class FishSearchBackend(ABC):
+    """
+    鱼类全文搜索后端基类，搜索范围为名称和简介，结果按相关度排序
+    """
+    name = 'base'
+
+    def __init__(self, using: str = DEFAULT_DB_ALIAS):
+        """
+        :param using: 数据库别名
+        """
+        self.using = using
+
+    @property
+    def connection(self):
+        return connections[self.using]
+
+    def is_available(self) -> bool:
+        """索引是否已建立"""
+        return True
+
+    @abstractmethod
+    def search(self, queryset: QuerySet, query: str) -> QuerySet:
+        """在queryset中搜索，返回按相关度排序的结果"""
+
+    def rebuild(self) -> None:
+        """建立（或重建）索引"""
+
+
+class LikeSearchBackend(FishSearchBackend):
+    """
+    不使用索引的子串匹配，名称匹配的排在简介匹配的前面
+    用于不支持全文索引的数据库，以及短于全文索引最小词长的查询
+    """
+    name = 'like'
+
+    def search(self, queryset, query):
+        return (queryset.filter(Q(name__icontains=query) | Q(description__icontains=query))
+                .annotate(relevance=Case(When(name=query, then=2), When(name__icontains=query, then=1),
+                                         default=0, output_field=IntegerField()))
+                .order_by('-relevance', 'name', 'id'))
+
+
+class SQLiteFTSSearchBackend(FishSearchBackend):
+    """
+    SQLite FTS5全文索引（trigram分词，支持中文），通过触发器与鱼类表保持同步
+    trigram分词要求查询至少3个字符，更短的查询使用子串匹配
+    """
+    name = 'sqlite_fts5'
+    table = 'wiki_fish_fts'
+    min_query_length = 3
+
+    def is_available(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [self.table])
+            return cursor.fetchone() is not None
+
+    def search(self, queryset, query):
+        if len(query) < self.min_query_length:
+            return LikeSearchBackend(self.using).search(queryset, query)
+        # 整个查询作为一个短语匹配，名称的权重高于简介
+        phrase = '"' + query.replace('"', '""') + '"'
+        # 与全文索引按rowid连接，排序和分页都在同一条查询中完成（bm25越小越相关）
+        fish_table = queryset.model._meta.db_table
+        return (queryset.extra(tables=[self.table],
+                               where=[f"{self.table}.rowid = {fish_table}.id", f"{self.table} MATCH %s"],
+                               params=[phrase],
+                               select={'relevance': f"bm25({self.table}, 10.0, 1.0)"})
+                .order_by('relevance', 'name', 'id'))
+
+    def rebuild(self):
+        fish_table = Fish._meta.db_table
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+                           f"name, description, content='{fish_table}', content_rowid='id', tokenize='trigram')")
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {self.table}_ai AFTER INSERT ON {fish_table} BEGIN
+                    INSERT INTO {self.table}(rowid, name, description) VALUES (new.id, new.name, new.description);
+                END""")
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {self.table}_ad AFTER DELETE ON {fish_table} BEGIN
+                    INSERT INTO {self.table}({self.table}, rowid, name, description)
+                    VALUES ('delete', old.id, old.name, old.description);
+                END""")
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {self.table}_au AFTER UPDATE ON {fish_table} BEGIN
+                    INSERT INTO {self.table}({self.table}, rowid, name, description)
+                    VALUES ('delete', old.id, old.name, old.description);
+                    INSERT INTO {self.table}(rowid, name, description) VALUES (new.id, new.name, new.description);
+                END""")
+            cursor.execute(f"INSERT INTO {self.table}({self.table}) VALUES ('rebuild')")
+
+
+class MySQLFulltextSearchBackend(FishSearchBackend):
+    """
+    MySQL FULLTEXT索引（ngram分词，支持中文），由MySQL自动维护
+    短于ngram_token_size（默认2）的查询使用子串匹配
+    """
+    name = 'mysql_fulltext'
+    index = 'wiki_fish_fulltext'
+    min_query_length = 2
+
+    def is_available(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM information_schema.statistics "
+                           "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s",
+                           [Fish._meta.db_table, self.index])
+            return cursor.fetchone() is not None
+
+    def search(self, queryset, query):
+        if len(query) < self.min_query_length:
+            return LikeSearchBackend(self.using).search(queryset, query)
+        # 布尔模式下整个查询作为一个短语匹配，避免ngram拆分后匹配到只含部分字的鱼
+        phrase = '"' + query.replace('"', ' ') + '"'
+        relevance = RawSQL("MATCH(name, description) AGAINST (%s IN BOOLEAN MODE)", (phrase,))
+        return queryset.annotate(relevance=relevance).filter(relevance__gt=0).order_by('-relevance', 'name', 'id')
+
+    def rebuild(self):
+        fish_table = Fish._meta.db_table
+        with self.connection.cursor() as cursor:
+            if self.is_available():
+                cursor.execute(f"ALTER TABLE {fish_table} DROP INDEX {self.index}")
+            cursor.execute(f"ALTER TABLE {fish_table} ADD FULLTEXT INDEX {self.index} (name, description) WITH PARSER ngram")
+
+
+BACKENDS = {
+    'sqlite': SQLiteFTSSearchBackend,
+    'mysql': MySQLFulltextSearchBackend,
+}
+
+# 全文索引未建立时，每隔多少秒重新检查一次（执行rebuild_fish_search后无需重启进程）
+AVAILABILITY_CHECK_INTERVAL = 60
+
+_available = {}  # (数据库别名, 后端名称) -> (索引是否已建立, 检查时间)
+
+def get_fish_search_backend(using: str = DEFAULT_DB_ALIAS) -> FishSearchBackend:
+    """
+    按数据库类型选择搜索后端，FISH_SEARCH_BACKEND为like时总是使用子串匹配
+    :param using: 数据库别名
+    """
+    backend_class = BACKENDS.get(connections[using].vendor)
+    if settings.FISH_SEARCH_BACKEND == 'like' or backend_class is None:
+        return LikeSearchBackend(using)
+    return backend_class(using)
+
+
+def search_fish(queryset: QuerySet, query: str) -> QuerySet:
+    """
+    在名称和简介中搜索鱼类，结果按相关度排序；全文索引未建立时退回子串匹配
+    """
+    backend = get_fish_search_backend(queryset.db)
+    if not _is_available(backend):
+        backend = LikeSearchBackend(queryset.db)
+    return backend.search(queryset, query.strip())
+
+
+def _is_available(backend: FishSearchBackend) -> bool:
+    # 索引建立后不会消失，可用的结果一直有效；不可用的结果过期后重新检查
+    key = (backend.using, backend.name)
+    available, checked_at = _available.get(key, (None, 0.0))
+    if available or (available is not None and time.monotonic() - checked_at < AVAILABILITY_CHECK_INTERVAL):
+        return available
+    available = backend.is_available()
+    if not available and checked_at == 0.0:
+        logger.warning('鱼类全文索引（%s）未建立，使用子串匹配，可执行 python manage.py rebuild_fish_search 建立索引',
+                       backend.name)
+    _available[key] = (available, time.monotonic())
+    return available
+
+
+def ensure_fish_search_index(using: str = DEFAULT_DB_ALIAS, **kwargs):
+    """
+    migrate后在迁移的数据库上建立缺失的全文索引（post_migrate信号）
+    鱼类表尚未创建时（如wiki没有迁移文件）跳过
+    """
+    if Fish._meta.db_table not in connections[using].introspection.table_names():
+        return
+    backend = get_fish_search_backend(using)
+    if not backend.is_available():
+        backend.rebuild()
+    _available.pop((using, backend.name), None)
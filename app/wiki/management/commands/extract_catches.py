@@ -0,0 +1,134 @@
+import os
+import csv
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.core.management.base import BaseCommand, CommandError
+from services.catch_extractor.main import extract_fishes, CALLS_PER_IMAGE
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.bmp')
+FIELDS = ['image', 'time_percentage', 'fish_name', 'weight', 'price']
+
+
+def extract_image(image_path: str, call_executor: ThreadPoolExecutor):
+    """
+    提取单张图片中的鱼获（在工作线程中执行）
+    :param call_executor: 发起远程调用的线程池
+    :return: (fishes, 耗时秒数)
+    """
+    start = time.perf_counter()
+    _, fishes = extract_fishes(image_path=image_path, annotate=False, executor=call_executor)
+    return fishes, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = '批量提取目录下所有图片中的鱼获信息，边处理边写入CSV/NDJSON文件，支持中断后续跑'
+
+    def add_arguments(self, parser):
+        parser.add_argument('image_dir', type=str, help='图片目录（包括子目录）')
+        parser.add_argument('-o', '--output', type=str, required=True, help='输出文件路径（.csv或.ndjson）')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='输出格式，默认根据输出文件扩展名判断')
+        parser.add_argument('--workers', type=int, default=4, help='并发处理的图片数，默认4')
+        parser.add_argument('--checkpoint', type=str, help='进度文件路径，默认为输出文件路径加.checkpoint')
+        parser.add_argument('--restart', action='store_true', help='忽略已有进度，清空输出文件后重新处理')
+
+    def handle(self, *args, **options):
+        image_dir = options['image_dir']
+        output_path = options['output']
+        output_format = options['format'] or ('ndjson' if output_path.endswith(('.ndjson', '.jsonl')) else 'csv')
+        checkpoint_path = options['checkpoint'] or f'{output_path}.checkpoint'
+
+        if not os.path.isdir(image_dir):
+            raise CommandError(f'目录不存在: {image_dir}')
+
+        if options['restart']:
+            for path in (output_path, checkpoint_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+        # 1. 读取进度，跳过已处理的图片
+        # 进度文件每行为 图片路径\t写入该图片结果后输出文件的大小，续跑前截掉最后一条进度之后写入的内容，
+        # 避免上次在写入结果和记录进度之间中断时，续跑重复写入同一张图片的结果
+        done = set()
+        resume_size = None
+        if os.path.exists(checkpoint_path):
+            resume_size = 0
+            with open(checkpoint_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    relative_path, _, size = line.rstrip('\n').partition('\t')
+                    if not relative_path:
+                        continue
+                    done.add(relative_path)
+                    resume_size = int(size) if size else None
+        if resume_size is not None and os.path.exists(output_path) and os.path.getsize(output_path) > resume_size:
+            with open(output_path, 'r+b') as f:
+                f.truncate(resume_size)
+
+        image_paths = []
+        for root, _, files in os.walk(image_dir):
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    relative_path = os.path.relpath(os.path.join(root, name), image_dir)
+                    if relative_path not in done:
+                        image_paths.append(relative_path)
+        image_paths.sort()
+
+        self.stdout.write(f'共 {len(image_paths) + len(done)} 张图片，已处理 {len(done)} 张，待处理 {len(image_paths)} 张')
+        if not image_paths:
+            return
+
+        # 2. 并发处理，每完成一张立即写入结果并记录进度
+        processed_count = 0
+        fish_count = 0
+        failed_count = 0
+        total_latency = 0.0
+        start = time.perf_counter()
+
+        output_dir = os.path.dirname(os.path.abspath(output_path))
+        os.makedirs(output_dir, exist_ok=True)
+        write_header = output_format == 'csv' and (not os.path.exists(output_path) or os.path.getsize(output_path) == 0)
+
+        # 每张图片最多同时发起两次远程调用，按并发图片数单独创建调用线程池，不受共享线程池大小的限制
+        with open(output_path, 'a', encoding='utf-8', newline='') as output_file, \
+                open(checkpoint_path, 'a', encoding='utf-8') as checkpoint_file, \
+                ThreadPoolExecutor(max_workers=options['workers'] * CALLS_PER_IMAGE,
+                                   thread_name_prefix='catch_extractor') as call_executor, \
+                ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            writer = csv.writer(output_file) if output_format == 'csv' else None
+            if write_header:
+                writer.writerow(FIELDS)
+
+            futures = {executor.submit(extract_image, os.path.join(image_dir, path), call_executor): path
+                       for path in image_paths}
+            for future in as_completed(futures):
+                relative_path = futures[future]
+                try:
+                    fishes, latency = future.result()
+                except Exception as e:
+                    # 失败的图片不记录进度，续跑时会重新处理
+                    failed_count += 1
+                    self.stdout.write(self.style.ERROR(f'处理失败 {relative_path}: {str(e)}'))
+                    continue
+
+                for fish in fishes:
+                    row = [relative_path] + list(fish)
+                    if writer is not None:
+                        writer.writerow(row)
+                    else:
+                        output_file.write(json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) + '\n')
+                output_file.flush()
+                checkpoint_file.write(f'{relative_path}\t{os.fstat(output_file.fileno()).st_size}\n')
+                checkpoint_file.flush()
+
+                processed_count += 1
+                fish_count += len(fishes)
+                total_latency += latency
+                self.stdout.write(f'[{processed_count + failed_count}/{len(image_paths)}] {relative_path}: {len(fishes)} 条鱼获')
+
+        # 3. 输出吞吐统计
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'处理完成: 成功 {processed_count} 张，失败 {failed_count} 张，共 {fish_count} 条鱼获，'
+            f'耗时 {elapsed:.1f}s，吞吐 {processed_count / elapsed:.2f} 张/秒，'
+            f'单张平均 {total_latency / processed_count if processed_count else 0:.2f}s'
+        ))
@@ -0,0 +1,45 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.core.management.base import BaseCommand
+from wiki.models import Fish
+from wiki.fish_images import fetch_fish_image, has_variants, fish_image_stats
+
+
+class Command(BaseCommand):
+    help = '下载鱼类图片并生成本地缩略图，已生成的跳过，支持中断后续跑'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='并发下载的图片数，默认8')
+        parser.add_argument('--force', action='store_true', help='忽略已生成的缩略图，全部重新下载')
+
+    def handle(self, *args, **options):
+        urls = sorted(set(Fish.objects.exclude(img__isnull=True).exclude(img='').values_list('img', flat=True)))
+        pending = urls if options['force'] else [url for url in urls if not has_variants(url)]
+        self.stdout.write(f'共 {len(urls)} 张图片，已生成 {len(urls) - len(pending)} 张，待处理 {len(pending)} 张')
+        if not pending:
+            return
+
+        done_count = 0
+        failed_count = 0
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as executor:
+            futures = {executor.submit(fetch_fish_image, url, options['force']): url for url in pending}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    # 失败的图片没有记录索引，续跑时会重新处理
+                    failed_count += 1
+                    self.stdout.write(self.style.ERROR(f'处理失败 {url}: {str(e)}'))
+                    continue
+                done_count += 1
+                self.stdout.write(f'[{done_count + failed_count}/{len(pending)}] {url}')
+
+        elapsed = time.perf_counter() - start
+        stats = fish_image_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f'处理完成: 成功 {done_count} 张，失败 {failed_count} 张，耗时 {elapsed:.1f}s，'
+            f'吞吐 {done_count / elapsed:.2f} 张/秒，缩略图 {stats["files"]} 个，'
+            f'占用 {stats["bytes"] / 1024 / 1024:.1f}MB / {stats["max_bytes"] / 1024 / 1024:.0f}MB'
+        ))
@@ -1,52 +1,166 @@
 import json
-from django.core.management.base import BaseCommand
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 from wiki.models import Fish
+from wiki.fish_cache import bump_catalog_generation
+from services.catch_extractor.fish_names import invalidate_fish_name_matcher
+
+# 每次从文件读取的字符数
+READ_CHUNK_SIZE = 64 * 1024
+# 可能出现在数字中的字符，元素后紧跟这些字符时数字可能还未读完
+NUMBER_CHARS = frozenset('0123456789.eE+-')
+
+
+def iter_json_array(file, chunk_size=READ_CHUNK_SIZE):
+    """
+    逐个读取JSON数组中的元素，不把整个文件加载到内存
+    元素之间必须恰好有一个逗号，格式错误时抛出json.JSONDecodeError
+    :param file: 以文本模式打开的文件，内容为JSON数组
+    :param chunk_size: 每次读取的字符数
+    :return: 元素的生成器
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+
+    def read_more():
+        nonlocal buffer, eof
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+    def next_token() -> str:
+        # 跳过空白（可能跨越多个块），返回下一个非空白字符，文件结束时返回空字符串
+        nonlocal buffer
+        buffer = buffer.lstrip()
+        while not buffer and not eof:
+            read_more()
+            buffer = buffer.lstrip()
+        return buffer[:1]
+
+    if next_token() != '[':
+        raise json.JSONDecodeError('应为JSON数组', buffer, 0)
+    buffer = buffer[1:]
+    if next_token() == ']':
+        return
+    while True:
+        if next_token() in (']', ','):
+            raise json.JSONDecodeError('应为数组元素', buffer, 0)
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            # 元素不完整，继续读取
+            if eof:
+                raise
+            read_more()
+            continue
+        # 数字可能在块的末尾被截断（如 12.5 只读到了 12. ，此时会解析出 12），
+        # 后面出现不属于数字的字符或已读到文件末尾时才能确定已完整
+        if not eof and (end == len(buffer) or buffer[end] in NUMBER_CHARS):
+            read_more()
+            continue
+        yield item
+        buffer = buffer[end:]
+
+        token = next_token()
+        if token == ']':
+            return
+        if token != ',':
+            raise json.JSONDecodeError('数组元素之间应为逗号', buffer, 0)
+        buffer = buffer[1:]
+
 
 class Command(BaseCommand):
-    help = '从JSON文件导入鱼类数据到数据库'
+    help = '从JSON文件导入鱼类数据到数据库（已存在的鱼按名称更新，内容未变化的跳过）'
 
     def add_arguments(self, parser):
         parser.add_argument('json_file', type=str, help='JSON文件的路径')
         parser.add_argument('--clear', action='store_true', help='导入前清空现有数据')
+        parser.add_argument('--batch-size', type=int, default=500, help='每个事务写入的数量')
 
     def handle(self, *args, **options):
         file_path = options['json_file']
-        
+        batch_size = max(1, options['batch_size'])
+
+        # 先完整解析一遍（不写入），JSON格式错误时不清空、不导入任何数据
+        try:
+            with open(file_path, 'r', encoding='utf-8') as file:
+                for _ in iter_json_array(file):
+                    pass
+        except FileNotFoundError:
+            self.stdout.write(self.style.ERROR(f'文件不存在: {file_path}'))
+            return
+        except json.JSONDecodeError as e:
+            raise CommandError(f'JSON格式错误: {e}')
+
         # 如果指定了clear参数，先清空现有数据
         if options['clear']:
             deleted_count = Fish.objects.all().delete()[0]
             self.stdout.write(self.style.SUCCESS(f'已删除 {deleted_count} 条现有鱼类数据'))
-        
+
+        # 计数器
+        self.counts = {'created': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0}
+        started = time.monotonic()
         try:
             with open(file_path, 'r', encoding='utf-8') as file:
-                fish_data = json.load(file)
-                
-                # 计数器
-                created_count = 0
-                
-                for fish_item in fish_data:
-                    # 检查鱼是否已存在
-                    fish, created = Fish.objects.get_or_create(
-                        name=fish_item.get('name', ''),
-                        defaults={
-                            'description': fish_item.get('description', ''),
-                            'img': fish_item.get('img', ''),
-                            'fish_class': fish_item.get('fish_class', ''),
-                            'rare_weight': fish_item.get('rare_weight', ''),
-                            'super_rare_weight': fish_item.get('super_rare_weight', ''),
-                        }
-                    )
-                    
-                    if created:
-                        created_count += 1
-                
-                self.stdout.write(
-                    self.style.SUCCESS(f'成功导入 {created_count} 条鱼类数据')
-                )
-                
-        except FileNotFoundError:
-            self.stdout.write(self.style.ERROR(f'文件不存在: {file_path}'))
-        except json.JSONDecodeError:
-            self.stdout.write(self.style.ERROR('JSON格式错误'))
+                batch = {}
+                for fish_item in iter_json_array(file):
+                    name = fish_item.get('name') if isinstance(fish_item, dict) else None
+                    if not name:
+                        self.counts['skipped'] += 1
+                        continue
+                    # 同一批次内重名的鱼以后出现的为准
+                    batch[name] = fish_item
+                    if len(batch) >= batch_size:
+                        self.write_batch(batch)
+                        batch = {}
+                if batch:
+                    self.write_batch(batch)
         except Exception as e:
-            self.stdout.write(self.style.ERROR(f'导入过程中发生错误: {str(e)}'))
\ No newline at end of file
+            self.stdout.write(self.style.ERROR(f'导入过程中发生错误: {str(e)}'))
+        finally:
+            # 批量写入不触发信号，统一使鱼名匹配器和鱼类接口的缓存失效（出错时已提交的批次同样需要）
+            if self.counts['created'] or self.counts['updated']:
+                invalidate_fish_name_matcher()
+                bump_catalog_generation()
+
+        elapsed = time.monotonic() - started
+        total = sum(self.counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"导入完成：新增 {self.counts['created']} 条，更新 {self.counts['updated']} 条，"
+            f"未变化 {self.counts['unchanged']} 条，跳过 {self.counts['skipped']} 条（缺少名称），"
+            f"耗时 {elapsed:.2f} 秒（{total / elapsed if elapsed else 0:.0f} 条/秒）"
+        ))
+
+    @transaction.atomic
+    def write_batch(self, batch: dict):
+        """
+        在一个事务中写入一批鱼：按名称比较内容哈希，只新增或更新有变化的鱼
+        :param batch: 名称 -> 数据文件中的条目
+        """
+        existing = dict(Fish.objects.filter(name__in=list(batch)).values_list('name', 'content_hash'))
+        counts = {'created': 0, 'updated': 0, 'unchanged': 0}
+        changed = []
+        for name, fish_item in batch.items():
+            fish = Fish(**{field: fish_item.get(field, '') for field in Fish.CONTENT_FIELDS})
+            fish.fill_derived_fields()
+            if name not in existing:
+                counts['created'] += 1
+            elif existing[name] != fish.content_hash:
+                counts['updated'] += 1
+            else:
+                counts['unchanged'] += 1
+                continue
+            changed.append(fish)
+
+        update_fields = [field for field in Fish.CONTENT_FIELDS + Fish.DERIVED_FIELDS if field != 'name']
+        update_fields.append('updated_at')
+        # MySQL的ON DUPLICATE KEY UPDATE不能指定冲突字段，按唯一索引（name）判断冲突
+        unique_fields = ['name'] if connection.features.supports_update_conflicts_with_target else None
+        if changed:
+            Fish.objects.bulk_create(changed, update_conflicts=True, unique_fields=unique_fields,
+                                     update_fields=update_fields)
+        # 写入成功后再计数，出错时只统计已写入的批次
+        for key, value in counts.items():
+            self.counts[key] += value
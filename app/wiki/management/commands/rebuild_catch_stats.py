@@ -0,0 +1,21 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from wiki.catch_stats import rebuild_catch_stats
+
+
+class Command(BaseCommand):
+    help = '从Catch表重新计算按种类和日期的鱼获汇总（回填历史数据，或删除鱼获后修正汇总）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=str, help='只重建该日期（含）之后的汇总，格式YYYY-MM-DD，默认重建全部')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError(f'日期格式错误: {options["since"]}')
+
+        count = rebuild_catch_stats(since)
+        self.stdout.write(self.style.SUCCESS(f'已重建 {count} 条鱼获汇总'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+from wiki.fish_search import get_fish_search_backend
+from wiki.models import Fish
+
+
+class Command(BaseCommand):
+    help = '建立或重建鱼类全文搜索索引（SQLite FTS5 / MySQL ngram FULLTEXT）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='数据库别名，默认为default')
+
+    def handle(self, *args, **options):
+        database = options['database']
+        backend = get_fish_search_backend(database)
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'已重建鱼类搜索索引（{backend.name}），共 {Fish.objects.using(database).count()} 条鱼类数据'))
@@ -1,25 +1,135 @@
+import re
+import json
+import uuid
+import hashlib
+from decimal import Decimal
 from django.db import models
 
+# 重量文本，如"250g"、"1.5kg"、"1T"、"＜88kg"，不带单位时为克
+WEIGHT_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(kg|g|t)?', re.IGNORECASE)
+WEIGHT_UNITS_KG = {'g': Decimal('0.001'), 'kg': Decimal(1), 't': Decimal(1000)}
+
+
+def parse_weight_kg(text, default_unit='g'):
+    """
+    将图鉴中的重量文本换算为公斤
+    :param text: 重量文本
+    :param default_unit: 不带单位时的单位，图鉴数据为g，接口参数为kg
+    :return: Decimal，"-"、"?"等无法识别的文本返回None
+    """
+    match = WEIGHT_PATTERN.search(text or '')
+    if match is None:
+        return None
+    value, unit = match.groups()
+    return (Decimal(value) * WEIGHT_UNITS_KG[(unit or default_unit).lower()]).quantize(Decimal('0.001'))
+
+
 # Create your models here.
 class Fish(models.Model):
     """鱼类"""
     name = models.CharField('名称（种类）', unique=True, max_length=100, blank=True, null=True)
     description = models.TextField('简介', blank=True, null=True)
     img = models.CharField('鱼的图片', max_length=255, blank=True, null=True)
-    fish_class = models.CharField('稀有度', max_length=50, blank=True, null=True)
+    fish_class = models.CharField('稀有度', max_length=50, blank=True, null=True, db_index=True)
     rare_weight = models.CharField('上星重量', max_length=50, blank=True, null=True)
     super_rare_weight = models.CharField('蓝冠重量', max_length=50, blank=True, null=True)
+    # 由rare_weight/super_rare_weight在保存时换算，用于按重量范围查询
+    rare_weight_kg = models.DecimalField('上星重量（公斤）', max_digits=10, decimal_places=3, blank=True, null=True,
+                                         db_index=True)
+    super_rare_weight_kg = models.DecimalField('蓝冠重量（公斤）', max_digits=10, decimal_places=3, blank=True, null=True,
+                                               db_index=True)
+    # 图鉴字段的sha256，导入时用于跳过未变化的鱼
+    content_hash = models.CharField('内容哈希', max_length=64, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # 来自图鉴数据文件的字段
+    CONTENT_FIELDS = ('name', 'description', 'img', 'fish_class', 'rare_weight', 'super_rare_weight')
+    # 由图鉴字段派生的字段
+    DERIVED_FIELDS = ('rare_weight_kg', 'super_rare_weight_kg', 'content_hash')
+
     def __str__(self):
         return self.name
 
+    @classmethod
+    def compute_content_hash(cls, values: dict) -> str:
+        """
+        计算图鉴字段的哈希
+        :param values: 字段名 -> 值
+        :return: sha256十六进制字符串
+        """
+        content = json.dumps([values.get(field) for field in cls.CONTENT_FIELDS], ensure_ascii=False)
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def fill_derived_fields(self):
+        """根据图鉴字段更新重量数值列和内容哈希"""
+        self.rare_weight_kg = parse_weight_kg(self.rare_weight)
+        self.super_rare_weight_kg = parse_weight_kg(self.super_rare_weight)
+        self.content_hash = self.compute_content_hash({field: getattr(self, field) for field in self.CONTENT_FIELDS})
+
+    def save(self, *args, **kwargs):
+        self.fill_derived_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and (set(self.CONTENT_FIELDS) & set(update_fields)):
+            kwargs['update_fields'] = set(update_fields) | set(self.DERIVED_FIELDS)
+        super().save(*args, **kwargs)
+
 class Catch(models.Model):
     """鱼获"""
     # fish = models.ForeignKey(Fish, on_delete=models.CASCADE)
-    species = models.CharField('种类', max_length=100, blank=True, null=True)
+    species = models.CharField('种类', max_length=100, blank=True, null=True, db_index=True)
     weight = models.CharField('重量', max_length=50, blank=True, null=True)
-    price = models.IntegerField('价格', blank=True, null=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    weight_kg = models.DecimalField('重量（公斤）', max_digits=10, decimal_places=3, blank=True, null=True)
+    price = models.DecimalField('价格', max_digits=12, decimal_places=2, blank=True, null=True)
+    time_percentage = models.CharField('时间百分比', max_length=50, blank=True, null=True)
+    # 上传图片的sha256，与position一起保证重复上传同一张截图时不会重复写入
+    fingerprint = models.CharField('图片指纹', max_length=64, blank=True, null=True)
+    position = models.PositiveSmallIntegerField('在截图中的序号', blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fingerprint', 'position'], name='unique_catch_per_upload'),
+        ]
+
+class CatchDailyStat(models.Model):
+    """鱼获按种类和日期的汇总，写入Catch时增量更新"""
+    species = models.CharField('种类', max_length=100)
+    day = models.DateField('日期')
+    count = models.PositiveIntegerField('鱼获数', default=0)
+    # 以下汇总只统计重量和价格都已解析出的鱼获
+    priced_count = models.PositiveIntegerField('有重量和价格的鱼获数', default=0)
+    sum_weight_kg = models.DecimalField('总重量（公斤）', max_digits=14, decimal_places=3, default=0)
+    sum_price = models.DecimalField('总价格', max_digits=16, decimal_places=2, default=0)
+    max_weight_kg = models.DecimalField('最大重量（公斤）', max_digits=10, decimal_places=3, default=0)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['species', 'day'], name='unique_catch_stat_per_day'),
+        ]
+        indexes = [
+            models.Index(fields=['day']),
+        ]
+
+class CatchJob(models.Model):
+    """鱼获提取异步任务"""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, '排队中'),
+        (STATUS_RUNNING, '处理中'),
+        (STATUS_SUCCEEDED, '已完成'),
+        (STATUS_FAILED, '失败'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField('状态', max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    result = models.JSONField('结果', blank=True, null=True)
+    error = models.TextField('错误信息', blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    started_at = models.DateTimeField('开始处理时间', blank=True, null=True)
+    finished_at = models.DateTimeField('完成时间', blank=True, null=True)
@@ -1,4 +1,4 @@
-from wiki.models import Catch
+from wiki.models import Catch, CatchJob, CatchDailyStat
 from rest_framework import serializers
 
 class CatchSerializer(serializers.ModelSerializer):
@@ -8,6 +8,14 @@ class CatchSerializer(serializers.ModelSerializer):
 
 class ImageUploadSerializer(serializers.Serializer):
     image = serializers.ImageField(required=True, help_text="上传的鱼类图片")
+    image_mode = serializers.ChoiceField(
+        choices=['base64', 'url', 'none'], default='base64',
+        help_text="处理后图片的返回方式：base64内嵌、url短期链接、none不返回（跳过标注）"
+    )
+    image_format = serializers.ChoiceField(choices=['png', 'jpeg', 'webp'], default='png', help_text="处理后图片的格式")
+    image_quality = serializers.IntegerField(default=85, min_value=1, max_value=100, help_text="jpeg/webp的压缩质量")
+    image_max_size = serializers.IntegerField(required=False, min_value=64, help_text="处理后图片最长边的像素上限")
+    async_mode = serializers.BooleanField(default=False, help_text="是否异步处理，为true时立即返回任务ID")
     
     def validate_image(self, value):
         # 文件大小验证 (限制为10MB)
@@ -39,8 +47,39 @@ class FishCatchItemSerializer(serializers.Serializer):
         return super().to_internal_value(data)
 
 class ImageProcessingResponseSerializer(serializers.Serializer):
-    image = serializers.CharField(help_text="处理后的图片（Base64编码）")
+    image = serializers.CharField(required=False, help_text="处理后的图片（Base64编码），image_mode为base64时返回")
+    image_url = serializers.CharField(required=False, help_text="处理后图片的短期链接，image_mode为url时返回")
+    image_format = serializers.CharField(required=False, help_text="处理后图片的格式")
     fishes = serializers.ListField(
         child=serializers.ListField(child=serializers.CharField(allow_blank=True)),
         help_text="识别出的鱼类列表，格式为二维数组 [[时间百分比, 鱼名, 重量, 分数], ...]"
-    ) 
\ No newline at end of file
+    )
+    card_cache = serializers.DictField(required=False, help_text="本次请求的卡片缓存命中统计，启用卡片缓存时返回")
+
+class CatchJobSerializer(serializers.ModelSerializer):
+    job_id = serializers.UUIDField(source='id', read_only=True)
+
+    class Meta:
+        model = CatchJob
+        fields = ('job_id', 'status', 'result', 'error', 'created_at', 'started_at', 'finished_at')
+
+class CatchDailyStatSerializer(serializers.ModelSerializer):
+    avg_price_per_kg = serializers.SerializerMethodField(help_text="平均每公斤价格（只统计重量和价格都已解析出的鱼获）")
+
+    class Meta:
+        model = CatchDailyStat
+        fields = ('species', 'day', 'count', 'priced_count', 'sum_weight_kg', 'sum_price', 'max_weight_kg',
+                  'avg_price_per_kg')
+
+    def get_avg_price_per_kg(self, obj):
+        if not obj.sum_weight_kg:
+            return None
+        return round(obj.sum_price / obj.sum_weight_kg, 2)
+
+class StatsQuerySerializer(serializers.Serializer):
+    species = serializers.CharField(required=False, help_text="鱼的种类，不填时返回所有种类")
+    days = serializers.IntegerField(required=False, min_value=1, max_value=366, help_text="统计最近多少天（含今天）")
+
+class HeaviestStatsQuerySerializer(serializers.Serializer):
+    days = serializers.IntegerField(required=False, min_value=1, max_value=366, help_text="统计最近多少天（含今天）")
+    limit = serializers.IntegerField(default=20, min_value=1, max_value=100, help_text="返回的种类数上限")
@@ -1,7 +1,45 @@
-from wiki.models import Fish
+from wiki.models import Fish, WEIGHT_PATTERN, parse_weight_kg
 from rest_framework import serializers
+from wiki.fish_images import variant_urls
 
 class FishSerializer(serializers.ModelSerializer):
+    # 本地缩略图地址 {规格: {格式: 地址}}，首次访问时生成
+    thumbnails = serializers.SerializerMethodField()
+
     class Meta:
         model = Fish
         fields = '__all__'
+        read_only_fields = Fish.DERIVED_FIELDS
+
+    def get_thumbnails(self, obj):
+        return variant_urls(obj)
+
+
+class WeightKgField(serializers.Field):
+    """
+    重量查询参数，如 1.5、1.5kg、500g、2t，不带单位时为公斤，校验后为Decimal公斤数
+    """
+    default_error_messages = {'invalid': '不是有效的重量: {value}'}
+
+    def to_internal_value(self, data):
+        text = str(data).strip()
+        # 参数必须完整是一个重量，不像图鉴文本那样从中查找
+        weight_kg = parse_weight_kg(text, default_unit='kg') if WEIGHT_PATTERN.fullmatch(text) else None
+        if weight_kg is None:
+            self.fail('invalid', value=data)
+        return weight_kg
+
+    def to_representation(self, value):
+        return value
+
+
+class FishWeightQuerySerializer(serializers.Serializer):
+    """鱼类列表的重量范围查询参数，对应rare_weight_kg/super_rare_weight_kg"""
+    rare_weight__gt = WeightKgField(required=False, help_text="上星重量大于，单位kg（可带单位g、kg、t）")
+    rare_weight__gte = WeightKgField(required=False, help_text="上星重量大于等于，单位kg（可带单位g、kg、t）")
+    rare_weight__lt = WeightKgField(required=False, help_text="上星重量小于，单位kg（可带单位g、kg、t）")
+    rare_weight__lte = WeightKgField(required=False, help_text="上星重量小于等于，单位kg（可带单位g、kg、t）")
+    super_rare_weight__gt = WeightKgField(required=False, help_text="蓝冠重量大于，单位kg（可带单位g、kg、t）")
+    super_rare_weight__gte = WeightKgField(required=False, help_text="蓝冠重量大于等于，单位kg（可带单位g、kg、t）")
+    super_rare_weight__lt = WeightKgField(required=False, help_text="蓝冠重量小于，单位kg（可带单位g、kg、t）")
+    super_rare_weight__lte = WeightKgField(required=False, help_text="蓝冠重量小于等于，单位kg（可带单位g、kg、t）")
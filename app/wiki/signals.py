@@ -0,0 +1,21 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from services.catch_extractor.fish_names import invalidate_fish_name_matcher
+from wiki.catch_stats import update_catch_stats
+from wiki.fish_cache import bump_catalog_generation
+from wiki.models import Catch, Fish
+
+
+@receiver([post_save, post_delete], sender=Fish)
+def refresh_fish_name_matcher(sender, **kwargs):
+    """鱼类表变化时，让鱼名匹配器在下次使用时重新加载，并使鱼类接口的缓存失效"""
+    invalidate_fish_name_matcher()
+    bump_catalog_generation()
+
+
+@receiver(post_save, sender=Catch)
+def add_catch_to_stats(sender, instance, created, **kwargs):
+    """逐条新建的鱼获累加到汇总中（批量写入由save_catches负责更新汇总）"""
+    if created:
+        update_catch_stats([instance])
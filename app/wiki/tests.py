@@ -1,3 +1,464 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import random
+import tempfile
+from datetime import timedelta
+from unittest import mock
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.utils import timezone
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase
+from urllib3.exceptions import ConnectTimeoutError, EmptyPoolError, ReadTimeoutError
+from PIL import Image
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from services.catch_extractor import http_client
+from services.catch_extractor.fish_names import FishNameMatcher, edit_distance, normalize_name
+from services.catch_extractor.matching import GridIndex, group_words_by_card
+from services.catch_extractor.preprocess import UploadTransform, prepare_upload
+from services.catch_extractor.result_cache import FileCacheBackend, MemoryCacheBackend, ResultCache
+from services.catch_extractor.token_manager import AccessTokenManager
+from services.catch_extractor.utils import BoundingBox
+from wiki.catch_jobs import fail_stale_catch_jobs
+from wiki.catch_stats import rebuild_catch_stats
+from wiki.catch_store import save_catches
+from wiki.management.commands.fish_import import iter_json_array
+from wiki.models import Catch, CatchDailyStat, CatchJob, Fish
+
+
+class FishNameMatcherTests(SimpleTestCase):
+    def test_edit_distance(self):
+        self.assertEqual(edit_distance('', ''), 0)
+        self.assertEqual(edit_distance('鲤鱼', ''), 2)
+        self.assertEqual(edit_distance('大口鲈鱼', '小口鲈鱼'), 1)
+        self.assertEqual(edit_distance('鲈鱼', '大口鲈鱼'), 2)
+        self.assertEqual(edit_distance('abc', 'cab'), edit_distance('cab', 'abc'))
+
+    def test_normalize_name(self):
+        self.assertEqual(normalize_name(' 鲟鱼（幼） '), '鲟鱼(幼)')
+
+    def test_exact_match_after_normalize(self):
+        matcher = FishNameMatcher(['鲟鱼(幼)'])
+        self.assertEqual(matcher.match('鲟 鱼（幼）'), '鲟鱼(幼)')
+
+    def test_short_word_requires_exact_match(self):
+        # 两个字及以下只做精确匹配，即使编辑距离为1也不匹配
+        matcher = FishNameMatcher(['鲤鱼', '大口鲈鱼'])
+        self.assertEqual(matcher.match('鲤鱼'), '鲤鱼')
+        self.assertIsNone(matcher.match('鲫鱼'))
+        self.assertIsNone(matcher.match('鲤'))
+
+    def test_fuzzy_match_picks_closest(self):
+        matcher = FishNameMatcher(['大口鲈鱼', '小嘴鲈'])
+        self.assertEqual(matcher.match('大口鲈'), '大口鲈鱼')
+        self.assertEqual(matcher.match('大囗鲈鱼'), '大口鲈鱼')
+
+    def test_fuzzy_match_beyond_max_distance(self):
+        matcher = FishNameMatcher(['大口鲈鱼'])
+        self.assertIsNone(matcher.match('大嘴鲑鱼'))
+
+    def test_tie_is_ambiguous(self):
+        # 与两个名称的编辑距离相同时无法确定，视为未匹配
+        matcher = FishNameMatcher(['大口鲈鱼', '小口鲈鱼'])
+        self.assertIsNone(matcher.match('中口鲈鱼'))
+        # 存在更近的候选时，较远的候选距离相同不影响结果
+        matcher = FishNameMatcher(['西伯利亚甲乙', '西伯利亚丙戊', '西伯利亚鲟鱼'])
+        self.assertEqual(matcher.match('西伯利亚鲟丁'), '西伯利亚鲟鱼')
+        self.assertIsNone(FishNameMatcher(['西伯利亚鲟甲', '西伯利亚鲟乙']).match('西伯利亚鲟丁'))
+
+    def test_memoized_result_matches_fresh_lookup(self):
+        matcher = FishNameMatcher(['大口鲈鱼', '小口鲈鱼'])
+        self.assertIsNone(matcher.match('中口鲈鱼'))
+        self.assertIsNone(matcher.match('中口鲈鱼'))
+        self.assertEqual(matcher.match('小口鲈鱼'), '小口鲈鱼')
+
+
+def _box(left, top, width, height):
+    return BoundingBox(left, top, width, height, is_center_format=False)
+
+
+class GridIndexTests(SimpleTestCase):
+    def setUp(self):
+        # 2x2排列的卡片，网格大小与卡片相同，卡片之间有间隙
+        self.cards = [_box(0, 0, 100, 50), _box(120, 0, 100, 50), _box(0, 70, 100, 50), _box(120, 70, 100, 50)]
+
+    def test_box_across_cell_boundary(self):
+        index = GridIndex(self.cards, error_margin=0, cell_size=(100, 50))
+        # 跨越y=50网格边界、同时与卡片1和3重叠的文字块取下标较小的卡片
+        self.assertEqual(index.first_overlapping(_box(150, 40, 60, 40)), 1)
+        # 跨越x=100和y=50网格边界，只与右下方的卡片重叠
+        self.assertEqual(index.first_overlapping(_box(130, 60, 60, 40)), 3)
+        self.assertIsNone(index.first_overlapping(_box(101, 51, 10, 10)))
+
+    def test_horizontal_error_margin(self):
+        word = _box(105, 10, 10, 10)
+        self.assertIsNone(GridIndex(self.cards, error_margin=0).first_overlapping(word))
+        # 横向允许误差，且误差会跨到相邻网格中的卡片
+        self.assertEqual(GridIndex(self.cards, error_margin=10).first_overlapping(word), 0)
+        self.assertIsNone(GridIndex(self.cards, error_margin=10).first_overlapping(_box(0, 55, 10, 10)))
+
+    def test_matches_linear_scan(self):
+        rng = random.Random(0)
+        cards = [_box(rng.randint(0, 1000), rng.randint(0, 1000), rng.randint(50, 200), rng.randint(30, 120))
+                 for _ in range(60)]
+        index = GridIndex(cards, error_margin=10)
+        for _ in range(500):
+            word = _box(rng.randint(-50, 1100), rng.randint(-50, 1100), rng.randint(5, 150), rng.randint(5, 60))
+            expected = next((i for i, card in enumerate(cards) if word.is_overlapping(card, 10)), None)
+            self.assertEqual(index.first_overlapping(word), expected)
+
+    def test_group_words_by_card(self):
+        words = [{'BoundingBox': _box(10, 10, 30, 10)},
+                 {'BoundingBox': _box(130, 75, 30, 10)},
+                 {'BoundingBox': _box(95, 40, 40, 10)},  # 跨越网格边界，与卡片0和1都重叠
+                 {'BoundingBox': _box(500, 500, 10, 10)},
+                 {'BoundingBox': _box(20, 30, 30, 10)}]
+        groups = group_words_by_card(words, self.cards, error_margin=0)
+        self.assertEqual(dict(groups), {0: [words[0], words[2], words[4]], 3: [words[1]]})
+        self.assertEqual(words[2]['fish_card_index'], 0)
+        self.assertNotIn('fish_card_index', words[3])
+        self.assertEqual(group_words_by_card(words, []), {})
+
+
+class IterJsonArrayTests(SimpleTestCase):
+    ITEMS = [
+        {'name': '鲤鱼', 'weight': 12345.678, 'note': '含有 ] , [ 和 "引号" 以及\\转义\n'},
+        1234567890,
+        -0.5e-3,
+        '\u4e2d\u6587 unicode',
+        [1, [2, {'a': None}]],
+        True,
+        None,
+        98765,
+    ]
+
+    def _parse(self, text, chunk_size):
+        return list(iter_json_array(io.StringIO(text), chunk_size=chunk_size))
+
+    def test_every_chunk_boundary(self):
+        # 块大小从1开始，数字、字符串、转义序列都会在某个块中被截断
+        for text in (json.dumps(self.ITEMS), json.dumps(self.ITEMS, ensure_ascii=False, indent=2)):
+            for chunk_size in range(1, 40):
+                with self.subTest(chunk_size=chunk_size):
+                    self.assertEqual(self._parse(text, chunk_size), self.ITEMS)
+
+    def test_number_split_at_chunk_end(self):
+        # 第一块恰好在数字中间结束，不能把12当作完整元素
+        self.assertEqual(self._parse('[12345,6]', 3), [12345, 6])
+        # 截断在小数点或指数之后时，已读到的部分也是合法的数字
+        self.assertEqual(self._parse('[12.5]', 4), [12.5])
+        self.assertEqual(self._parse('[3e-2]', 3), [3e-2])
+        self.assertEqual(self._parse('[-0.5]', 3), [-0.5])
+        self.assertEqual(self._parse('[1.5e10]', 4), [1.5e10])
+        self.assertEqual(self._parse('[12345]', 6), [12345])
+
+    def test_string_split_mid_escape(self):
+        self.assertEqual(self._parse('["ab\\u4e2dc", "\\"x"]', 5), ['ab\u4e2dc', '"x'])
+
+    def test_empty_array(self):
+        self.assertEqual(self._parse('  [ ]  ', 1), [])
+        self.assertEqual(self._parse('[]', 64), [])
+
+    def test_invalid_input(self):
+        with self.assertRaises(json.JSONDecodeError):
+            self._parse('{"name": "鲤鱼"}', 64)
+        with self.assertRaises(json.JSONDecodeError):
+            self._parse('[{"name": "鲤', 4)
+
+    def test_requires_exactly_one_comma(self):
+        for text in ('[1,,,2]', '[1 2]', '[,1]', '[1,]', '[1,2', '[{"a": 1}{"b": 2}]'):
+            for chunk_size in (1, 2, 64):
+                with self.subTest(text=text, chunk_size=chunk_size), self.assertRaises(json.JSONDecodeError):
+                    self._parse(text, chunk_size)
+
+    def test_import_rejects_malformed_file(self):
+        # 格式错误时在写入数据库之前报错（SimpleTestCase中访问数据库会失败）
+        with tempfile.NamedTemporaryFile('w', suffix='.json', encoding='utf-8') as f:
+            f.write('[{"name": "鲤鱼"},, {"name": "鲫鱼"}]')
+            f.flush()
+            with self.assertRaises(CommandError):
+                call_command('fish_import', f.name, '--clear', stdout=io.StringIO())
+
+
+class ResultCacheTests(SimpleTestCase):
+    def test_memory_lru_eviction(self):
+        backend = MemoryCacheBackend(max_bytes=10)
+        backend.set('a', b'aaaa', 60)
+        backend.set('b', b'bbbb', 60)
+        # 读取a后b成为最久未使用的条目，超出大小时先淘汰b
+        self.assertEqual(backend.get('a'), b'aaaa')
+        backend.set('c', b'cccc', 60)
+        self.assertIsNone(backend.get('b'))
+        self.assertEqual(backend.get('a'), b'aaaa')
+        self.assertEqual(backend.get('c'), b'cccc')
+        self.assertEqual(backend.info()['bytes'], 8)
+        # 超过上限的值不缓存，也不淘汰已有条目
+        backend.set('d', b'd' * 11, 60)
+        self.assertIsNone(backend.get('d'))
+        self.assertEqual(backend.info()['entries'], 2)
+
+    def test_memory_ttl(self):
+        backend = MemoryCacheBackend(max_bytes=100)
+        backend.set('a', b'aaaa', -1)
+        backend.set('b', b'bbbb', 60)
+        self.assertIsNone(backend.get('a'))
+        self.assertEqual(backend.get('b'), b'bbbb')
+        # 过期条目读取时删除，不再占用大小预算
+        self.assertEqual(backend.info(), {'entries': 1, 'bytes': 4, 'max_bytes': 100})
+
+    def test_file_ttl_and_eviction(self):
+        with tempfile.TemporaryDirectory() as directory:
+            backend = FileCacheBackend(directory, max_bytes=1024 * 1024)
+            backend.set('a', b'aaaa', -1)
+            backend.set('b', b'bbbb', 60)
+            self.assertIsNone(backend.get('a'))
+            self.assertEqual(backend.get('b'), b'bbbb')
+            self.assertEqual(backend.info()['entries'], 1)
+
+            # 只能容纳一个条目时，写入新条目会淘汰旧条目
+            backend = FileCacheBackend(directory, max_bytes=backend.info()['bytes'])
+            backend.set('c', b'cccc', 60)
+            self.assertIsNone(backend.get('b'))
+            self.assertEqual(backend.get('c'), b'cccc')
+
+    def test_result_cache_scope_and_image(self):
+        cache = ResultCache(MemoryCacheBackend(max_bytes=1024 * 1024), ttl=60)
+        key = cache.make_key(b'image', ('baidu', 'local', 1))
+        self.assertNotEqual(key, cache.make_key(b'image', ('baidu', 'local', 2)))
+        self.assertEqual(key, cache.make_key(b'image', ('baidu', 'local', 1)))
+
+        cache.set(key, [['10分', '镜鲤', '1.5', '0.25']], None)
+        self.assertEqual(cache.get(key), {'fishes': [['10分', '镜鲤', '1.5', '0.25']], 'image': None})
+        # 需要标注图片而缓存中没有时视为未命中
+        self.assertIsNone(cache.get(key, require_image=True))
+        self.assertEqual((cache.stats()['hits'], cache.stats()['misses']), (1, 1))
+
+
+class SaveCatchesTests(TestCase):
+    FISHES = [['10分-90%', '镜鲤', '1.5', '0.25'], ['11分-91%', '欧鳊', '2.125', '12.5']]
+
+    def test_reupload_is_not_saved_twice(self):
+        self.assertEqual(len(save_catches(b'screenshot', self.FISHES)), 2)
+        # 同一张截图再次上传时不重复写入，新截图正常写入
+        self.assertEqual(save_catches(b'screenshot', self.FISHES), [])
+        self.assertEqual(len(save_catches(b'another', self.FISHES[:1])), 1)
+        self.assertEqual(Catch.objects.count(), 3)
+        self.assertEqual(list(Catch.objects.order_by('id').values_list('position', flat=True)), [0, 1, 0])
+
+    def test_price_is_exact_decimal(self):
+        save_catches(b'screenshot', [['10分', '镜鲤', '0.1', '0.1'], ['11分', '镜鲤', '0.2', '0.2'], ['', '', '', '']])
+        prices = list(Catch.objects.order_by('position').values_list('price', flat=True))
+        self.assertEqual(prices, [Decimal('0.10'), Decimal('0.20'), None])
+        self.assertIsInstance(prices[0], Decimal)
+        # 汇总按Decimal累加，没有浮点误差
+        self.assertEqual(CatchDailyStat.objects.get(species='镜鲤').sum_price, Decimal('0.30'))
+
+
+class CatchStatsTests(TestCase):
+    def _stats(self):
+        return list(CatchDailyStat.objects.order_by('species', 'day').values_list(
+            'species', 'day', 'count', 'priced_count', 'sum_weight_kg', 'sum_price', 'max_weight_kg'))
+
+    def test_incremental_matches_rebuild(self):
+        # 批量写入（save_catches）和逐条写入（post_save信号）都增量更新汇总
+        save_catches(b'first', [['10分', '镜鲤', '1.5', '0.25'], ['11分', '欧鳊', '2.125', '12.5'],
+                                ['12分', '镜鲤', '3.705', '2.59'], ['13分', '', '1', '1']])
+        save_catches(b'second', [['10分', '镜鲤', '0.5', ''], ['11分', '银鲫', '', '3']])
+        save_catches(b'first', [['10分', '镜鲤', '1.5', '0.25']])
+        Catch.objects.create(species='欧鳊', weight_kg=Decimal('4.25'), price=Decimal('7.75'))
+        incremental = self._stats()
+
+        self.assertEqual(rebuild_catch_stats(), 3)
+        self.assertEqual(self._stats(), incremental)
+        carp = CatchDailyStat.objects.get(species='镜鲤')
+        self.assertEqual((carp.count, carp.priced_count), (3, 2))
+        self.assertEqual((carp.sum_weight_kg, carp.sum_price, carp.max_weight_kg),
+                         (Decimal('5.205'), Decimal('2.84'), Decimal('3.705')))
+
+
+class FishListTests(TestCase):
+    def setUp(self):
+        caches[settings.FISH_RESPONSE_CACHE_ALIAS].clear()
+        for i in range(5):
+            Fish.objects.create(name=f'鱼{i}', fish_class='普通', rare_weight=f'{i + 1}kg')
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user('tester'))
+
+    def test_etag_round_trip(self):
+        response = self.client.get('/api/wiki/fish')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        response = self.client.get('/api/wiki/fish', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # 查询参数不同时ETag不同
+        self.assertNotEqual(self.client.get('/api/wiki/fish?page_size=2')['ETag'], etag)
+
+        # 新增和删除鱼之后旧的ETag失效，返回新数据而不是缓存的响应
+        Fish.objects.create(name='新鱼')
+        response = self.client.get('/api/wiki/fish', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 6)
+        etag = response['ETag']
+        Fish.objects.filter(name='新鱼').delete()
+        response = self.client.get('/api/wiki/fish', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 5)
+
+    def test_weight_filters(self):
+        def names(query):
+            response = self.client.get(f'/api/wiki/fish?{query}')
+            self.assertEqual(response.status_code, 200)
+            return [fish['name'] for fish in response.data['results']]
+
+        # 上星重量为1kg~5kg，不带单位时为公斤
+        self.assertEqual(names('rare_weight__gte=3'), ['鱼2', '鱼3', '鱼4'])
+        self.assertEqual(names('rare_weight__lt=2500g'), ['鱼0', '鱼1'])
+        self.assertEqual(names('rare_weight__gt=0.002t&rare_weight__lte=4kg'), ['鱼2', '鱼3'])
+        response = self.client.get('/api/wiki/fish?rare_weight__gte=2lb')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('rare_weight__gte', response.data)
+
+    def test_cursor_pagination(self):
+        names = []
+        url = '/api/wiki/fish?pagination=cursor&page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            # 游标分页不统计总数
+            self.assertNotIn('count', response.data)
+            names += [fish['name'] for fish in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(names, [f'鱼{i}' for i in range(5)])
+
+    def test_cursor_is_stable_across_inserts(self):
+        response = self.client.get('/api/wiki/fish?pagination=cursor&page_size=2')
+        # 翻页期间新增的鱼排在末尾，不会导致下一页重复或遗漏
+        Fish.objects.create(name='新鱼')
+        response = self.client.get(response.data['next'])
+        self.assertEqual([fish['name'] for fish in response.data['results']], ['鱼2', '鱼3'])
+
+
+class AccessTokenManagerTests(SimpleTestCase):
+    def _fetcher(self, expires_in=30 * 24 * 3600):
+        calls = []
+
+        def fetch_token(timeout):
+            calls.append(timeout)
+            return f'token{len(calls)}', expires_in
+        return fetch_token, calls
+
+    def test_token_is_cached_until_invalidated(self):
+        fetch_token, calls = self._fetcher()
+        manager = AccessTokenManager(fetch_token)
+        self.assertEqual(manager.get_token(5), 'token1')
+        self.assertEqual(manager.get_token(5), 'token1')
+        self.assertEqual(len(calls), 1)
+        # 失效的不是当前token时不影响
+        manager.invalidate('stale')
+        self.assertEqual(manager.get_token(), 'token1')
+        manager.invalidate('token1')
+        self.assertEqual(manager.get_token(), 'token2')
+
+    def test_refresh_before_expiry(self):
+        # 有效期短于提前刷新的时间，每次都重新获取
+        fetch_token, calls = self._fetcher(expires_in=60)
+        manager = AccessTokenManager(fetch_token, refresh_margin=120)
+        manager.get_token()
+        manager.get_token()
+        self.assertEqual(len(calls), 2)
+
+    def test_shared_store(self):
+        store = MemoryCacheBackend(max_bytes=1024)
+        fetch_token, calls = self._fetcher()
+        self.assertEqual(AccessTokenManager(fetch_token, store).get_token(), 'token1')
+        # 另一个worker从共享存储读取token，不再请求
+        other = AccessTokenManager(fetch_token, store)
+        self.assertEqual(other.get_token(), 'token1')
+        self.assertEqual(len(calls), 1)
+        other.invalidate('token1')
+        self.assertEqual(AccessTokenManager(fetch_token, store).get_token(), 'token2')
+
+
+class HttpClientTests(SimpleTestCase):
+    def setUp(self):
+        self.session = http_client.create_session()
+        self.adapter = self.session.get_adapter('https://aip.baidubce.com')
+
+    def test_post_retries_only_unsent_requests(self):
+        retry = self.adapter.max_retries
+        # 5xx/429和读取超时只对GET/HEAD重试，POST可能已被服务端处理（按次计费）
+        self.assertTrue(retry.is_retry('GET', 503))
+        self.assertFalse(retry.is_retry('POST', 503))
+        with self.assertRaises(ReadTimeoutError):
+            retry.increment('POST', '/', error=ReadTimeoutError(None, '/', 'read timed out'))
+        self.assertEqual(retry.increment('GET', '/', error=ReadTimeoutError(None, '/', 'read timed out')).read,
+                         retry.read - 1)
+        # 连接失败时请求尚未发出，POST也重试
+        self.assertEqual(retry.increment('POST', '/', error=ConnectTimeoutError()).connect, retry.connect - 1)
+
+    def test_pool_wait_is_bounded(self):
+        pool = self.adapter.poolmanager.connection_from_url('https://aip.baidubce.com')
+        self.assertIsInstance(pool, http_client.TimeoutHTTPSConnectionPool)
+        self.assertTrue(pool.block)
+        # 连接全部被占用时，未指定pool_timeout的请求等待POOL_TIMEOUT后失败，而不是一直阻塞
+        while not pool.pool.empty():
+            pool.pool.get()
+        with mock.patch.object(http_client, 'POOL_TIMEOUT', 0.01), self.assertRaises(EmptyPoolError):
+            pool.urlopen('GET', '/')
+
+
+class CatchJobTests(TestCase):
+    def test_fail_stale_jobs(self):
+        stale, running, fresh = (CatchJob.objects.create() for _ in range(3))
+        CatchJob.objects.filter(id=running.id).update(status=CatchJob.STATUS_RUNNING)
+        before = timezone.now() - timedelta(seconds=settings.CATCH_JOB_TIMEOUT + 1)
+        CatchJob.objects.filter(id__in=[stale.id, running.id]).update(created_at=before)
+
+        # 只按提交时间判断，未超时的任务不受影响
+        self.assertEqual(fail_stale_catch_jobs(), 2)
+        self.assertEqual(CatchJob.objects.get(id=stale.id).status, CatchJob.STATUS_FAILED)
+        self.assertEqual(CatchJob.objects.get(id=running.id).status, CatchJob.STATUS_FAILED)
+        self.assertEqual(CatchJob.objects.get(id=fresh.id).status, CatchJob.STATUS_PENDING)
+        self.assertEqual(fail_stale_catch_jobs(), 0)
+
+    def test_job_detail(self):
+        job = CatchJob.objects.create()
+        CatchJob.objects.filter(id=job.id).update(status=CatchJob.STATUS_SUCCEEDED,
+                                                  result={'fishes': [], 'image_url': '/api/wiki/catch_image/x.png'})
+        response = APIClient().get(f'/api/wiki/catch_jobs/{job.id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], CatchJob.STATUS_SUCCEEDED)
+        self.assertEqual(response.data['result']['image_url'], 'http://testserver/api/wiki/catch_image/x.png')
+
+
+class PrepareUploadTests(SimpleTestCase):
+    def test_crop_to_sell_list(self):
+        # 噪声图片的PNG远大于裁剪后的JPEG
+        rng = random.Random(0)
+        image = Image.frombytes('RGB', (1920, 1080), rng.randbytes(1920 * 1080 * 3))
+        buffer = io.BytesIO()
+        image.save(buffer, 'PNG')
+        image_base64, transform = prepare_upload(buffer.getvalue())
+
+        upload = Image.open(io.BytesIO(base64.b64decode(image_base64)))
+        self.assertEqual(upload.format, 'JPEG')
+        self.assertEqual((transform.offset_x, transform.offset_y), (410, 126))
+        self.assertEqual(upload.width, round((1920 - 410) * transform.scale))
+
+    def test_keep_original_when_not_smaller(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (1920, 1080)).save(buffer, 'PNG')
+        image_base64, transform = prepare_upload(buffer.getvalue())
+        self.assertIsNone(transform)
+        self.assertEqual(base64.b64decode(image_base64), buffer.getvalue())
+
+    def test_map_location_to_original(self):
+        transform = UploadTransform(410, 126, 0.5)
+        result = {'words_result': [{'words': '镜鲤', 'location': {'left': 10, 'top': 20, 'width': 30, 'height': 40}}]}
+        transform.map_result(result, 'words_result')
+        self.assertEqual(result['words_result'][0]['location'], {'left': 430, 'top': 166, 'width': 60, 'height': 80})
@@ -1,8 +1,18 @@
 from django.urls import path
-from wiki.views.fishView import fish_list, fish_detail, get_catch_from_image
+from wiki.views.fishView import (fish_list, fish_detail, get_catch_from_image, get_catch_from_image_async,
+                                  catch_cache_stats, catch_image, catch_job_detail, catch_job_stats, catch_stats,
+                                  catch_stats_heaviest, fish_image)
 
 urlpatterns = [
     path('fish', fish_list),
     path('fish/<str:name>', fish_detail),
+    path('fish_image/<str:name>/<str:filename>', fish_image),
     path('catch_from_image', get_catch_from_image),
+    path('catch_from_image/async', get_catch_from_image_async),
+    path('catch_from_image/cache_stats', catch_cache_stats),
+    path('catch_image/<str:token>', catch_image),
+    path('catch_jobs/stats', catch_job_stats),
+    path('catch_jobs/<uuid:job_id>', catch_job_detail),
+    path('catch_stats', catch_stats),
+    path('catch_stats/heaviest', catch_stats_heaviest),
 ]
\ No newline at end of file
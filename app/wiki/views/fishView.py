@@ -1,51 +1,99 @@
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny, IsAuthenticated
-from wiki.models import Fish, Catch
-from wiki.serializers.fishSerializer import FishSerializer
-from wiki.serializers.catchSerializer import CatchSerializer, ImageUploadSerializer, ImageProcessingResponseSerializer
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
+from wiki.models import Fish, Catch, CatchJob, CatchDailyStat
+from wiki.serializers.fishSerializer import FishSerializer, FishWeightQuerySerializer
+from wiki.serializers.catchSerializer import (CatchSerializer, ImageUploadSerializer, ImageProcessingResponseSerializer,
+                                              CatchJobSerializer, CatchDailyStatSerializer, StatsQuerySerializer,
+                                              HeaviestStatsQuerySerializer)
 
-from services.catch_extractor.main import extract_fishes
-from rest_framework.pagination import PageNumberPagination
+from services.catch_extractor.result_cache import get_result_cache
+from services.catch_extractor.card_cache import get_card_cache
+from wiki.catch_images import process_catch_image, process_catch_image_async, load_result_image
+from wiki.fish_search import search_fish
+from wiki.fish_cache import catalog_etag, get_cached_response, set_cached_response
+from wiki.fish_images import parse_variant, get_variant_path, ensure_variant, is_allowed_url
+from wiki.catch_jobs import submit_catch_job, get_catch_job_stats, fail_stale_catch_jobs, CatchJobQueueFull
+from rest_framework.pagination import PageNumberPagination, CursorPagination
 
 import os
+import logging
+from asgiref.sync import sync_to_async
 from django.conf import settings
-import base64
-from io import BytesIO
-from django.db.models import Q
+from django.http import FileResponse, HttpResponseRedirect, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST, condition
+from datetime import timedelta
+from django.db.models import Q, Max, Sum
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
 
 class CustomPagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = 'page_size'
     max_page_size = 100
 
+# 鱼类缩略图的浏览器缓存时间（秒）
+FISH_IMAGE_MAX_AGE = 24 * 3600
+
+class FishCursorPagination(CursorPagination):
+    """
+    游标分页：按主键排序，不统计总数，翻页深度不影响查询速度
+    游标只记录位置，在search/fish_class等过滤条件下持续有效
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = 'id'
+
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
+@condition(etag_func=catalog_etag)
 def fish_list(request):
     if request.method == 'GET':
+        # 鱼类数据未变化时直接返回缓存的响应
+        cached_data = get_cached_response(request)
+        if cached_data is not None:
+            return Response(cached_data)
+
         # 获取查询参数
         search_query = request.query_params.get('search', None)
         fish_class = request.query_params.get('fish_class', None)
         
-        # 初始查询集
-        queryset = Fish.objects.all()
+        # 初始查询集，按主键排序保证分页稳定
+        queryset = Fish.objects.order_by('id')
         
-        # 应用搜索过滤
+        # 应用搜索过滤（名称和简介的全文搜索，按相关度排序）
         if search_query:
-            queryset = queryset.filter(name__icontains=search_query)
+            queryset = search_fish(queryset, search_query)
         
         # 应用类别过滤
         if fish_class:
             queryset = queryset.filter(fish_class=fish_class)
         
-        # 分页
-        paginator = CustomPagination()
+        # 应用重量范围过滤，如 rare_weight__gte=1.5、super_rare_weight__lt=500g（不带单位时为公斤）
+        weight_query = FishWeightQuerySerializer(data=request.query_params)
+        weight_query.is_valid(raise_exception=True)
+        weight_filters = {}
+        for param, weight_kg in weight_query.validated_data.items():
+            field, lookup = param.split('__')
+            weight_filters[f'{field}_kg__{lookup}'] = weight_kg
+        if weight_filters:
+            queryset = queryset.filter(**weight_filters)
+        
+        # 分页：pagination=cursor时使用游标分页（按主键排序，搜索结果不再按相关度排序），默认按页码分页
+        use_cursor = request.query_params.get('pagination') == 'cursor' or 'cursor' in request.query_params
+        paginator = FishCursorPagination() if use_cursor else CustomPagination()
         result_page = paginator.paginate_queryset(queryset, request)
         
         # 序列化
         serializer = FishSerializer(result_page, many=True)
-        return paginator.get_paginated_response(serializer.data)
+        response = paginator.get_paginated_response(serializer.data)
+        set_cached_response(request, response.data)
+        return response
     elif request.method == 'POST':
         serializer = FishSerializer(data=request.data)
         if serializer.is_valid():
@@ -55,7 +103,13 @@ def fish_list(request):
 
 @api_view(['GET', 'PUT', 'DELETE'])
 @permission_classes([IsAuthenticated])
+@condition(etag_func=catalog_etag)
 def fish_detail(request, name: str):
+    if request.method == 'GET':
+        cached_data = get_cached_response(request)
+        if cached_data is not None:
+            return Response(cached_data)
+
     try:
         fish = Fish.objects.get(name=name)
     except Fish.DoesNotExist:
@@ -63,6 +117,7 @@ def fish_detail(request, name: str):
     
     if request.method == 'GET':
         serializer = FishSerializer(fish)
+        set_cached_response(request, serializer.data)
         return Response(serializer.data)
     elif request.method == 'PUT':
         serializer = FishSerializer(fish, data=request.data)
@@ -74,6 +129,35 @@ def fish_detail(request, name: str):
         fish.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def fish_image(request, name: str, filename: str):
+    """
+    鱼类图片的本地缩略图，如 /fish_image/鳊鱼/small.webp
+    缩略图不存在时下载原图生成（FISH_IMAGE_LAZY_FETCH），无法生成时重定向到原图
+    """
+    parsed = parse_variant(filename)
+    img = Fish.objects.filter(name=name).values_list('img', flat=True).first()
+    if parsed is None or not img:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+    variant, image_format = parsed
+
+    result = get_variant_path(img, variant, image_format)
+    if result is None and settings.FISH_IMAGE_LAZY_FETCH and is_allowed_url(img):
+        try:
+            result = ensure_variant(img, variant, image_format)
+        except Exception as e:
+            logger.warning('生成鱼类缩略图失败 %s: %s', img, e)
+    if result is None:
+        if not img.startswith(('http://', 'https://')):
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        return HttpResponseRedirect(img)
+    path, content_type = result
+    response = FileResponse(open(path, 'rb'), content_type=content_type)
+    # 图片地址变化时缩略图随之变化，缓存时间不宜过长
+    patch_cache_control(response, public=True, max_age=FISH_IMAGE_MAX_AGE)
+    return response
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def get_catch_from_image(request):
@@ -82,8 +166,16 @@ def get_catch_from_image(request):
     ---
     请求体:
       image: 鱼类图片文件
+      image_mode: 处理后图片的返回方式，base64（默认）、url（短期链接）、none（不返回，跳过标注）
+      image_format: 处理后图片的格式，png（默认）、jpeg、webp
+      image_quality: jpeg/webp的压缩质量，默认85
+      image_max_size: 处理后图片最长边的像素上限，默认不缩放
+      async_mode: 是否异步处理，为true时立即返回job_id，通过 /api/wiki/catch_jobs/{job_id} 查询结果
+                  （异步任务的图片不内嵌在结果中，image_mode为base64时按url返回）
     响应:
-      image: 处理后的图片（Base64编码）
+      image: 处理后的图片（Base64编码），image_mode为base64时返回
+      image_url: 处理后图片的短期链接，image_mode为url时返回
+      image_format: 处理后图片的格式
       fishes: 识别出的渔获列表，格式为二维数组:
         [[时间百分比, 鱼名, 重量, 分数], 
          [时间百分比, 鱼名, 重量, 分数], ...]
@@ -94,38 +186,171 @@ def get_catch_from_image(request):
     if not serializer.is_valid():
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
-    original_image = serializer.validated_data['image']
-    
-    # 保存图片
-    image_path = os.path.join(settings.ASSETS_DIR, 'original_image.png')
-    if not os.path.exists(os.path.dirname(image_path)):
-        os.makedirs(os.path.dirname(image_path))
+    options = serializer.validated_data
+    original_bytes = options['image'].read()
 
-    with open(image_path, 'wb') as f:
-        f.write(original_image.read())
-    
-    # 调用extract_fishes
-    image, fishes = extract_fishes(image_path=image_path)
-
-    # 保存处理后的图片
-    with open(os.path.join(settings.ASSETS_DIR, 'result_image.png'), 'wb') as f:
-        image.save(f, format='PNG')
-
-    # base64编码
-    img_buffer = BytesIO()
-    image.save(img_buffer, format='PNG')
-    img_buffer.seek(0)
-    image = base64.b64encode(img_buffer.read()).decode('utf-8')
-
-    # 准备响应数据
-    response_data = {
-        'image': image,
-        'fishes': fishes
-    }
+    # 异步模式：提交到后台任务队列，立即返回任务ID
+    if options['async_mode']:
+        try:
+            job = submit_catch_job(original_bytes, options)
+        except CatchJobQueueFull as e:
+            return Response({'detail': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response({
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': request.build_absolute_uri(f'/api/wiki/catch_jobs/{job.id}'),
+        }, status=status.HTTP_202_ACCEPTED)
+
+    response_data = process_catch_image(original_bytes, options)
+    if 'image_url' in response_data:
+        response_data['image_url'] = request.build_absolute_uri(response_data['image_url'])
     
     # 使用响应序列化器验证响应格式
     response_serializer = ImageProcessingResponseSerializer(data=response_data)
     response_serializer.is_valid(raise_exception=True)
     
     # 返回验证后的数据
-    return Response(response_serializer.validated_data)
\ No newline at end of file
+    return Response(response_serializer.validated_data)
+
+@csrf_exempt
+@require_POST
+async def get_catch_from_image_async(request):
+    """
+    从上传的图片中识别渔获信息（原生异步视图）
+    请求体和响应与 /api/wiki/catch_from_image 相同。在uvicorn worker下，等待roboflow/百度接口期间不占用线程，
+    单个worker进程可以同时处理多个提取请求
+    """
+    data = request.POST.copy()
+    data.update(request.FILES)
+    serializer = ImageUploadSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST, json_dumps_params={'ensure_ascii': False})
+
+    options = serializer.validated_data
+    original_bytes = options['image'].read()
+
+    # 异步模式：提交到后台任务队列，立即返回任务ID
+    if options['async_mode']:
+        try:
+            job = await sync_to_async(submit_catch_job)(original_bytes, options)
+        except CatchJobQueueFull as e:
+            return JsonResponse({'detail': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                json_dumps_params={'ensure_ascii': False})
+        return JsonResponse({
+            'job_id': str(job.id),
+            'status': job.status,
+            'status_url': request.build_absolute_uri(f'/api/wiki/catch_jobs/{job.id}'),
+        }, status=status.HTTP_202_ACCEPTED)
+
+    response_data = await process_catch_image_async(original_bytes, options)
+    if 'image_url' in response_data:
+        response_data['image_url'] = request.build_absolute_uri(response_data['image_url'])
+
+    # 原生异步视图不经过DRF的异常处理，校验失败时与同步接口一样返回400和错误详情
+    response_serializer = ImageProcessingResponseSerializer(data=response_data)
+    if not response_serializer.is_valid():
+        return JsonResponse(response_serializer.errors, status=status.HTTP_400_BAD_REQUEST,
+                            json_dumps_params={'ensure_ascii': False})
+    return JsonResponse(response_serializer.validated_data, json_dumps_params={'ensure_ascii': False})
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def catch_cache_stats(request):
+    """
+    鱼获提取结果缓存的命中统计（当前进程），启用卡片缓存时在card_cache中返回卡片缓存的统计
+    """
+    result_cache = get_result_cache()
+    data = result_cache.stats() if result_cache is not None else {'backend': 'none'}
+    card_cache = get_card_cache()
+    if card_cache is not None:
+        data['card_cache'] = card_cache.stats()
+    return Response(data)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def catch_image(request, token: str):
+    """
+    下载处理后的图片（get_catch_from_image在image_mode为url时返回的短期链接）
+    """
+    result = load_result_image(token)
+    if result is None:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+    path, content_type = result
+    return FileResponse(open(path, 'rb'), content_type=content_type)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def catch_job_detail(request, job_id):
+    """
+    查询异步鱼获提取任务的状态，任务完成时返回结果
+    """
+    try:
+        job = CatchJob.objects.get(id=job_id)
+    except CatchJob.DoesNotExist:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+    if job.status in (CatchJob.STATUS_PENDING, CatchJob.STATUS_RUNNING) and fail_stale_catch_jobs():
+        job.refresh_from_db()
+
+    data = CatchJobSerializer(job).data
+    if data['result'] and 'image_url' in data['result']:
+        data['result']['image_url'] = request.build_absolute_uri(data['result']['image_url'])
+    return Response(data)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def catch_job_stats(request):
+    """
+    异步鱼获提取任务的队列深度、耗时和并发配置
+    """
+    return Response(get_catch_job_stats())
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def catch_stats(request):
+    """
+    按种类和日期汇总的鱼获统计（直接读取汇总表）
+    ---
+    查询参数:
+      species: 鱼的种类，不填时返回所有种类
+      days: 统计最近多少天（含今天），默认30
+    响应:
+      分页的 [{species, day, count, priced_count, sum_weight_kg, sum_price, max_weight_kg, avg_price_per_kg}, ...]
+    """
+    query = StatsQuerySerializer(data=request.query_params)
+    query.is_valid(raise_exception=True)
+    since = timezone.localdate() - timedelta(days=query.validated_data.get('days', 30) - 1)
+
+    queryset = CatchDailyStat.objects.filter(day__gte=since)
+    if 'species' in query.validated_data:
+        queryset = queryset.filter(species=query.validated_data['species'])
+    queryset = queryset.order_by('species', '-day')
+
+    paginator = CustomPagination()
+    result_page = paginator.paginate_queryset(queryset, request)
+    serializer = CatchDailyStatSerializer(result_page, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def catch_stats_heaviest(request):
+    """
+    最近一段时间内各种类的最大鱼获重量，按重量从大到小排序（直接读取汇总表）
+    ---
+    查询参数:
+      days: 统计最近多少天（含今天），默认7
+      limit: 返回的种类数上限，默认20
+    响应:
+      [{species, max_weight_kg, count}, ...]
+    """
+    query = HeaviestStatsQuerySerializer(data=request.query_params)
+    query.is_valid(raise_exception=True)
+    since = timezone.localdate() - timedelta(days=query.validated_data.get('days', 7) - 1)
+
+    rows = (CatchDailyStat.objects.filter(day__gte=since)
+            .values('species')
+            .annotate(max_weight_kg=Max('max_weight_kg'), count=Sum('count'))
+            .order_by('-max_weight_kg')[:query.validated_data['limit']])
+    return Response(list(rows))